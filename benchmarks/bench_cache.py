@@ -0,0 +1,82 @@
+"""
+Probe count and response latency of overlapping UI polls with and without ResultCache.
+
+Several "panels" poll a slow fake probe on their own timers. Without the cache
+every poll runs the probe, with it overlapping polls share one probe and
+polls inside the TTL are answered from memory.
+
+    python benchmarks/bench_cache.py [--panels 4] [--seconds 5] [--probe-ms 300]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from cache import ResultCache
+
+
+class FakeProbe:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {'quality': 'good', 'avg_latency': 20.0}
+
+
+async def panel(poll, period: float, until: float, latencies: list):
+    loop = asyncio.get_running_loop()
+    while loop.time() < until:
+        start = time.perf_counter()
+        await poll()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(period)
+
+
+async def run(panels: int, seconds: float, probe: FakeProbe, cache: ResultCache = None):
+    loop = asyncio.get_running_loop()
+    until = loop.time() + seconds
+    latencies = []
+
+    async def poll():
+        if cache is None:
+            return await probe()
+        return await cache.get('quality', probe)
+
+    # panels poll at slightly different rates so requests overlap unevenly
+    await asyncio.gather(*(panel(poll, 0.5 + 0.25 * i, until, latencies) for i in range(panels)))
+    return latencies
+
+
+def report(name: str, probe: FakeProbe, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{name:10} polls={len(latencies):4} probes={probe.calls:4} "
+          f"median={statistics.median(latencies):7.1f}ms p95={p95:7.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--panels', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--probe-ms', type=float, default=300.0)
+    args = parser.parse_args()
+
+    uncached = FakeProbe(args.probe_ms / 1000)
+    report('uncached', uncached, await run(args.panels, args.seconds, uncached))
+
+    cached = FakeProbe(args.probe_ms / 1000)
+    cache = ResultCache({'quality': (2.0, 30.0)})
+    report('cached', cached, await run(args.panels, args.seconds, cached, cache))
+    print(f"counters   {cache.stats()}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Resolver ranking against local stub DNS responders with injected delays.
+
+Each stub answers any query with an empty NOERROR response after a fixed
+delay, one of them also drops a share of queries. Before timing, the query
+encoder, the response parser and query() are checked against fixed bytes and
+stubs that answer NXDOMAIN, SERVFAIL, with a foreign ID or a truncated
+datagram. After timing, the ranking order is checked. Exits 1 when a check fails.
+
+    python benchmarks/bench_dns.py
+"""
+
+import asyncio
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+import dnsprobe
+
+
+class StubResolver(asyncio.DatagramProtocol):
+    """`mode` picks the answer: ok, nxdomain, servfail, wrong_id (foreign query id) or short (cut header)"""
+
+    def __init__(self, delay: float, drop: float = 0.0, seed: int = 0, mode: str = 'ok'):
+        self.delay = delay
+        self.drop = drop
+        self.rng = random.Random(seed)
+        self.mode = mode
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.rng.random() < self.drop:
+            return
+        qid = struct.unpack('!H', data[:2])[0]
+        if self.mode == 'wrong_id':
+            qid ^= 0xffff
+        rcode = {'nxdomain': 3, 'servfail': 2}.get(self.mode, 0)
+        # echo the question back with QR set and no answers
+        reply = struct.pack('!HHHHHH', qid, 0x8180 | rcode, 1, 0, 0, 0) + data[12:]
+        if self.mode == 'short':
+            reply = reply[:8]
+        asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, reply, addr)
+
+
+async def start_stub(delay: float, drop: float = 0.0, seed: int = 0, mode: str = 'ok'):
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: StubResolver(delay, drop, seed, mode), local_addr=('127.0.0.1', 0))
+    return transport, f"127.0.0.1:{transport.get_extra_info('sockname')[1]}"
+
+
+def check(errors: list, ok: bool, message: str):
+    if not ok:
+        errors.append(message)
+
+
+def check_encoding(errors: list):
+    query = dnsprobe.build_query(0x1234, 'www.example.com.', 'A')
+    check(errors, query == bytes.fromhex('123401000001000000000000') + b'\x03www\x07example\x03com\x00' + b'\x00\x01\x00\x01',
+          f"A query encoded as {query.hex()}")
+    check(errors, dnsprobe.build_query(7, 'example.com', 'AAAA')[-4:] == b'\x00\x1c\x00\x01', "AAAA qtype")
+
+    header = struct.pack('!HHHHHH', 0x1234, 0x8180, 1, 2, 0, 0)
+    check(errors, dnsprobe.parse_response(header + query[12:]) == (0x1234, 0, 2), "NOERROR with 2 answers")
+    nx = struct.pack('!HHHHHH', 0x1234, 0x8183, 1, 0, 0, 0)
+    check(errors, dnsprobe.parse_response(nx) == (0x1234, 3, 0), "NXDOMAIN rcode")
+    check(errors, dnsprobe.parse_response(header[:11]) is None, "truncated header is not a response")
+    check(errors, dnsprobe.parse_response(query) is None, "a query (QR unset) is not a response")
+
+    for server, expected in (('1.1.1.1', ('1.1.1.1', 53)), ('127.0.0.1:5353', ('127.0.0.1', 5353)),
+                             ('[::1]:5300', ('::1', 5300)), ('[2606:4700::1111]', ('2606:4700::1111', 53)),
+                             ('2606:4700::1111', ('2606:4700::1111', 53))):
+        check(errors, dnsprobe.split_server(server) == expected, f"split_server({server!r})")
+
+
+async def check_answers(errors: list):
+    """query() against stubs that answer badly"""
+    transports = []
+    try:
+        for mode, expect in (('nxdomain', {'success': True, 'rcode': 3}), ('servfail', {'success': False, 'rcode': 2}),
+                             ('wrong_id', {'success': False, 'error': 'timeout'}),
+                             ('short', {'success': False, 'error': 'timeout'})):
+            transport, server = await start_stub(0.0, mode=mode)
+            transports.append(transport)
+            result = await dnsprobe.query(server, 'example.com', timeout=0.3)
+            got = {key: result.get(key) for key in expect}
+            check(errors, got == expect, f"{mode} answer gave {got}, expected {expect}")
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+async def main():
+    errors = []
+    check_encoding(errors)
+    await check_answers(errors)
+
+    stubs = [('fast', 0.005, 0.0), ('medium', 0.02, 0.0), ('slow', 0.06, 0.0), ('lossy-fast', 0.004, 0.5)]
+    servers = {}
+    transports = []
+    for i, (name, delay, drop) in enumerate(stubs):
+        transport, server = await start_stub(delay, drop, i)
+        transports.append(transport)
+        servers[server] = name
+    # nothing listens on the discard port
+    servers['127.0.0.1:9'] = 'dead'
+
+    start = time.perf_counter()
+    result = await dnsprobe.benchmark(list(servers), rounds=3, timeout=0.5)
+    elapsed = time.perf_counter() - start
+
+    for row in result['servers']:
+        print(f"{servers[row['dns_server']]:<11} median {row['median'] or 0:7.2f}ms  p90 {row['p90'] or 0:7.2f}ms  "
+              f"cold {row['cold_median'] or 0:7.2f}ms  warm {row['warm_median'] or 0:7.2f}ms  "
+              f"failures {row['failures']}")
+    print(f"recommended {servers.get(result['recommended'])}  (all servers in parallel, {elapsed:.2f}s)")
+    # clean servers by median, then the lossy one, then the one that never answered
+    order = [servers[row['dns_server']] for row in result['servers']]
+    check(errors, order == ['fast', 'medium', 'slow', 'lossy-fast', 'dead'], f"ranked {order}")
+    check(errors, servers.get(result['recommended']) == 'fast', f"recommended {servers.get(result['recommended'])}")
+
+    # a query to a port with nothing listening must fail fast, not hang
+    start = time.perf_counter()
+    dead = await dnsprobe.query('127.0.0.1:9', 'example.com', timeout=0.5)
+    print(f"dead server -> success={dead['success']} error={dead.get('error')}")
+    check(errors, not dead['success'] and time.perf_counter() - start < 0.6, "dead server query")
+
+    for transport in transports:
+        transport.close()
+    for error in errors:
+        print(f"FAIL {error}")
+    print('failed' if errors else 'ok')
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
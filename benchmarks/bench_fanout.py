@@ -0,0 +1,93 @@
+"""
+Sequential vs concurrent game-server probing against local stand-in responders.
+
+Each responder is a loopback TCP server that answers a connection with one byte
+after an injected delay, so a probe's RTT is roughly that delay.
+
+    python benchmarks/bench_fanout.py [--servers 20] [--concurrency 8]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from prober import AsyncProber
+
+
+class FirstByteProber(AsyncProber):
+    """tcp prober that waits for the responder's first byte, so injected delays show up as rtt"""
+
+    async def _tcp_probe(self, family: int, sockaddr: Tuple, port: int) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(sockaddr[0], port), self.timeout)
+            await asyncio.wait_for(reader.read(1), self.timeout)
+            writer.close()
+        except (asyncio.TimeoutError, OSError):
+            return None
+        return (time.perf_counter() - start) * 1000
+
+
+async def start_responder(delay: float):
+    async def handle(reader, writer):
+        await asyncio.sleep(delay)
+        writer.write(b'x')
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0, family=socket.AF_INET)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--servers', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--min-delay', type=float, default=0.02)
+    parser.add_argument('--max-delay', type=float, default=0.25)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    responders = []
+    servers = []
+    for i in range(args.servers):
+        delay = rng.uniform(args.min_delay, args.max_delay)
+        server, port = await start_responder(delay)
+        responders.append(server)
+        servers.append({'name': f'server-{i}', 'host': '127.0.0.1', 'port': port, 'region': 'local'})
+
+    prober = FirstByteProber(mode='tcp', interval=0.0)
+
+    start = time.perf_counter()
+    for server in servers:
+        await prober.ping(server['host'], 3, server['port'])
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = None
+    async for _result in prober.ping_many(servers, 3, args.concurrency, timeout=5.0):
+        if first is None:
+            first = time.perf_counter() - start
+    concurrent = time.perf_counter() - start
+
+    print(f"servers={args.servers} concurrency={args.concurrency}")
+    print(f"sequential   {sequential * 1000:8.1f}ms")
+    print(f"fan-out      {concurrent * 1000:8.1f}ms  (first row after {first * 1000:.1f}ms)")
+    print(f"speedup      {sequential / concurrent:8.1f}x")
+
+    for server in responders:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Memory and append throughput of the columnar history ring vs the old list of dicts.
+
+    python benchmarks/bench_history.py [--points 100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from history import HistoryRing
+
+
+def legacy_point(ts: float) -> dict:
+    """the nested dict _monitoring_loop used to store per sample"""
+    return {
+        'timestamp': datetime.fromtimestamp(ts).isoformat(),
+        'quality': {'quality': 'good', 'score': 80, 'avg_latency': 23.5, 'avg_packet_loss': 0, 'jitter': 1.2},
+        'live_ping': 23.5,
+        'bandwidth': {'download_bps': 1.5e6, 'upload_bps': 2.0e5},
+        'dns_status': {'success': True, 'dns_server': '8.8.8.8', 'resolution_time': 12.0}
+    }
+
+
+def bench_ring(points: int):
+    tracemalloc.start()
+    ring = HistoryRing(points)
+    start = time.perf_counter()
+    for n in range(points):
+        ring.append(n * 0.5, 23.5, 1.2, 0.0, 80, 'good', 1.5e6, 2.0e5, 12.0)
+    elapsed = time.perf_counter() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    window = ring.window(50)
+    window_ms = (time.perf_counter() - start) * 1000
+    assert len(window) == 50
+    return elapsed, peak, window_ms
+
+
+def bench_list(points: int, cap: int):
+    tracemalloc.start()
+    data = []
+    start = time.perf_counter()
+    for n in range(points):
+        data.append(legacy_point(n * 0.5))
+        if len(data) > cap:
+            data.pop(0)
+    elapsed = time.perf_counter() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    data.copy()
+    copy_ms = (time.perf_counter() - start) * 1000
+    return elapsed, peak, copy_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.points
+
+    elapsed, peak, window_ms = bench_ring(n)
+    print(f"ring       {n / elapsed:12,.0f} appends/s  peak {peak / 1e6:7.2f}MB  "
+          f"last-50 window {window_ms:.3f}ms")
+
+    elapsed, peak, copy_ms = bench_list(n, n)
+    print(f"list/dict  {n / elapsed:12,.0f} appends/s  peak {peak / 1e6:7.2f}MB  "
+          f"full copy {copy_ms:.3f}ms")
+
+    # pop(0) cost only shows once the list sits at capacity
+    elapsed, _peak, _copy = bench_list(n, n // 2)
+    print(f"list/pop0  {n / elapsed:12,.0f} appends/s  (capacity {n // 2:,}, trimming with pop(0))")
+
+
+if __name__ == '__main__':
+    main()
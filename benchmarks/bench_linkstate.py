@@ -0,0 +1,213 @@
+"""
+rtnetlink parser and LinkWatcher checks on captured kernel messages, plus parse cost.
+
+The fixtures in benchmarks/fixtures/ are raw recv() buffers from a Linux 6.x kernel:
+  rtnetlink-links.bin   RTM_GETLINK dump (lo, ifb0, ifb1, eth0 up, default via 192.0.2.1)
+  rtnetlink-routes.bin  RTM_GETROUTE dump, main and local table routes
+  rtnetlink-addrs.bin   RTM_GETADDR dump, RTM_NEWADDR only, which the parser skips
+  rtnetlink-events.bin  multicast (link, ipv4 route and ipv4 addr groups) while running
+      ip link set ifb0 up; ip addr add 198.51.100.7/24 dev ifb0
+      ip route add default via 192.0.2.254 dev eth0 metric 500
+      ip route del default via 192.0.2.1 dev eth0; ip route add default via 192.0.2.1 dev eth0
+      ip route del default via 192.0.2.254 dev eth0 metric 500
+      ip addr del 198.51.100.7/24 dev ifb0; ip link set ifb0 down
+Exits 1 when any check fails.
+
+    python benchmarks/bench_linkstate.py [--iterations 2000]
+"""
+
+import argparse
+import errno
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from linkstate import (NLMSGHDR, NLM_F_DUMP, RTM_DELROUTE, RTM_GETLINK, RTM_GETROUTE, LinkWatcher,
+                       parse_messages)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, f'rtnetlink-{name}.bin'), 'rb') as f:
+        return f.read()
+
+
+def split(data: bytes) -> list:
+    """one buffer into its netlink messages, as (type, bytes)"""
+    out = []
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        length, kind = struct.unpack_from('=IH', data, offset)
+        out.append((kind, data[offset:offset + length]))
+        offset += (length + 3) & ~3
+    return out
+
+
+class FakeSocket:
+    """records dump requests, recv() raises the queued errors and then would block"""
+
+    def __init__(self, errors=()):
+        self.sent = []
+        self.errors = list(errors)
+
+    def send(self, data: bytes):
+        self.sent.append(NLMSGHDR.unpack_from(data)[1:3])
+
+    def recv(self, _size: int) -> bytes:
+        raise self.errors.pop(0) if self.errors else BlockingIOError()
+
+
+def check(errors: list, ok: bool, message: str):
+    if not ok:
+        errors.append(message)
+
+
+def loaded_watcher(events: list, on_change=None) -> LinkWatcher:
+    """a watcher that went through the initial link and route dumps"""
+    watcher = LinkWatcher(on_change=on_change or events.append)
+    watcher.sock = FakeSocket()
+    watcher._dumps = [RTM_GETROUTE]
+    watcher._dumping = True
+    watcher.apply(parse_messages(fixture('links')), now=1.0)
+    watcher.apply(parse_messages(fixture('routes')), now=1.0)
+    return watcher
+
+
+def check_parser(errors: list):
+    links = parse_messages(fixture('links'))
+    check(errors, [(m['index'], m['name'], m['up'], m['operstate']) for m in links[:-1]] == [
+        (1, 'lo', True, 'unknown'), (2, 'ifb0', False, 'down'), (3, 'ifb1', False, 'down'), (4, 'eth0', True, 'up')],
+        f"link dump parsed as {links}")
+    check(errors, links[-1] == {'type': 'done'}, "link dump ends in done")
+
+    # local table routes are dropped, the main table keeps the default and the subnet route
+    routes = parse_messages(fixture('routes'))
+    check(errors, routes == [
+        {'type': 'route', 'deleted': False, 'default': True, 'oif': 4, 'gateway': '192.0.2.1', 'priority': 0},
+        {'type': 'route', 'deleted': False, 'default': False, 'oif': 4, 'gateway': None, 'priority': 0},
+        {'type': 'done'}], f"route dump parsed as {routes}")
+
+    check(errors, parse_messages(fixture('addrs')) == [{'type': 'done'}], "RTM_NEWADDR is skipped")
+
+    events = parse_messages(fixture('events'))
+    check(errors, [k for k, _m in split(fixture('events'))].count(RTM_DELROUTE) == 5,
+          "fixture holds 5 RTM_DELROUTE, 2 of them local table")
+    check(errors, [(m['type'], m['deleted'], m.get('default'), m.get('gateway'), m.get('priority')) for m in events] == [
+        ('link', False, None, None, None),
+        ('route', False, False, None, 0),
+        ('route', False, True, '192.0.2.254', 500),
+        ('route', True, True, '192.0.2.1', 0),
+        ('route', False, True, '192.0.2.1', 0),
+        ('route', True, True, '192.0.2.254', 500),
+        ('route', True, False, None, 0),
+        ('link', False, None, None, None)], f"events parsed as {events}")
+
+    # a message cut short ends the buffer instead of raising
+    check(errors, parse_messages(fixture('links')[:40]) == [], "truncated buffer")
+
+
+def check_watcher(errors: list):
+    events = []
+    watcher = loaded_watcher(events)
+    check(errors, watcher.ready and watcher.state == {
+        'interface': 'eth0', 'connection_type': 'ethernet', 'gateway': '192.0.2.1', 'up': True},
+        f"state after dumps {watcher.state}")
+    check(errors, events == [], f"the initial dump recorded {events}")
+
+    # the kernel sends one message per datagram here, apply them one at a time
+    for n, message in enumerate(parse_messages(fixture('events'))):
+        watcher.apply([message], now=10.0 + n)
+    check(errors, [(e['timestamp'], e['kind'], e['interface'], e['detail']) for e in events] == [
+        (10.0, 'link', 'ifb0', 'unknown'),
+        (13.0, 'route', 'eth0', 'default via 192.0.2.254'),
+        (14.0, 'route', 'eth0', 'default via 192.0.2.1'),
+        (17.0, 'link', 'ifb0', 'down')], f"change events {events}")
+    check(errors, watcher.default_routes == {(4, 0): '192.0.2.1'}, f"routes after events {watcher.default_routes}")
+
+
+def check_route_switch(errors: list):
+    """on_change runs after the state moved, main.py points the bandwidth sampler at state['interface']"""
+    seen = []
+    watcher = loaded_watcher([], lambda event: seen.append(
+        (event['kind'], event['interface'], watcher.state['interface'], watcher.state['gateway'])))
+    wlan = {'type': 'link', 'deleted': False, 'index': 5, 'name': 'wlan0', 'up': True, 'operstate': 'up'}
+    route = {'type': 'route', 'default': True, 'priority': 0}
+    for n, message in enumerate([
+            wlan,
+            dict(route, deleted=False, oif=5, gateway='10.0.0.1', priority=600),
+            dict(route, deleted=True, oif=4, gateway='192.0.2.1')]):
+        watcher.apply([message], now=40.0 + n)
+    check(errors, seen == [('link', 'wlan0', 'eth0', '192.0.2.1'), ('route', 'wlan0', 'wlan0', '10.0.0.1')],
+          f"on_change saw {seen}")
+
+
+def check_resync(errors: list):
+    """an overrun dumps again and prunes whatever the dump no longer returns"""
+    events = []
+    watcher = loaded_watcher(events)
+    # the metric 500 default route arrives, then the queue overflows before its removal is read
+    for message in parse_messages(fixture('events'))[:3]:
+        watcher.apply([message], now=10.0)
+    events.clear()
+    watcher.sock = FakeSocket([OSError(errno.ENOBUFS, 'No buffer space available')])
+    watcher._on_readable()
+    check(errors, watcher.resyncs == 1 and watcher.sock.sent == [(RTM_GETLINK, 0x1 | NLM_F_DUMP)],
+          f"overrun sent {watcher.sock.sent}")
+
+    # meanwhile ifb1 went away and ifb0 went back down
+    links = b''.join(m for kind, m in split(fixture('links')) if b'ifb1' not in m)
+    watcher.apply(parse_messages(links), now=20.0)
+    check(errors, watcher.sock.sent[-1] == (RTM_GETROUTE, 0x1 | NLM_F_DUMP), "route dump follows the link dump")
+    watcher.apply(parse_messages(fixture('routes')), now=21.0)
+    check(errors, [(e['kind'], e['interface'], e['detail']) for e in events] == [
+        ('link', 'ifb0', 'down'), ('link', 'ifb1', 'removed')], f"resync events {events}")
+    check(errors, sorted(watcher.links) == [1, 2, 4] and watcher.default_routes == {(4, 0): '192.0.2.1'},
+          f"resync left links {sorted(watcher.links)} routes {watcher.default_routes}")
+    check(errors, not watcher._dumping and watcher._seen is None, "resync finished")
+
+    # a second overrun while a dump runs waits for it, then dumps once more
+    watcher.sock = FakeSocket([OSError(errno.ENOBUFS, 'No buffer space available')] * 2)
+    watcher._on_readable()
+    check(errors, len(watcher.sock.sent) == 1 and watcher._resync_pending, "overlapping overrun queued")
+    watcher.apply(parse_messages(fixture('links')), now=30.0)
+    watcher.apply(parse_messages(fixture('routes')), now=30.0)
+    check(errors, watcher.sock.sent[-1] == (RTM_GETLINK, 0x1 | NLM_F_DUMP) and watcher._dumping,
+          "queued resync started after the running dump")
+
+    # anything else is reported and stops the read loop
+    reported = []
+    watcher.on_error = reported.append
+    watcher.sock = FakeSocket([OSError(errno.EBADF, 'Bad file descriptor')])
+    watcher._on_readable()
+    check(errors, [e.errno for e in reported] == [errno.EBADF], f"on_error got {reported}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    errors = []
+    check_parser(errors)
+    check_watcher(errors)
+    check_route_switch(errors)
+    check_resync(errors)
+
+    data = fixture('links') + fixture('routes')
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        parse_messages(data)
+    elapsed = time.perf_counter() - start
+    print(f"parse dump  {elapsed / args.iterations * 1e6:7.1f}us ({len(data)} bytes, {len(split(data))} messages)")
+
+    for error in errors:
+        print(f"FAIL {error}")
+    print('failed' if errors else 'ok')
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Overhead of the self-instrumentation on the paths it wraps.
+
+Times a bare coroutine against the same coroutine inside `Metrics.time`, the
+raw `observe` / `count` calls, the loop lag monitor's effect on a busy loop
+and one ResourceSampler call, so the instrumentation can't become the
+regression it is meant to catch.
+
+    python benchmarks/bench_metrics.py [--calls 200000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from metrics import LoopLagMonitor, Metrics, ResourceSampler
+
+
+async def noop():
+    return None
+
+
+async def timed_calls(metrics: Metrics, calls: int, wrapped: bool) -> float:
+    start = time.perf_counter()
+    if wrapped:
+        for _ in range(calls):
+            with metrics.time('noop'):
+                await noop()
+    else:
+        for _ in range(calls):
+            await noop()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+async def lag_check(seconds: float, block_ms: float) -> dict:
+    monitor = LoopLagMonitor(interval=0.05)
+    monitor.start()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        await asyncio.sleep(0.2)
+        # a synchronous call hogging the loop, what the monitor exists to catch
+        time.sleep(block_ms / 1000)
+    monitor.stop()
+    return monitor.snapshot()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200_000)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    bare = await timed_calls(metrics, args.calls, False)
+    wrapped = await timed_calls(metrics, args.calls, True)
+    print(f"await noop       {bare:7.0f}ns")
+    print(f"  inside time()  {wrapped:7.0f}ns  (+{wrapped - bare:.0f}ns)")
+
+    start = time.perf_counter()
+    for i in range(args.calls):
+        metrics.observe('op', i % 500 / 10)
+    print(f"observe          {(time.perf_counter() - start) / args.calls * 1e9:7.0f}ns")
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        metrics.count('counter')
+    print(f"count            {(time.perf_counter() - start) / args.calls * 1e9:7.0f}ns")
+
+    sampler = ResourceSampler()
+    start = time.perf_counter()
+    for _ in range(100):
+        sampler.sample()
+    print(f"resource sample  {(time.perf_counter() - start) / 100 * 1e6:7.0f}us")
+
+    lag = await lag_check(2.0, 120)
+    print(f"loop lag with 120ms blocking calls: p50 {lag['p50_ms']:.1f}ms max {lag['max_ms']:.1f}ms "
+          f"stalls {lag['stalls']}/{lag['count']}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+/proc/net/dev sampler vs psutil, plus a parser check on fixture text.
+
+    python benchmarks/bench_netdev.py [--iterations 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from netdev import InterfaceSampler, counter_delta, parse_default_route, parse_net_dev
+
+NET_DEV_FIXTURE = b"""Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: 8123456   40210    0    0    0     0          0         0  8123456   40210    0    0    0     0       0          0
+ wlan0: 4294967000 123456  3    7    0     0          0       120 987654321  65432    1    2    0     0       0          0
+docker0:       0       0    0    0    0     0          0         0     5120      40    0    0    0     0       0          0
+  tun0:  1048576    2048    0    0    0     0          0         0   524288    1024    0    0    0     0       0          0
+"""
+
+ROUTE_FIXTURE = b"""Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT
+tun0\t00000000\t0100080A\t0003\t0\t0\t50\t00000000\t0\t0\t0
+wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0
+wlan0\t0001A8C0\t00000000\t0001\t0\t0\t600\t00FFFFFF\t0\t0\t0
+"""
+
+
+def check_fixtures():
+    counters = parse_net_dev(NET_DEV_FIXTURE)
+    assert sorted(counters) == ['docker0', 'lo', 'tun0', 'wlan0'], counters
+    assert counters['wlan0'] == [4294967000, 123456, 3, 7, 987654321, 65432, 1, 2], counters['wlan0']
+    assert parse_default_route(ROUTE_FIXTURE) == 'tun0'
+    assert counter_delta(100, 4294967000) == 396
+    check_fresh_totals()
+    check_reused_rows()
+    print("fixtures   ok")
+
+
+def check_fresh_totals():
+    """totals(fresh=True) sees new counters but leaves the rate window to sample()"""
+    with tempfile.TemporaryDirectory() as root:
+        dev, route = os.path.join(root, 'dev'), os.path.join(root, 'route')
+        with open(dev, 'wb') as f:
+            f.write(NET_DEV_FIXTURE)
+        with open(route, 'wb') as f:
+            f.write(ROUTE_FIXTURE)
+        sampler = InterfaceSampler(dev, route)
+        sampler.sample(100.0)
+        with open(dev, 'wb') as f:
+            f.write(NET_DEV_FIXTURE.replace(b'1048576    2048', b'1049576    2050'))
+        totals = sampler.totals(fresh=True)
+        assert totals['interface'] == 'tun0' and totals['bytes_recv'] == 1049576, totals
+        assert sampler.last_time == 100.0 and sampler.counters['tun0'][0] == 1048576
+        # the loop's next delta spans the full second since its own last sample
+        assert sampler.sample(101.0)['download_bps'] == 8000.0
+        sampler.close()
+
+
+def check_reused_rows():
+    """sample() parses into the lists of the sample before last, only new interfaces allocate"""
+    with tempfile.TemporaryDirectory() as root:
+        dev, route = os.path.join(root, 'dev'), os.path.join(root, 'route')
+        with open(dev, 'wb') as f:
+            f.write(NET_DEV_FIXTURE)
+        with open(route, 'wb') as f:
+            f.write(ROUTE_FIXTURE)
+        sampler = InterfaceSampler(dev, route)
+        sampler.sample(100.0)
+        first = sampler.counters['tun0']
+        sampler.sample(101.0)
+        assert sampler.counters['tun0'] is not first
+        with open(dev, 'wb') as f:
+            f.write(b'\n'.join(line for line in NET_DEV_FIXTURE.split(b'\n') if b'docker0' not in line))
+        sampler.sample(102.0)
+        assert sampler.counters['tun0'] is first and first[0] == 1048576
+        assert sorted(sampler.counters) == ['lo', 'tun0', 'wlan0'] and 'docker0' not in sampler.rates
+        sampler.sample(103.0)
+        assert sorted(sampler.counters) == ['lo', 'tun0', 'wlan0'], sampler.counters
+        sampler.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=20_000)
+    args = parser.parse_args()
+
+    check_fixtures()
+
+    sampler = InterfaceSampler()
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        sampler.sample(i * 0.5)
+    procfs_us = (time.perf_counter() - start) / args.iterations * 1e6
+    print(f"procfs     {procfs_us:7.2f}us/sample  ({len(sampler.counters)} interfaces)")
+
+    try:
+        import psutil
+    except ImportError:
+        print("psutil     skipped (not installed)")
+        return
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        psutil.net_io_counters(pernic=True)
+    psutil_us = (time.perf_counter() - start) / args.iterations * 1e6
+    print(f"psutil     {psutil_us:7.2f}us/sample  (pernic=True, no rate math)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Fault localization of the path quality engine against local stand-in responders.
+
+Every hop (gateway, internet anchor, two DNS servers, two game servers) is a
+loopback TCP responder on its own 127.0.0.x address that answers with one
+byte after an injected delay, or hangs up without answering to inject loss.
+Each scenario runs healthy rounds to build baselines, degrades some hops and
+checks which hop the engine blames. Rounds are stamped in virtual time 5s
+apart, so minutes of history build up in a few seconds per scenario.
+
+    python benchmarks/bench_pathquality.py [--warmup 30] [--rounds 12]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from pathquality import PathQualityEngine
+from prober import AsyncProber
+
+
+class FirstByteProber(AsyncProber):
+    """tcp prober that waits for the responder's first byte, a hang-up without one is a lost probe"""
+
+    async def _tcp_probe(self, family: int, sockaddr: Tuple, port: int) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(sockaddr[0], port), self.timeout)
+            data = await asyncio.wait_for(reader.read(1), self.timeout)
+            writer.close()
+        except (asyncio.TimeoutError, OSError):
+            return None
+        return (time.perf_counter() - start) * 1000 if data else None
+
+
+class Responder:
+    def __init__(self, host: str, delay: float, seed: int):
+        self.host = host
+        self.base_delay = delay
+        self.delay = delay
+        self.loss = 0.0
+        self.rng = random.Random(seed)
+        self.server = None
+
+    def reset(self):
+        self.delay = self.base_delay
+        self.loss = 0.0
+
+    async def handle(self, reader, writer):
+        if self.rng.random() < self.loss:
+            writer.close()
+            return
+        await asyncio.sleep(self.delay)
+        writer.write(b'x')
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, port: int) -> int:
+        self.server = await asyncio.start_server(self.handle, self.host, port, family=socket.AF_INET)
+        return self.server.sockets[0].getsockname()[1]
+
+
+# name -> (address, healthy delay in seconds)
+HOPS = {
+    'gateway': ('127.0.0.2', 0.003),
+    'internet': ('127.0.0.3', 0.015),
+    'dns:a': ('127.0.0.4', 0.012),
+    'dns:b': ('127.0.0.5', 0.014),
+    'game:alpha': ('127.0.0.6', 0.030),
+    'game:beta': ('127.0.0.7', 0.040),
+}
+
+# name, {hop: (delay or None, loss)}, expected fault, expected culprits
+SCENARIOS = [
+    ('healthy', {}, None, []),
+    ('gateway loss', {'gateway': (None, 0.4)}, 'local', ['gateway']),
+    ('isp latency', {'internet': (0.12, 0.0), 'dns:a': (0.12, 0.0), 'dns:b': (0.12, 0.0),
+                     'game:alpha': (0.14, 0.0), 'game:beta': (0.15, 0.0)}, 'isp', None),
+    ('one resolver slow', {'dns:b': (0.15, 0.0)}, 'dns_server', ['dns:127.0.0.5']),
+    ('game server loss', {'game:beta': (None, 0.5)}, 'game_server', ['game:beta']),
+    ('game server latency', {'game:alpha': (0.2, 0.0)}, 'game_server', ['game:alpha']),
+    ('all game servers', {'game:alpha': (0.2, 0.0), 'game:beta': (0.2, 0.0)}, 'upstream', None),
+]
+
+
+async def run_scenario(responders, port, warmup, rounds, faults):
+    prober = FirstByteProber(mode='tcp', interval=0.0, timeout=1.0)
+    engine = PathQualityEngine(lambda host, count, _port: prober.ping(host, count, port))
+    engine.set_targets(HOPS['gateway'][0], HOPS['internet'][0], [HOPS['dns:a'][0], HOPS['dns:b'][0]],
+                       [{'name': 'alpha', 'host': HOPS['game:alpha'][0]}, {'name': 'beta', 'host': HOPS['game:beta'][0]}])
+    for responder in responders.values():
+        responder.reset()
+
+    now = 1_000_000.0
+    for _ in range(warmup):
+        await engine.probe(now=now)
+        now += 5
+    for hop, (delay, loss) in faults.items():
+        if delay is not None:
+            responders[hop].delay = delay
+        responders[hop].loss = loss
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await engine.probe(now=now)
+        now += 5
+    elapsed = time.perf_counter() - start
+    return engine.localize(now - 5), elapsed / rounds
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--warmup', type=int, default=30, help='healthy rounds before the fault')
+    parser.add_argument('--rounds', type=int, default=12, help='degraded rounds, 5s apart')
+    args = parser.parse_args()
+
+    responders = {name: Responder(host, delay, seed) for seed, (name, (host, delay)) in enumerate(HOPS.items())}
+    # every responder listens on the same port of its own loopback address
+    port = await responders['gateway'].start(0)
+    for name, responder in responders.items():
+        if name != 'gateway':
+            await responder.start(port)
+
+    failures = 0
+    for name, faults, fault, culprits in SCENARIOS:
+        report, per_round = await run_scenario(responders, port, args.warmup, args.rounds, faults)
+        ok = report['fault'] == fault and (culprits is None or report['culprits'] == culprits)
+        failures += not ok
+        print(f"{name:20} fault={str(report['fault']):12} culprits={','.join(report['culprits']) or '-':28} "
+              f"round={per_round * 1000:6.1f}ms  {'ok' if ok else 'MISMATCH expected ' + str(fault)}")
+        if not ok:
+            for row in report['targets']:
+                print(f"    {row['name']:18} loss={row['loss_ratio']} p50={row['rtt_p50']} base={row['baseline_rtt_p50']}")
+
+    for responder in responders.values():
+        responder.server.close()
+        await responder.server.wait_closed()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
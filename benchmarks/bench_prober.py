@@ -0,0 +1,89 @@
+"""
+Compare the async prober against the old per-sample /bin/ping subprocess path.
+
+Reports samples/sec and the worst event-loop stall seen by a heartbeat task
+while probing a localhost target.
+
+    python benchmarks/bench_prober.py [--rounds 5] [--host 127.0.0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from prober import AsyncProber
+
+
+async def heartbeat(stop: asyncio.Event, stalls: list, tick: float = 0.005):
+    """sleep in small ticks and record how late each wakeup was"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(tick)
+        stalls.append((loop.time() - start - tick) * 1000)
+
+
+async def run_subprocess(host: str, rounds: int, count: int) -> int:
+    samples = 0
+    for _ in range(rounds):
+        # same command line as NetworkMonitor.ping_host_subprocess, run the old blocking way
+        result = subprocess.run(['ping', '-c', str(count), '-W', '2', host],
+                                capture_output=True, text=True, timeout=10)
+        samples += result.stdout.count('time=')
+        await asyncio.sleep(0)
+    return samples
+
+
+async def run_prober(prober: AsyncProber, host: str, rounds: int, count: int) -> int:
+    samples = 0
+    for _ in range(rounds):
+        result = await prober.ping(host, count)
+        samples += result['samples']
+    return samples
+
+
+async def measure(name: str, coro_factory):
+    stop = asyncio.Event()
+    stalls = []
+    beat = asyncio.create_task(heartbeat(stop, stalls))
+    start = time.perf_counter()
+    samples = await coro_factory()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    stalls.sort()
+    worst = stalls[-1] if stalls else 0
+    p99 = stalls[int(len(stalls) * 0.99) - 1] if stalls else 0
+    print(f"{name:<14} samples={samples:<5} {samples / elapsed:8.1f} samples/s   "
+          f"loop stall max={worst:7.2f}ms p99={p99:6.2f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--count', type=int, default=3)
+    args = parser.parse_args()
+
+    if shutil.which('ping'):
+        await measure('subprocess', lambda: run_subprocess(args.host, args.rounds, args.count))
+    else:
+        print("subprocess     skipped (no ping binary)")
+
+    for mode in ('icmp', 'tcp'):
+        prober = AsyncProber(mode=mode)
+        probe = await prober.ping(args.host, 1)
+        if not probe['success']:
+            print(f"{'prober/' + mode:<14} skipped ({mode} probes not permitted here)")
+            continue
+        await measure('prober/' + mode, lambda: run_prober(prober, args.host, args.rounds, args.count))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
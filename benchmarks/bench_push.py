@@ -0,0 +1,99 @@
+"""
+Bridge calls and payload bytes per minute: frontend polling vs pushed events.
+
+A fake monitoring loop appends a sample every 0.5s to a HistoryRing. The
+polling clients model the panel's old 1.5s timer (live ping plus the last 50
+history rows, or a history delta), the push client receives what
+EventPublisher emits. Payload size is the JSON the bridge would carry.
+
+    python benchmarks/bench_push.py [--seconds 10] [--push-interval 2.0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from history import HistoryRing
+from push import EventPublisher
+
+
+class Bridge:
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def carry(self, payload):
+        self.calls += 1
+        self.bytes += len(json.dumps(payload, default=str))
+
+
+async def sampler(ring: HistoryRing, publisher: EventPublisher, until: float):
+    rng = random.Random(1)
+    loop = asyncio.get_running_loop()
+    n = 0
+    while loop.time() < until:
+        rtt = 20 + rng.random() * 5
+        ring.append(time.time(), rtt, 1.0, 0.0, 95, 'excellent', 4e6, 5e5, 12.0)
+        publisher.append('network_sample', ring.point(ring.seq - 1))
+        n += 1
+        if n % 60 == 0:
+            # a probe result every ping_interval (30s)
+            publisher.publish('network_status', {'quality': {'quality': 'excellent', 'avg_latency': rtt}})
+        await asyncio.sleep(0.5)
+
+
+async def poll_full(ring: HistoryRing, bridge: Bridge, until: float):
+    loop = asyncio.get_running_loop()
+    while loop.time() < until:
+        bridge.carry(ring.window(1)[-1]['live_ping'] if len(ring) else 0)
+        bridge.carry(ring.window(50))
+        await asyncio.sleep(1.5)
+
+
+async def poll_delta(ring: HistoryRing, bridge: Bridge, until: float):
+    loop = asyncio.get_running_loop()
+    cursor = -1
+    while loop.time() < until:
+        bridge.carry(ring.window(1)[-1]['live_ping'] if len(ring) else 0)
+        delta = ring.since(cursor, 50)
+        cursor = delta['seq']
+        bridge.carry(delta)
+        await asyncio.sleep(1.5)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--push-interval', type=float, default=2.0)
+    args = parser.parse_args()
+
+    ring = HistoryRing()
+    pushed = Bridge()
+
+    async def emit(event, payload):
+        pushed.carry(payload)
+
+    publisher = EventPublisher(emit, default_interval=args.push_interval)
+    full, delta = Bridge(), Bridge()
+    until = asyncio.get_running_loop().time() + args.seconds
+    await asyncio.gather(
+        sampler(ring, publisher, until),
+        poll_full(ring, full, until),
+        poll_delta(ring, delta, until)
+    )
+    await asyncio.sleep(args.push_interval)
+
+    scale = 60 / args.seconds
+    for name, bridge in (('poll full', full), ('poll delta', delta), ('push', pushed)):
+        print(f"{name:11} {bridge.calls * scale:7.1f} calls/min {bridge.bytes * scale / 1024:9.1f} KiB/min")
+    print(f"publisher   {publisher.stats()}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Rollup update cost and accuracy against brute force over the raw samples.
+
+Feeds a synthetic multi-hour latency trace through Rollups, then checks the
+merged last-hour summary and every 1m bucket against exact statistics: counts,
+extremes, means and loss exactly, quantiles within the sketch's relative
+accuracy. Bucket boundaries, sample counts and retention are checked for every
+resolution. Exits 1 when any check fails.
+
+    python benchmarks/bench_rollups.py [--hours 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from rollups import RESOLUTIONS, Rollups
+from streamstats import DDSketch
+
+# the sketch's relative accuracy, plus float slack for values right on a bucket edge
+QUANTILE_BOUND = 0.01 + 1e-9
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def synthetic_trace(hours: float, step: float = 0.5, seed: int = 7):
+    """lognormal-ish latency with occasional spikes and loss bursts"""
+    rng = random.Random(seed)
+    t0 = 1_700_000_000.0
+    for n in range(int(hours * 3600 / step)):
+        rtt = rng.lognormvariate(3.2, 0.35)
+        if rng.random() < 0.02:
+            rtt += rng.uniform(80, 300)
+        loss = 100.0 if rng.random() < 0.01 else 0.0
+        yield t0 + n * step, (None if loss else rtt), loss, rng.uniform(0, 5e6), rng.uniform(0, 1e6)
+
+
+def relative_error(estimate, exact):
+    return abs(estimate - exact) / exact if exact else 0.0
+
+
+def check_buckets(rollups: Rollups, trace: list) -> list:
+    """boundaries, per-bucket sample counts and retention of every resolution"""
+    errors = []
+    first, last = trace[0][0], trace[-1][0]
+    for name, (width, keep) in RESOLUTIONS.items():
+        buckets = rollups.buckets(name, first)
+        starts = [b['start'] for b in buckets]
+        if any(start % width for start in starts):
+            errors.append(f"{name}: bucket start not aligned to {width}s")
+        if any(b - a != width for a, b in zip(starts, starts[1:])):
+            errors.append(f"{name}: buckets not contiguous")
+        # closed buckets kept plus the open one, the trace has no gaps
+        expected = min(keep + 1, int((last - (first - first % width)) // width) + 1)
+        if len(buckets) != expected:
+            errors.append(f"{name}: {len(buckets)} buckets, expected {expected}")
+        for bucket in buckets:
+            samples = sum(1 for s in trace if bucket['start'] <= s[0] < bucket['start'] + width)
+            if bucket['samples'] != samples:
+                errors.append(f"{name}: bucket at {bucket['start']} holds {bucket['samples']} samples, expected {samples}")
+                break
+        # a bucket is returned only while it still overlaps `since`, one ending right at it is out
+        for since, want in ((starts[-1] - width / 2, starts[-2:]), (starts[-1], starts[-1:])):
+            got = [b['start'] for b in rollups.buckets(name, since)]
+            if got != want:
+                errors.append(f"{name}: buckets({since}) returned {got}, expected {want}")
+    return errors
+
+
+def check_quantiles(seed: int = 11) -> list:
+    """sketch quantiles within the relative accuracy of the exact ones, before and after a merge"""
+    rng = random.Random(seed)
+    a, b = DDSketch(), DDSketch()
+    values = []
+    for n in range(20000):
+        value = rng.lognormvariate(3, 1)
+        values.append(value)
+        (a if n % 2 else b).add(value)
+    a.merge(b)
+    errors = []
+    for q in (0.0, 0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0):
+        error = relative_error(a.quantile(q), exact_quantile(values, q))
+        if error > QUANTILE_BOUND:
+            errors.append(f"sketch q{q}: relative error {error:.3%}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float, default=3)
+    args = parser.parse_args()
+    errors = []
+
+    trace = list(synthetic_trace(args.hours))
+    rollups = Rollups()
+    start = time.perf_counter()
+    for sample in trace:
+        rollups.add(*sample)
+    elapsed = time.perf_counter() - start
+    print(f"samples {len(trace):,}  update {elapsed / len(trace) * 1e6:.2f}us/sample")
+
+    now = trace[-1][0]
+    since = now - 3600
+    start = time.perf_counter()
+    summary = rollups.summary(since, now)
+    query_ms = (time.perf_counter() - start) * 1000
+
+    # brute force over the same buckets the summary merged (whole minutes)
+    window_start = since - since % 60
+    window = [s for s in trace if s[0] >= window_start]
+    rtts = [s[1] for s in window if s[1] is not None]
+    print(f"last hour summary in {query_ms:.2f}ms ({summary['resolution']} buckets)")
+    checks = [
+        ('count', summary['count'], len(rtts)),
+        ('min', summary['rtt_min'], min(rtts)),
+        ('max', summary['rtt_max'], max(rtts)),
+        ('mean', summary['rtt_mean'], sum(rtts) / len(rtts)),
+        ('p50', summary['rtt_p50'], exact_quantile(rtts, 0.5)),
+        ('p95', summary['rtt_p95'], exact_quantile(rtts, 0.95)),
+        ('p99', summary['rtt_p99'], exact_quantile(rtts, 0.99)),
+        ('loss', summary['loss_ratio'], sum(s[2] for s in window) / len(window) / 100),
+        ('down peak', summary['download_bps_peak'], max(s[3] for s in window)),
+    ]
+    for name, estimate, exact in checks:
+        error = relative_error(estimate, exact)
+        print(f"  {name:<10} rollup {estimate:14.4f}  exact {exact:14.4f}  err {error:.3%}")
+        # only quantiles are estimated, everything else is exact
+        if error > (QUANTILE_BOUND if name.startswith('p') else 1e-9):
+            errors.append(f"last hour {name}: relative error {error:.3%}")
+
+    worst = 0.0
+    for bucket in rollups.buckets('1m', trace[0][0]):
+        raw = [s[1] for s in trace if bucket['start'] <= s[0] < bucket['start'] + 60 and s[1] is not None]
+        if bucket['count'] != len(raw):
+            errors.append(f"1m bucket at {bucket['start']}: {bucket['count']} rtts, expected {len(raw)}")
+        if raw:
+            worst = max(worst, relative_error(bucket['rtt_p95'], exact_quantile(raw, 0.95)))
+    print(f"worst per-minute p95 relative error {worst:.3%} (sketch bound 1%)")
+    if worst > QUANTILE_BOUND:
+        errors.append(f"per-minute p95: relative error {worst:.3%}")
+
+    errors += check_buckets(rollups, trace)
+    errors += check_quantiles()
+    for error in errors:
+        print(f"FAIL {error}")
+    print(f"{'failed' if errors else 'ok'}")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Event-loop latency while slow fake probes run through the ProbeScheduler.
+
+A heartbeat task measures how late the loop wakes up while a blocking 1s
+"probe" runs inline (the old way), in the scheduler's thread pool, and as a
+slow subprocess. Also checks that identical in-flight requests share one job,
+that timeouts kill the child and that cancelling a group releases its waiters
+without cancelling a job another group still waits on.
+Exits non-zero if the scheduled runs stall the loop longer than --threshold.
+
+    python benchmarks/bench_scheduler.py [--delay 1.0] [--threshold 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from scheduler import ProbeScheduler
+
+
+async def heartbeat(stop: asyncio.Event, stalls: list, tick: float = 0.005):
+    """sleep in small ticks and record how late each wakeup was"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(tick)
+        stalls.append((loop.time() - start - tick) * 1000)
+
+
+async def measure(job) -> float:
+    """worst loop stall in ms while `job` runs"""
+    stop = asyncio.Event()
+    stalls = []
+    beat = asyncio.create_task(heartbeat(stop, stalls))
+    await asyncio.sleep(0.02)
+    await job()
+    stop.set()
+    await beat
+    return max(stalls)
+
+
+def slow_probe(delay: float) -> str:
+    # stands in for a blocking nmcli scan or socket connect
+    time.sleep(delay)
+    return 'ok'
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=1.0)
+    parser.add_argument('--threshold', type=float, default=50.0, help='max allowed loop stall in ms')
+    args = parser.parse_args()
+
+    scheduler = ProbeScheduler()
+    slow_command = [sys.executable, '-c', f'import time; time.sleep({args.delay}); print("ok")']
+
+    async def inline():
+        slow_probe(args.delay)
+
+    async def in_pool():
+        await scheduler.run_blocking(('slow',), slow_probe, args.delay, timeout=args.delay + 2)
+
+    async def as_subprocess():
+        await scheduler.run_command(slow_command, timeout=args.delay + 2)
+
+    inline_stall = await measure(inline)
+    pool_stall = await measure(in_pool)
+    command_stall = await measure(as_subprocess)
+    print(f"inline blocking probe   worst stall {inline_stall:8.1f}ms")
+    print(f"thread pool             worst stall {pool_stall:8.1f}ms")
+    print(f"asyncio subprocess      worst stall {command_stall:8.1f}ms")
+
+    # five identical requests while the first is still running -> one process
+    submitted = scheduler.counters['submitted']
+    results = await asyncio.gather(*(scheduler.run_command(slow_command, timeout=args.delay + 2) for _ in range(5)))
+    started = scheduler.counters['submitted'] - submitted
+    print(f"5 identical requests    started {started} job(s), all got {results[0][1].strip()!r}")
+
+    # a timeout has to release the caller and kill the child
+    start = time.perf_counter()
+    try:
+        await scheduler.run_command(slow_command, timeout=0.2)
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    print(f"timeout 0.2s            released after {(time.perf_counter() - start) * 1000:.0f}ms, timed out={timed_out}")
+
+    # stop_monitoring cancels the monitor group
+    waiter = asyncio.create_task(scheduler.run_command(slow_command, timeout=args.delay + 2, group='monitor'))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    cancelled = scheduler.cancel('monitor')
+    try:
+        await waiter
+    except asyncio.CancelledError:
+        pass
+    print(f"cancel('monitor')       cancelled {cancelled} job(s) in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    # a UI call joining the loop's probe must still get the result after stop_monitoring
+    monitor = asyncio.create_task(scheduler.run_command(slow_command, timeout=args.delay + 2, group='monitor'))
+    await asyncio.sleep(0.05)
+    ui = asyncio.create_task(scheduler.run_command(slow_command, timeout=args.delay + 2))
+    await asyncio.sleep(0.05)
+    shared_cancelled = scheduler.cancel('monitor')
+    try:
+        ui_result = (await ui)[1].strip()
+    except asyncio.CancelledError:
+        ui_result = 'CancelledError'
+    await monitor
+    print(f"cancel('monitor') shared cancelled {shared_cancelled} job(s), UI caller got {ui_result!r}")
+    print(f"counters                {scheduler.stats()}")
+    scheduler.shutdown()
+
+    failures = []
+    if max(pool_stall, command_stall) > args.threshold:
+        failures.append(f"loop stalled {max(pool_stall, command_stall):.1f}ms > {args.threshold}ms")
+    if started != 1:
+        failures.append(f"identical requests started {started} jobs")
+    if not timed_out:
+        failures.append("timeout did not fire")
+    if cancelled != 1:
+        failures.append("group cancel missed the running job")
+    if shared_cancelled != 0 or ui_result != 'ok':
+        failures.append(f"cancelling the monitor group broke a UI waiter ({ui_result!r})")
+    if scheduler.stats()['running'] != 0:
+        failures.append(f"{scheduler.stats()['running']} jobs left running")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,148 @@
+"""
+Size and speed of session exports against JSON.
+
+A synthetic session (a sample every 0.5s, a probe every 5s, bandwidth noise,
+occasional loss) goes through every export format plus two JSON baselines:
+the point dicts get_network_history returns and a compact list of row lists.
+Reports file size, bytes per sample, write and read throughput and the peak
+Python heap while writing, then checks every format reads back what was
+written (exact for columnar and parquet, within CSV's rounding).
+
+    python benchmarks/bench_sessionio.py [--hours 6] [--chunk 4096]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+import sessionio
+from history import QUALITY_CODES, make_point
+from store import RECORD
+
+
+def synthetic_rows(hours: float, start: float, seed: int = 3) -> list:
+    """rows the way the store holds them, float32 columns included"""
+    rng = random.Random(seed)
+    rows = []
+    rtt = jitter = loss = 0.0
+    score, quality, dns = 100.0, 'excellent', 12.0
+    for i in range(int(hours * 7200)):
+        now = start + i * 0.5 + rng.uniform(0, 0.002)
+        if i % 10 == 0:
+            rtt = max(1.0, rng.gauss(25, 3))
+            jitter = abs(rng.gauss(1.5, 0.5))
+            loss = 33.3 if rng.random() < 0.02 else 0.0
+            score = 90.0 if loss else 100.0
+            quality = 'good' if loss else 'excellent'
+        if i % 40 == 0:
+            dns = max(1.0, rng.gauss(12, 2))
+        row = (now, rtt, jitter, loss, score, rng.uniform(0, 4e7), rng.uniform(0, 4e6), dns, QUALITY_CODES[quality])
+        # through the store's record so floats are what an export actually sees
+        rows.append(RECORD.unpack(RECORD.pack(*row)))
+    return rows
+
+
+def export_json_points(rows, path: str) -> dict:
+    with open(path, 'w') as f:
+        json.dump([make_point(row) for row in rows], f)
+    return {'bytes': os.path.getsize(path)}
+
+
+def export_json_rows(rows, path: str) -> dict:
+    with open(path, 'w') as f:
+        json.dump([list(row) for row in rows], f, separators=(',', ':'))
+    return {'bytes': os.path.getsize(path)}
+
+
+def read_json(path: str) -> int:
+    with open(path) as f:
+        return len(json.load(f))
+
+
+def measure(name: str, write, read, rows: list) -> dict:
+    # rows already exist, the peak is what the writer itself holds
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = write(iter(rows))
+    write_s = time.perf_counter() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    count = read()
+    read_s = time.perf_counter() - start
+    assert count == len(rows), f"{name}: read {count} of {len(rows)} rows"
+    return {'name': name, 'bytes': result['bytes'], 'write_s': write_s, 'read_s': read_s, 'peak': peak}
+
+
+def check_roundtrip(path: str, fmt: str, rows: list) -> int:
+    """rows that differ from what was written beyond the format's precision"""
+    bad = 0
+    for written, read in zip(rows, sessionio.read_rows(path)):
+        if abs(written[0] - read[0]) > (5e-4 if fmt == 'csv' else 1e-6) or written[8] != read[8]:
+            bad += 1
+            continue
+        for a, b in zip(written[1:8], read[1:8]):
+            if fmt == 'csv' and not math.isclose(a, b, rel_tol=1e-6, abs_tol=0.51):
+                bad += 1
+                break
+            if fmt != 'csv' and a != b:
+                bad += 1
+                break
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hours', type=float, default=6)
+    parser.add_argument('--chunk', type=int, default=4096)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.hours, time.time() - args.hours * 3600)
+    count = len(rows)
+    print(f"{args.hours:g}h session, {count} samples, chunks of {args.chunk}")
+    failed = False
+    with tempfile.TemporaryDirectory() as root:
+        results = []
+        path = os.path.join(root, 'points.json')
+        results.append(measure('json points', lambda rows: export_json_points(rows, path),
+                               lambda: read_json(path), rows))
+        compact = os.path.join(root, 'rows.json')
+        results.append(measure('json rows', lambda rows: export_json_rows(rows, compact),
+                               lambda: read_json(compact), rows))
+        for fmt in ['columnar', 'parquet', 'csv']:
+            if fmt not in sessionio.formats():
+                print(f"  {fmt:12} skipped, pyarrow is not installed")
+                continue
+            out = os.path.join(root, 'session' + sessionio.EXTENSIONS[fmt])
+            results.append(measure(
+                fmt,
+                lambda rows, out=out, fmt=fmt: sessionio.export_rows(rows, out, fmt, {'label': 'bench'}, args.chunk),
+                lambda out=out: sum(len(chunk) for chunk in sessionio.read_chunks(out)),
+                rows))
+            bad = check_roundtrip(out, fmt, rows)
+            if bad:
+                print(f"  {fmt}: {bad} rows did not survive the round trip")
+                failed = True
+
+        base = results[0]['bytes']
+        for r in results:
+            print(f"  {r['name']:12} {r['bytes'] / 1e6:8.2f}MB  {r['bytes'] / count:6.1f}B/sample  "
+                  f"{base / r['bytes']:6.1f}x smaller  write {count / r['write_s'] / 1e3:7.0f}k rows/s  "
+                  f"read {count / r['read_s'] / 1e3:7.0f}k rows/s  peak heap {r['peak'] / 1e6:7.2f}MB")
+
+        analysis = sessionio.analyze(os.path.join(root, 'session.nss'))
+        print(f"  analyze: {analysis['rows']} rows, rtt p50 {analysis['rtt_p50']:.1f}ms "
+              f"p95 {analysis['rtt_p95']:.1f}ms, loss {analysis['loss_avg']:.2f}%, {len(analysis['points'])} chart points")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-sample update cost of the streaming estimators and sketch error vs exact quantiles.
+
+    python benchmarks/bench_streamstats.py [--samples 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from streamstats import DDSketch, LatencyEstimator
+
+
+def traces(n: int, seed: int = 11):
+    rng = random.Random(seed)
+    yield 'lognormal', [rng.lognormvariate(3.0, 0.4) for _ in range(n)]
+    # wifi with a second mode from retransmits
+    yield 'bimodal', [rng.gauss(18, 2) if rng.random() < 0.85 else rng.gauss(70, 10) for _ in range(n)]
+    # mostly flat with rare large spikes
+    yield 'spiky', [rng.uniform(9, 12) if rng.random() < 0.995 else rng.uniform(200, 900) for _ in range(n)]
+
+
+def exact(values, q):
+    return values[int(q * (len(values) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=200_000)
+    args = parser.parse_args()
+
+    for name, values in traces(args.samples):
+        values = [max(0.01, v) for v in values]
+
+        sketch = DDSketch()
+        start = time.perf_counter()
+        for v in values:
+            sketch.add(v)
+        sketch_us = (time.perf_counter() - start) / len(values) * 1e6
+
+        estimator = LatencyEstimator()
+        start = time.perf_counter()
+        for v in values:
+            estimator.update(v)
+        estimator_us = (time.perf_counter() - start) / len(values) * 1e6
+
+        ordered = sorted(values)
+        errors = []
+        for q in (0.5, 0.9, 0.95, 0.99, 0.999):
+            truth = exact(ordered, q)
+            errors.append(f"p{q * 100:g}={abs(sketch.quantile(q) - truth) / truth:.3%}")
+        print(f"{name:<10} sketch {sketch_us:.2f}us/sample  estimator {estimator_us:.2f}us/sample  "
+              f"bins {len(sketch.bins)}")
+        print(f"{'':<10} relative error {' '.join(errors)}  (bound 1%)")
+
+
+if __name__ == '__main__':
+    main()
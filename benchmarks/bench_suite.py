@@ -0,0 +1,419 @@
+"""
+Load and regression suite for the whole plugin, run headless.
+
+main.py is imported against the decky stub from harness.py. Probes go to
+loopback stand-ins in a child process (TCP path targets, a DNS server), the
+subprocess paths run the fake ping and nmcli from benchmarks/fakebin.
+
+  loop     CPU seconds per hour of the monitoring loop: fixed 0.5s TCP
+           probing, adaptive TCP probing, and fixed 2s probing through ping
+  history  HistoryRing and SegmentStore append and query throughput
+  polling  callable latency while simulated UI pollers hit the plugin
+           during monitoring, the event loop lag it causes and how many
+           quality probes the polls started besides the loop's own
+  memory   heap and RSS growth over a multi-hour session on a virtual clock:
+           the real probe, sample and push code with faked probe results,
+           a sample every 0.5s and a probe round every --probe-every seconds
+
+Every metric is compared with benchmarks/baselines.json. One worse than its
+baseline by more than its tolerance is a regression and the exit status is 1,
+`--update-baseline` rewrites the file from this run. Timings depend on the
+machine, regenerate the baselines where the suite runs in CI.
+
+    python benchmarks/bench_suite.py [--only loop,polling] [--seconds 20] [--hours 6] [--update-baseline]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+import psutil
+
+import harness
+
+decky = harness.install_decky(level=logging.CRITICAL)
+harness.use_fakebin(ping_ms=20, ping_jitter=2, nmcli_aps=40)
+sys.path.insert(0, harness.ROOT)
+
+import main as sentinel
+from history import HistoryRing
+from metrics import LoopLagMonitor
+from prober import summarize
+from store import SegmentStore
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+# loopback addresses standing in for the quality anchor, the gateway and a game server
+ANCHOR, GATEWAY, GAME = '127.0.0.2', '127.0.0.3', '127.0.0.4'
+STANDINS = {
+    'path': {'kind': 'tcp', 'hosts': [ANCHOR, GATEWAY, GAME], 'delay': 0.02},
+    'dns': {'kind': 'dns', 'delay': 0.005},
+    # path probes of the dns server fall back to TCP on its port
+    'dns_tcp': {'kind': 'tcp', 'port': 'dns', 'delay': 0.005},
+}
+LOOP_MODES = {
+    'fixed_tcp': {'probe_mode': 'tcp', 'adaptive_probing': False, 'ping_interval': 0.5},
+    'adaptive_tcp': {'probe_mode': 'tcp', 'adaptive_probing': True},
+    'fixed_ping': {'probe_mode': 'subprocess', 'adaptive_probing': False, 'ping_interval': 2},
+}
+# (direction, relative tolerance, absolute slack) by metric suffix, the slack keeps
+# microsecond latencies and near-zero growth from failing on noise
+TOLERANCES = [
+    ('_per_s', 'higher', 0.5, 0.0),
+    ('cpu_s_per_hour', 'lower', 0.5, 2.0),
+    ('_ms', 'lower', 1.0, 0.5),
+    ('_kb_per_hour', 'lower', 0.5, 64.0),
+    ('_mb', 'lower', 0.25, 0.5),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)] if ordered else 0.0
+
+
+def cpu_seconds(who: int) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def start_plugin(net: harness.Standins, **overrides) -> sentinel.Plugin:
+    """a loaded plugin probing the stand-ins, state under a fresh runtime dir"""
+    decky.DECKY_PLUGIN_RUNTIME_DIR = tempfile.mkdtemp(prefix='runtime-', dir=decky.scratch)
+    sentinel.QUALITY_ANCHOR = ANCHOR
+    plugin = sentinel.Plugin()
+    await plugin._main()
+    if plugin.link_watcher:
+        # keep the dumped link state but stop netlink from moving the gateway back
+        plugin.link_watcher.stop()
+        plugin.link_watcher.state['gateway'] = GATEWAY
+    settings = {
+        'dns_servers': [net.address('dns')],
+        'probe_tcp_port': net.ports['path'],
+        'path_game_servers': [{'name': 'bench', 'host': GAME, 'port': net.ports['path']}],
+        'store_flush_interval': 10,
+    }
+    settings.update(overrides)
+    await plugin.update_settings(settings)
+    return plugin
+
+
+async def bench_loop(net: harness.Standins, seconds: float) -> Dict[str, float]:
+    results = {}
+    for mode, settings in LOOP_MODES.items():
+        plugin = await start_plugin(net, **settings)
+        await plugin.start_monitoring()
+        await asyncio.sleep(2)
+        probes = plugin.monitor.metrics.ops['monitor.probe'].count
+        self_cpu, child_cpu = cpu_seconds(resource.RUSAGE_SELF), cpu_seconds(resource.RUSAGE_CHILDREN)
+        start = time.monotonic()
+        await asyncio.sleep(seconds)
+        wall = time.monotonic() - start
+        self_cpu = cpu_seconds(resource.RUSAGE_SELF) - self_cpu
+        child_cpu = cpu_seconds(resource.RUSAGE_CHILDREN) - child_cpu
+        probes = plugin.monitor.metrics.ops['monitor.probe'].count - probes
+        await plugin._unload()
+
+        # the fake ping's own cost says nothing about the plugin, it is shown but not compared
+        results[f'loop.{mode}.cpu_s_per_hour'] = self_cpu / wall * 3600
+        print(f"  {mode:13} {self_cpu / wall * 3600:6.1f} cpu s/h  children {child_cpu / wall * 3600:6.1f} cpu s/h  "
+              f"{probes / wall * 60:5.1f} probes/min")
+    return results
+
+
+def bench_history(points: int) -> Dict[str, float]:
+    ring = HistoryRing(7200)
+    start = time.perf_counter()
+    for n in range(points):
+        ring.append(n * 0.5, 23.5, 1.2, 0.0, 80, 'good', 1.5e6, 2.0e5, 12.0)
+    appends = points / (time.perf_counter() - start)
+
+    rng = random.Random(1)
+    queries = 2000
+    start = time.perf_counter()
+    for _ in range(queries):
+        ring.since(ring.seq - rng.randint(1, 500), 500)
+    since = queries / (time.perf_counter() - start)
+    end = ring.timestamp[(ring.seq - 1) % ring.capacity]
+    start = time.perf_counter()
+    for _ in range(200):
+        ring.downsample(end - 3600, end, 120)
+    downsample = 200 / (time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = SegmentStore(root, segment_bytes=1024 * 1024)
+        store.load()
+        store.open_session()
+        base = time.time() - points * 0.5
+        start = time.perf_counter()
+        for n in range(points):
+            store.append(base + n * 0.5, 23.5, 1.2, 0.0, 80, 'good', 1.5e6, 2.0e5, 12.0)
+        store_appends = points / (time.perf_counter() - start)
+        store.flush()
+        start = time.perf_counter()
+        rows = sum(1 for _row in store.scan(base, base + points))
+        scan = rows / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(20):
+            store.downsample(base, base + points * 0.5, 120)
+        store_downsample = 20 / (time.perf_counter() - start)
+        store.close()
+
+    print(f"  ring   {appends:10.0f} appends/s  {since:8.0f} since(500)/s  {downsample:6.0f} downsample(1h)/s")
+    print(f"  store  {store_appends:10.0f} appends/s  {scan:8.0f} rows scanned/s  "
+          f"{store_downsample:6.1f} downsample(all)/s")
+    return {
+        'history.ring_append_per_s': appends,
+        'history.ring_since_per_s': since,
+        'history.ring_downsample_per_s': downsample,
+        'history.store_append_per_s': store_appends,
+        'history.store_scan_rows_per_s': scan,
+    }
+
+
+async def bench_polling(net: harness.Standins, pollers: int, seconds: float, period: float) -> Dict[str, float]:
+    plugin = await start_plugin(net, **LOOP_MODES['fixed_tcp'])
+    # finer than the plugin's own 1s sampling so short stalls between polls show up
+    plugin.loop_lag.stop()
+    plugin.loop_lag = LoopLagMonitor(interval=0.1)
+    plugin.loop_lag.start()
+    # quality probes outside the loop's 'monitor' group, polls should only read its results
+    ui_probes = []
+    test_connection_quality = plugin.monitor.test_connection_quality
+
+    async def counted_quality(group: str = 'default', ping_result=None):
+        if group != 'monitor':
+            ui_probes.append(group)
+        return await test_connection_quality(group, ping_result)
+
+    plugin.monitor.test_connection_quality = counted_quality
+    await plugin.start_monitoring()
+    await asyncio.sleep(2)
+    # what the frontend calls on a timer, diagnostics from an open debug panel
+    rotation = ['get_network_status', 'get_live_ping', 'get_network_history_since', 'get_connection_info',
+                'get_bandwidth_stats', 'get_path_quality', 'get_incidents', 'get_diagnostics']
+    latencies: Dict[str, List[float]] = {name: [] for name in rotation}
+    deadline = time.monotonic() + seconds
+
+    async def poller(offset: int):
+        cursor = -1
+        n = offset
+        while time.monotonic() < deadline:
+            name = rotation[n % len(rotation)]
+            args = (cursor,) if name == 'get_network_history_since' else ()
+            start = time.perf_counter()
+            result = await getattr(plugin, name)(*args)
+            latencies[name].append((time.perf_counter() - start) * 1000)
+            if name == 'get_network_history_since':
+                cursor = result['seq']
+            n += 1
+            await asyncio.sleep(period)
+
+    start = time.monotonic()
+    await asyncio.gather(*(poller(i) for i in range(pollers)))
+    wall = time.monotonic() - start
+    ui_probe_count = len(ui_probes)
+    lag = plugin.loop_lag.snapshot()
+    await plugin._unload()
+
+    everything = [ms for values in latencies.values() for ms in values]
+    results = {
+        'polling.calls_per_s': len(everything) / wall,
+        'polling.p50_ms': percentile(everything, 0.5),
+        'polling.p99_ms': percentile(everything, 0.99),
+        'polling.loop_lag_p99_ms': lag['p99_ms'] or 0.0,
+        'polling.ui_quality_probes': float(ui_probe_count),
+    }
+    for name, values in latencies.items():
+        results[f'polling.{name}.p95_ms'] = percentile(values, 0.95)
+        print(f"  {name:26} {len(values):5} calls  p50 {percentile(values, 0.5):7.3f}ms  "
+              f"p95 {percentile(values, 0.95):7.3f}ms  p99 {percentile(values, 0.99):7.3f}ms")
+    print(f"  {pollers} pollers every {period * 1000:.0f}ms: {results['polling.calls_per_s']:.0f} calls/s, "
+          f"p99 {results['polling.p99_ms']:.3f}ms, loop lag p99 {results['polling.loop_lag_p99_ms']:.2f}ms "
+          f"max {lag['max_ms']:.2f}ms, {ui_probe_count} quality probes started by polls")
+    return results
+
+
+class VirtualPath:
+    """ping_target stand-in for the memory run: a synthetic latency trace with episodes, no sockets"""
+
+    def __init__(self, seed: int = 5):
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self.episode_until = 0.0
+        self.kind = None
+
+    def advance(self, now: float):
+        self.now = now
+        if now >= self.episode_until and self.rng.random() < 0.0005:
+            self.kind = self.rng.choice(['spike', 'loss', 'outage'])
+            self.episode_until = now + self.rng.uniform(30, 300)
+
+    async def ping(self, host: str, count: int = 3, port=None, group: str = 'default') -> Dict:
+        base = {ANCHOR: 25.0, GATEWAY: 2.0}.get(host, 30.0)
+        rtts = []
+        for _ in range(count):
+            rtt = base + self.rng.gauss(0, base * 0.05)
+            if self.now < self.episode_until:
+                if self.kind == 'spike':
+                    rtt += 90
+                elif self.kind == 'outage' or self.rng.random() < 0.3:
+                    rtt = None
+            rtts.append(rtt)
+        return summarize(host, rtts, 'tcp')
+
+
+async def bench_memory(net: harness.Standins, hours: float, probe_every: float = 5.0,
+                       step: float = 0.5) -> Dict[str, float]:
+    plugin = await start_plugin(net, adaptive_probing=False, ping_interval=probe_every, push_interval=0)
+    # no batching delay, every push goes out on the next loop turn like it would in real time
+    plugin.publisher.intervals = {}
+    path = VirtualPath()
+    plugin.monitor.ping_target = path.ping
+    plugin.monitor.monitoring = True
+    if plugin.store:
+        plugin.store.open_session()
+    process = psutil.Process()
+
+    tracemalloc.start()
+    now = time.time() - hours * 3600
+    ticks_per_hour = int(3600 / step)
+    hourly = []
+    started = time.perf_counter()
+    for tick in range(int(hours * ticks_per_hour) + 1):
+        if tick % ticks_per_hour == 0:
+            if plugin.store_flush_task:
+                await plugin.store_flush_task
+            hourly.append((tracemalloc.get_traced_memory()[0], process.memory_info().rss))
+        path.advance(now)
+        plugin.bandwidth_stats = {'download_bps': random.uniform(0, 5e7), 'upload_bps': random.uniform(0, 5e6)}
+        probed = tick % int(probe_every / step) == 0
+        if probed:
+            with plugin.monitor.metrics.time('monitor.probe'):
+                quality = await plugin._probe_quality(now)
+            plugin._apply_quality(quality, now)
+        plugin._record_sample(now, probed)
+        if tick % int(20 / step) == 0:
+            plugin.last_dns_status = await plugin.test_dns()
+        if tick % int(300 / step) == 0:
+            # a slowly changing neighbourhood, some BSSIDs leave and new ones show up
+            harness.use_fakebin(nmcli_offset=tick // int(900 / step), nmcli_seed=tick)
+            plugin.wifi_history.update(await plugin._wifi_scan(rescan=False), now)
+        now += step
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+    incidents = len(plugin.anomaly.incidents)
+    await plugin._unload()
+
+    for hour, (heap, rss) in enumerate(hourly):
+        print(f"  hour {hour:2}  heap {heap / 1e6:7.2f}MB  rss {rss / 1e6:7.1f}MB")
+    settled = hourly[1:] if len(hourly) > 2 else hourly
+    span = max(1, len(settled) - 1)
+    heap_growth = (settled[-1][0] - settled[0][0]) / span / 1024
+    rss_growth = (settled[-1][1] - settled[0][1]) / span / 1024
+    print(f"  {hours:g}h simulated in {elapsed:.0f}s, {incidents} incidents, "
+          f"heap +{heap_growth:.0f}KB/h rss +{rss_growth:.0f}KB/h after the first hour")
+    return {
+        'memory.heap_mb': hourly[-1][0] / 1e6,
+        'memory.heap_growth_kb_per_hour': max(heap_growth, 0.0),
+        'memory.rss_growth_kb_per_hour': max(rss_growth, 0.0),
+    }
+
+
+def rule(metric: str):
+    for suffix, direction, tolerance, slack in TOLERANCES:
+        if metric.endswith(suffix):
+            return direction, tolerance, slack
+    return 'lower', 0.5, 0.0
+
+
+def compare(results: Dict[str, float], baselines: Dict[str, Dict]) -> List[str]:
+    regressions = []
+    for metric, value in sorted(results.items()):
+        baseline = baselines.get(metric)
+        if baseline is None:
+            print(f"  {metric:48} {value:12.3f}  (no baseline)")
+            continue
+        expected, direction = baseline['value'], baseline['direction']
+        tolerance, slack = baseline['tolerance'], baseline.get('slack', 0.0)
+        if direction == 'lower':
+            worse = value > expected * (1 + tolerance) + slack
+        else:
+            worse = value < expected * (1 - tolerance) - slack
+        change = (value - expected) / expected * 100 if expected else 0.0
+        print(f"  {metric:48} {value:12.3f}  baseline {expected:12.3f}  {change:+6.0f}%"
+              f"{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(metric)
+    return regressions
+
+
+async def run(args) -> Dict[str, float]:
+    results = {}
+    only = set(args.only.split(',')) if args.only else {'loop', 'history', 'polling', 'memory'}
+    with harness.Standins(STANDINS) as net:
+        if 'loop' in only:
+            print(f"monitoring loop, {args.seconds:g}s per mode")
+            results.update(await bench_loop(net, args.seconds))
+        if 'history' in only:
+            print(f"history, {args.points} points")
+            results.update(bench_history(args.points))
+        if 'polling' in only:
+            print(f"callables under polling, {args.seconds:g}s")
+            results.update(await bench_polling(net, args.pollers, args.seconds, args.period))
+        if 'memory' in only:
+            print(f"memory over a simulated {args.hours:g}h session")
+            results.update(await bench_memory(net, args.hours, args.probe_every))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', help='comma separated: loop,history,polling,memory')
+    parser.add_argument('--seconds', type=float, default=20, help='measured seconds per loop mode and for polling')
+    parser.add_argument('--points', type=int, default=200_000)
+    parser.add_argument('--pollers', type=int, default=8)
+    parser.add_argument('--period', type=float, default=0.05, help='seconds between calls of one poller')
+    parser.add_argument('--hours', type=float, default=6)
+    parser.add_argument('--probe-every', type=float, default=5, help='probe interval of the simulated session')
+    parser.add_argument('--baseline', default=BASELINES)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if decky.missing:
+        print(f"decky attributes used but not in decky.pyi: {', '.join(sorted(decky.missing))}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    if args.update_baseline:
+        for metric, value in results.items():
+            direction, tolerance, slack = rule(metric)
+            baselines[metric] = {'value': round(value, 4), 'direction': direction, 'tolerance': tolerance,
+                                 'slack': slack}
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baselines written to {args.baseline}")
+        return
+    print("against baselines")
+    regressions = compare(results, baselines)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
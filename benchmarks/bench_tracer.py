@@ -0,0 +1,221 @@
+"""
+Route tracer checks: error-queue parsing, loopback traces and a network
+namespace stand-in for a real path.
+
+The namespace topology (needs root and iproute2, skipped otherwise) is
+
+    client --- r1 --- r2 --- dest
+                \\          /
+                 -- r4 ----
+
+with 20ms of netem delay on r2 -> dest (when sch_netem is available) and a
+prefix r2 blackholes, which drops probes silently before their TTL runs out
+there. It checks hop addresses and per-hop added latency, that a trace into the
+blackhole takes about one timeout rather than one per silent hop, and that
+switching r1's route from r2 to r4 is reported as a change at hop 2.
+
+    python benchmarks/bench_tracer.py [--no-netns]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+import tracer
+
+NAMESPACES = ['nstr0', 'nstr1', 'nstr2', 'nstr3', 'nstr4']
+# (namespace a, address a, namespace b, address b)
+LINKS = [
+    ('nstr0', '10.9.1.1', 'nstr1', '10.9.1.2'),
+    ('nstr1', '10.9.2.1', 'nstr2', '10.9.2.2'),
+    ('nstr2', '10.9.3.1', 'nstr3', '10.9.3.2'),
+    ('nstr1', '10.9.4.1', 'nstr4', '10.9.4.2'),
+    ('nstr4', '10.9.5.1', 'nstr3', '10.9.5.2'),
+]
+ROUTES = [
+    ('nstr0', 'default via 10.9.1.2'),
+    ('nstr1', '10.9.3.0/24 via 10.9.2.2'),
+    ('nstr1', '10.9.77.0/24 via 10.9.2.2'),
+    ('nstr2', 'default via 10.9.2.1'),
+    ('nstr2', 'blackhole 10.9.77.0/24'),
+    ('nstr3', 'default via 10.9.3.1'),
+    ('nstr4', 'default via 10.9.4.1'),
+    ('nstr4', '10.9.3.0/24 via 10.9.5.2'),
+]
+SWITCH = ['ip', 'netns', 'exec', 'nstr1', 'ip', 'route', 'replace', '10.9.3.0/24', 'via', '10.9.4.2']
+DEST = '10.9.3.2'
+BLACKHOLE = '10.9.77.1'
+
+failures = 0
+
+
+def check(name: str, ok: bool, detail: str = ''):
+    global failures
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {name}{'  ' + detail if detail else ''}")
+
+
+def extended_err(origin: int, icmp_type: int, code: int, offender: str, v6: bool = False) -> bytes:
+    header = struct.pack('=IBBBBII', 113, origin, icmp_type, code, 0, 0, 0)
+    if v6:
+        addr = struct.pack('=H', socket.AF_INET6) + b'\0' * 6 + socket.inet_pton(socket.AF_INET6, offender) + b'\0' * 4
+    else:
+        addr = struct.pack('=H', socket.AF_INET) + b'\0' * 2 + socket.inet_aton(offender) + b'\0' * 8
+    return header + addr
+
+
+def parser_checks():
+    ip, ip6 = socket.IPPROTO_IP, socket.IPPROTO_IPV6
+    cases = [
+        ('time exceeded', (ip, tracer.IP_RECVERR, extended_err(2, 11, 0, '10.0.0.1')), ('ttl', '10.0.0.1')),
+        ('port unreachable', (ip, tracer.IP_RECVERR, extended_err(2, 3, 3, '10.0.0.9')), ('reached', '10.0.0.9')),
+        ('host unreachable', (ip, tracer.IP_RECVERR, extended_err(2, 3, 1, '10.0.0.2')), ('unreachable', '10.0.0.2')),
+        ('v6 time exceeded', (ip6, tracer.IPV6_RECVERR, extended_err(3, 3, 0, 'fd00::1', True)), ('ttl', 'fd00::1')),
+        ('v6 port unreachable', (ip6, tracer.IPV6_RECVERR, extended_err(3, 1, 4, 'fd00::9', True)), ('reached', 'fd00::9')),
+        ('local error', (ip, tracer.IP_RECVERR, extended_err(1, 0, 0, '0.0.0.0')), None),
+        ('other cmsg', (socket.SOL_SOCKET, 29, b'\0' * 16), None),
+        ('truncated', (ip, tracer.IP_RECVERR, b'\0' * 8), None),
+    ]
+    for name, args, expected in cases:
+        parsed = tracer.parse_recverr(*args)
+        got = (parsed['kind'], parsed['address']) if parsed else None
+        check(f"parse {name}", got == expected, f"got {got}")
+
+    def hops(*addresses):
+        return [{'ttl': i + 1, 'addresses': list(a)} for i, a in enumerate(addresses)]
+
+    check("route same", tracer.route_changes(hops(['a'], ['b']), hops(['a'], ['b'])) == [])
+    check("route silent hop", tracer.route_changes(hops(['a'], ['b']), hops(['a'], [])) == [])
+    check("route ecmp overlap", tracer.route_changes(hops(['a'], ['b', 'c']), hops(['a'], ['c'])) == [])
+    changes = tracer.route_changes(hops(['a'], ['b'], ['d']), hops(['a'], ['x'], ['d']))
+    check("route changed hop", [c['ttl'] for c in changes] == [2], str(changes))
+
+
+async def loopback_checks():
+    for mode in ('udp', 'icmp'):
+        t = tracer.Tracer(mode=mode, max_hops=8, timeout=1.0)
+        try:
+            result = await t.trace('127.0.0.1')
+        except PermissionError:
+            print(f"skip loopback {mode}: datagram ICMP not allowed by ping_group_range")
+            continue
+        check(f"loopback {mode}", result['reached'] and result['hop_count'] == 1 and
+              result['hops'][0]['address'] == '127.0.0.1' and result['hops'][0]['loss'] == 0,
+              f"{result['duration_ms']:.1f}ms")
+
+
+async def child(args):
+    """runs inside the client namespace, prints the traces as json"""
+    t = tracer.Tracer(mode=args.mode, max_hops=16, timeout=1.0, interval=0.02)
+    mapper = tracer.RouteMapper(t.trace, ttl=300)
+    first = await mapper.get(DEST)
+    cached = await mapper.get(DEST)
+    start = time.perf_counter()
+    blackhole = await t.trace(BLACKHOLE)
+    blackhole_s = time.perf_counter() - start
+    subprocess.run(SWITCH, check=True)
+    second = await mapper.get(DEST, refresh=True)
+    print(json.dumps({'first': first, 'cached': cached is first, 'blackhole': blackhole,
+                      'blackhole_s': blackhole_s, 'second': second, 'changes': list(mapper.changes)}))
+
+
+def sh(*argv):
+    subprocess.run(argv, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def build_topology():
+    for ns in NAMESPACES:
+        sh('ip', 'netns', 'add', ns)
+        sh('ip', 'netns', 'exec', ns, 'ip', 'link', 'set', 'lo', 'up')
+        sh('ip', 'netns', 'exec', ns, 'sysctl', '-qw', 'net.ipv4.ip_forward=1')
+        # asymmetric return paths after the switch, and no ICMP rate limit skewing loss
+        sh('ip', 'netns', 'exec', ns, 'sysctl', '-qw', 'net.ipv4.conf.all.rp_filter=0')
+        sh('ip', 'netns', 'exec', ns, 'sysctl', '-qw', 'net.ipv4.icmp_ratelimit=0')
+        sh('ip', 'netns', 'exec', ns, 'sysctl', '-qw', 'net.ipv4.ping_group_range=0 2147483647')
+    for i, (ns_a, addr_a, ns_b, addr_b) in enumerate(LINKS):
+        a, b = f'vtr{i}a', f'vtr{i}b'
+        sh('ip', 'link', 'add', a, 'netns', ns_a, 'type', 'veth', 'peer', 'name', b, 'netns', ns_b)
+        for ns, dev, addr in ((ns_a, a, addr_a), (ns_b, b, addr_b)):
+            sh('ip', 'netns', 'exec', ns, 'ip', 'addr', 'add', f'{addr}/24', 'dev', dev)
+            sh('ip', 'netns', 'exec', ns, 'sysctl', '-qw', f'net.ipv4.conf.{dev}.rp_filter=0')
+            sh('ip', 'netns', 'exec', ns, 'ip', 'link', 'set', dev, 'up')
+    for ns, route in ROUTES:
+        sh('ip', 'netns', 'exec', ns, 'ip', 'route', 'add', *route.split())
+    # r2 -> dest is link 2, side a
+    try:
+        sh('ip', 'netns', 'exec', 'nstr2', 'tc', 'qdisc', 'add', 'dev', 'vtr2a', 'root', 'netem', 'delay', '20ms')
+    except (OSError, subprocess.CalledProcessError):
+        print("netem unavailable, hop latency not injected")
+        return False
+    return True
+
+
+def teardown():
+    for ns in NAMESPACES:
+        subprocess.run(['ip', 'netns', 'del', ns], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def netns_checks():
+    teardown()
+    try:
+        delayed = build_topology()
+    except (OSError, subprocess.CalledProcessError) as e:
+        teardown()
+        print(f"skip netns: could not build the topology ({e})")
+        return
+    try:
+        for mode in ('udp', 'icmp'):
+            out = subprocess.run(['ip', 'netns', 'exec', 'nstr0', sys.executable, os.path.abspath(__file__),
+                                  '--child', '--mode', mode], capture_output=True, text=True, timeout=60)
+            if out.returncode:
+                check(f"netns {mode} child", False, out.stderr.strip()[-400:])
+                continue
+            data = json.loads(out.stdout)
+            first, second = data['first'], data['second']
+            path = [hop['address'] for hop in first['hops']]
+            check(f"netns {mode} path", first['reached'] and path == ['10.9.1.2', '10.9.2.2', DEST], str(path))
+            added = first['hops'][2]['added_ms'] if len(first['hops']) > 2 else None
+            if delayed:
+                check(f"netns {mode} delay lands on hop 3", added is not None and 15 < added < 40,
+                      f"added {added and round(added, 1)}ms")
+            check(f"netns {mode} cached", data['cached'])
+            blackhole = data['blackhole']
+            check(f"netns {mode} blackhole in parallel", not blackhole['reached'] and blackhole['hop_count'] == 1 and
+                  data['blackhole_s'] < 2.0, f"{data['blackhole_s']:.2f}s for 16 hops at 1s timeout")
+            path = [hop['address'] for hop in second['hops']]
+            check(f"netns {mode} switched path", path == ['10.9.1.2', '10.9.4.2', DEST], str(path))
+            check(f"netns {mode} route change", second['route_changed'] and
+                  [c['ttl'] for c in second['changes']] == [2] and len(data['changes']) == 1, str(second['changes']))
+            # put r1 back on r2 for the next mode
+            sh('ip', 'netns', 'exec', 'nstr1', 'ip', 'route', 'replace', '10.9.3.0/24', 'via', '10.9.2.2')
+    finally:
+        teardown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-netns', action='store_true', help='skip the namespace topology')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', default='udp', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args))
+        return
+    parser_checks()
+    asyncio.run(loopback_checks())
+    if not args.no_netns:
+        netns_checks()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
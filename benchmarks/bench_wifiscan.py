@@ -0,0 +1,143 @@
+"""
+Wi-Fi scan analysis on synthetic dense scans (LAN events, stadiums).
+
+Times the old exact-channel counting with its per-channel list comprehension
+inside the sort key against the interference engine, on the list path and,
+when NumPy is installed, the vectorized path. Bonded channel spans and their
+overlap are checked against the 802.11 channel plan first, including UNII-3
+(channels 149-165) whose blocks start at 5735 MHz. Exits 1 when a check fails
+or the two engine paths disagree.
+
+    python benchmarks/bench_wifiscan.py [--aps 100 300 1000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+import wifiscan
+
+# (band, primary channel, width) -> occupied spectrum in MHz
+SPANS = [
+    ('5GHz', 36, 40, (5170, 5210)), ('5GHz', 48, 80, (5170, 5250)), ('5GHz', 64, 160, (5170, 5330)),
+    ('5GHz', 104, 80, (5490, 5570)), ('5GHz', 128, 160, (5490, 5650)), ('5GHz', 144, 80, (5650, 5730)),
+    # UNII-2e has no 160 MHz block past channel 128, the AP can only be on the 80 MHz one
+    ('5GHz', 140, 160, (5650, 5730)),
+    ('5GHz', 149, 40, (5735, 5775)), ('5GHz', 153, 40, (5735, 5775)), ('5GHz', 161, 40, (5775, 5815)),
+    ('5GHz', 149, 80, (5735, 5815)), ('5GHz', 161, 80, (5735, 5815)), ('5GHz', 165, 80, (5815, 5895)),
+    ('5GHz', 157, 160, (5735, 5895)), ('5GHz', 165, 20, (5815, 5835)),
+    ('6GHz', 1, 80, (5945, 6025)), ('6GHz', 37, 160, (6105, 6265)), ('6GHz', 233, 40, (7105, 7125)),
+    ('2.4GHz', 6, 20, (2426, 2448)),
+]
+# (AP channel, AP width, candidate channel, candidate width) -> share of the candidate the AP covers
+OVERLAPS = [
+    (149, 80, 161, 20, 1.0), (149, 40, 153, 20, 1.0), (149, 40, 157, 20, 0.0),
+    (144, 20, 149, 80, 0.0), (165, 20, 161, 80, 0.0), (157, 80, 153, 40, 1.0),
+    (161, 40, 149, 80, 0.5), (36, 80, 44, 40, 1.0), (48, 40, 52, 40, 0.0),
+]
+
+
+def check_spans(errors: list):
+    for band, channel, width, expected in SPANS:
+        got = wifiscan.span(band, wifiscan.channel_freq(band, channel), width)
+        if got != expected:
+            errors.append(f"{band} channel {channel} at {width} MHz spans {got}, expected {expected}")
+    for use_numpy in ([False, True] if wifiscan.np is not None else [False]):
+        for ap, ap_width, candidate, c_width, expected in OVERLAPS:
+            lo, hi = wifiscan.span('5GHz', wifiscan.channel_freq('5GHz', ap), ap_width)
+            c_lo, c_hi = wifiscan.span('5GHz', wifiscan.channel_freq('5GHz', candidate), c_width)
+            got = float(wifiscan.overlap_matrix([lo], [hi], [c_lo], [c_hi], [c_hi - c_lo], use_numpy)[0][0])
+            if abs(got - expected) > 1e-9:
+                errors.append(f"{ap}/{ap_width} over {candidate}/{c_width} overlaps {got:.2f}, expected {expected} "
+                              f"({'numpy' if use_numpy else 'python'})")
+
+
+def synthetic_scan(aps: int, seed: int = 3) -> str:
+    """nmcli -t output with a realistic band / width mix"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(aps):
+        bssid = ':'.join(f'{b:02X}' for b in (0x02, rng.randrange(256), rng.randrange(256), i >> 16, (i >> 8) & 0xff, i & 0xff))
+        if rng.random() < 0.45:
+            channel = rng.choice([1, 6, 11, 1, 6, 11, 3, 9])
+            freq = 2407 + 5 * channel
+            width = rng.choice([20, 20, 40])
+        else:
+            channel = rng.choice(wifiscan.CANDIDATES['5GHz'])
+            freq = 5000 + 5 * channel
+            width = rng.choice([20, 40, 80, 80])
+        signal = max(1, min(100, int(rng.gauss(45, 18))))
+        rows.append(f"{'*' if i == 0 else ' '}:{bssid.replace(':', chr(92) + ':')}:net-{i % 97}:{signal}:{freq} MHz:{channel}:{width} MHz:WPA2")
+    return '\n'.join(rows)
+
+
+def legacy(stdout: str):
+    """the original scan_wifi_networks analysis"""
+    networks = []
+    channel_counts = {}
+    for line in stdout.splitlines():
+        parts = wifiscan.split_terse(line)[2:]
+        chan = int(parts[3])
+        channel_counts[chan] = channel_counts.get(chan, 0) + 1
+        networks.append({"signal": int(parts[1]), "channel": chan})
+    for net in networks:
+        net["congestion"] = channel_counts.get(net["channel"], 1)
+    return sorted(
+        channel_counts.items(),
+        key=lambda item: (item[1], -sum([n["signal"] for n in networks if n["channel"] == item[0]]))
+    )[0][0]
+
+
+def best_of(repeat: int, func, *args) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--aps', type=int, nargs='*', default=[100, 300, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    errors = []
+    check_spans(errors)
+
+    have_numpy = wifiscan.np is not None
+    if not have_numpy:
+        print("numpy not installed, vectorized path skipped")
+    for aps in args.aps:
+        stdout = synthetic_scan(aps)
+        parse_ms = best_of(args.repeat, wifiscan.ScanTable.from_nmcli, stdout)
+        table = wifiscan.ScanTable.from_nmcli(stdout)
+        legacy_ms = best_of(args.repeat, legacy, stdout)
+        python_ms = best_of(args.repeat, wifiscan.summarize_scan, table, False)
+        line = (f"aps={aps:5}  parse {parse_ms:7.2f}ms  legacy {legacy_ms:7.2f}ms  "
+                f"engine/python {python_ms:8.2f}ms")
+        if have_numpy:
+            numpy_ms = best_of(args.repeat, wifiscan.summarize_scan, table, True)
+            a = wifiscan.summarize_scan(table, False)
+            b = wifiscan.summarize_scan(table, True)
+            same = a['best_channel_by_band'] == b['best_channel_by_band'] and all(
+                abs(x['congestion'] - y['congestion']) < 1e-6 for x, y in zip(a['networks'], b['networks']))
+            line += f"  engine/numpy {numpy_ms:7.2f}ms  agree={same}"
+            if not same:
+                errors.append(f"python and numpy paths disagree at {aps} APs")
+        result = wifiscan.summarize_scan(table)
+        line += f"  best={result['best_channel_by_band']}"
+        print(line)
+
+    for error in errors:
+        print(f"FAIL {error}")
+    print('failed' if errors else 'ok')
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Headless stand-ins for running main.py off the Deck.
+
+`install_decky` builds a `decky` module from decky.pyi: every constant the
+stub declares becomes a path under a scratch directory (or the environment
+variable of the same name), `logger` is a plain logging.Logger, `emit` keeps the
+newest events and the migration helpers do nothing. Attributes the plugin reads that
+decky.pyi doesn't declare raise AttributeError like they would on a real
+loader, and are collected in `decky.missing`.
+
+The responders answer on loopback with tunable delay and loss, `Standins` runs
+them in a child process. `FAKEBIN` holds fake `ping` and `nmcli` executables
+for the subprocess paths, tuned through SENTINEL_FAKE_* variables.
+"""
+
+import ast
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import struct
+import sys
+import tempfile
+import types
+from collections import deque
+from typing import Dict, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKEBIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fakebin')
+sys.path.insert(0, os.path.join(ROOT, 'py_modules'))
+
+
+class _DeckyStub(types.ModuleType):
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        self.__dict__.setdefault('missing', set()).add(name)
+        raise AttributeError(f"decky.pyi has no attribute {name!r}")
+
+
+def install_decky(scratch: Optional[str] = None, level: int = logging.WARNING) -> types.ModuleType:
+    """put a decky stub generated from decky.pyi into sys.modules and return it"""
+    scratch = scratch or tempfile.mkdtemp(prefix='sentinel-bench-')
+    with open(os.path.join(ROOT, 'decky.pyi')) as f:
+        tree = ast.parse(f.read())
+
+    decky = _DeckyStub('decky')
+    decky.__dict__['missing'] = set()
+    # the newest events only, a long run would otherwise hold every payload it pushed
+    decky.events = deque(maxlen=1000)
+    decky.emitted = 0
+    for node in tree.body:
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            name = node.target.id
+            if name == 'logger':
+                logger = logging.getLogger('sentinel-bench')
+                logger.setLevel(level)
+                setattr(decky, name, logger)
+            elif name in os.environ:
+                setattr(decky, name, os.environ[name])
+            elif name.endswith('_DIR') or name.endswith('HOME'):
+                path = os.path.join(scratch, name.lower())
+                os.makedirs(path, exist_ok=True)
+                setattr(decky, name, path)
+            elif name.endswith('_LOG'):
+                setattr(decky, name, os.path.join(scratch, 'plugin.log'))
+            else:
+                setattr(decky, name, 'bench')
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    setattr(decky, target.id, ast.literal_eval(node.value))
+        elif isinstance(node, ast.AsyncFunctionDef) and node.name == 'emit':
+            async def emit(event: str, *args):
+                decky.emitted += 1
+                decky.events.append((event, args))
+            decky.emit = emit
+        elif isinstance(node, ast.FunctionDef):
+            setattr(decky, node.name, lambda *args, **kwargs: {})
+    decky.scratch = scratch
+    sys.modules['decky'] = decky
+    return decky
+
+
+def use_fakebin(**tunables):
+    """put the fake ping/nmcli first on PATH, tunables become SENTINEL_FAKE_* variables"""
+    path = os.environ.get('PATH', '')
+    if not path.startswith(FAKEBIN):
+        os.environ['PATH'] = FAKEBIN + os.pathsep + path
+    for key, value in tunables.items():
+        os.environ[f'SENTINEL_FAKE_{key.upper()}'] = str(value)
+
+
+class Tunable:
+    """delay (seconds) and loss (0..1) a responder applies, changeable while it runs"""
+
+    def __init__(self, delay: float = 0.0, loss: float = 0.0, seed: int = 0):
+        self.delay = delay
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.served = 0
+        self.dropped = 0
+
+    def drop(self) -> bool:
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return True
+        self.served += 1
+        return False
+
+
+class TcpResponder(Tunable):
+    """answers each connection with one byte after `delay`, a lost probe is a hang-up without it"""
+
+    async def start(self, hosts: Sequence[str] = ('127.0.0.1',), port: int = 0) -> int:
+        async def handle(reader, writer):
+            if self.drop():
+                writer.close()
+                return
+            await asyncio.sleep(self.delay)
+            writer.write(b'x')
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        # every host listens on the same port so path targets can share one probe port
+        self.servers = []
+        for host in hosts:
+            server = await asyncio.start_server(handle, host, port, family=socket.AF_INET)
+            port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+        self.port = port
+        return port
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+
+class _Datagram(asyncio.DatagramProtocol):
+    def __init__(self, owner: 'UdpResponder'):
+        self.owner = owner
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.owner.drop():
+            return
+        reply = self.owner.reply(data)
+        if reply is not None:
+            asyncio.get_running_loop().call_later(self.owner.delay, self.transport.sendto, reply, addr)
+
+
+class UdpResponder(Tunable):
+    """echoes datagrams back after `delay`"""
+
+    def reply(self, data: bytes) -> Optional[bytes]:
+        return data
+
+    async def start(self, hosts: Sequence[str] = ('127.0.0.1',), port: int = 0) -> int:
+        loop = asyncio.get_running_loop()
+        self.transport, _protocol = await loop.create_datagram_endpoint(
+            lambda: _Datagram(self), local_addr=(hosts[0], port))
+        self.port = self.transport.get_extra_info('sockname')[1]
+        return self.port
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    async def stop(self):
+        self.transport.close()
+
+
+class DnsResponder(UdpResponder):
+    """answers any A query with one record, enough for dnsprobe to time it"""
+
+    def reply(self, data: bytes) -> Optional[bytes]:
+        if len(data) < 12:
+            return None
+        qid = struct.unpack('!H', data[:2])[0]
+        question = data[12:]
+        answer = struct.pack('!HHHIH', 0xc00c, 1, 1, 60, 4) + socket.inet_aton('192.0.2.10')
+        return struct.pack('!HHHHHH', qid, 0x8180, 1, 1, 0, 0) + question + answer
+
+
+KINDS = {'tcp': TcpResponder, 'udp': UdpResponder, 'dns': DnsResponder}
+
+
+async def _serve(spec: Dict[str, Dict], conn):
+    loop = asyncio.get_running_loop()
+    responders = {}
+    for name, options in spec.items():
+        responder = KINDS[options['kind']](options.get('delay', 0.0), options.get('loss', 0.0))
+        port = options.get('port', 0)
+        # a name shares that responder's port number, a DNS server answering on UDP and TCP
+        await responder.start(options.get('hosts', ('127.0.0.1',)), responders[port].port if isinstance(port, str) else port)
+        responders[name] = responder
+    conn.send({name: responder.port for name, responder in responders.items()})
+
+    stopped = loop.create_future()
+
+    def on_message():
+        message = conn.recv()
+        if message[0] == 'set':
+            _cmd, name, delay, loss = message
+            responder = responders[name]
+            responder.delay = responder.delay if delay is None else delay
+            responder.loss = responder.loss if loss is None else loss
+        elif message[0] == 'stats':
+            conn.send({name: (r.served, r.dropped) for name, r in responders.items()})
+        elif not stopped.done():
+            stopped.set_result(None)
+
+    loop.add_reader(conn.fileno(), on_message)
+    await stopped
+    for responder in responders.values():
+        await responder.stop()
+
+
+def _serve_process(spec: Dict[str, Dict], conn):
+    asyncio.run(_serve(spec, conn))
+
+
+class Standins:
+    """
+    Responders in a child process, so the CPU they burn isn't billed to the plugin.
+
+        with Standins({'game': {'kind': 'tcp', 'hosts': ['127.0.0.2'], 'delay': 0.02}}) as net:
+            net.ports['game']
+            net.set('game', loss=0.3)
+    """
+
+    def __init__(self, spec: Dict[str, Dict]):
+        self.spec = spec
+        self.ports: Dict[str, int] = {}
+
+    def __enter__(self) -> 'Standins':
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve_process, args=(self.spec, child), daemon=True)
+        self.process.start()
+        if not self.conn.poll(10):
+            self.process.kill()
+            raise RuntimeError('stand-in responders did not start')
+        self.ports = self.conn.recv()
+        return self
+
+    def address(self, name: str) -> str:
+        hosts = self.spec[name].get('hosts', ('127.0.0.1',))
+        return f"{hosts[0]}:{self.ports[name]}"
+
+    def set(self, name: str, delay: Optional[float] = None, loss: Optional[float] = None):
+        self.conn.send(('set', name, delay, loss))
+
+    def stats(self) -> Dict[str, tuple]:
+        """(served, dropped) per responder"""
+        self.conn.send(('stats',))
+        return self.conn.recv()
+
+    def __exit__(self, *_exc):
+        try:
+            self.conn.send(('stop',))
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
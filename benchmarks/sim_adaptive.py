@@ -0,0 +1,253 @@
+"""
+Replay latency traces against fixed and adaptive probe schedules.
+
+A trace is a list of (seconds, rtt) with rtt None for a lost packet. Each
+policy probes the trace in virtual time (3 packets, 0.2s apart, like the
+monitor) and the report shows probe count against how long it took to
+notice each degradation episode, how closely a noticed episode was followed
+(mean gap between probes until it ended) and how soon its end was seen.
+
+Traces come from a CSV of `seconds,rtt` rows (empty rtt = lost), the plugin's
+on-disk history (`--store`), or `--seeds` seeded synthetic two hours with
+latency spikes, loss bursts and jitter storms, pooled into one report.
+Adaptive defaults are AdaptiveInterval's. Exits 1 unless adaptive probing
+follows episodes and sees their end about as closely as fixed probing at its
+minimum interval (within 1.5x and 2x of it) for at most half of its probes,
+and misses no more episodes and detects them no later than fixed probing at
+its maximum interval.
+
+    python benchmarks/sim_adaptive.py [--trace trace.csv | --store DIR] [--fixed 30 5] [--seeds 30]
+"""
+
+import argparse
+import bisect
+import csv
+import os
+import random
+import sys
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from adaptive import AdaptiveInterval
+from store import SegmentStore
+
+Trace = List[Tuple[float, Optional[float]]]
+
+
+def synthetic_trace(seconds: float = 7200, step: float = 0.1, seed: int = 7) -> Trace:
+    rng = random.Random(seed)
+    episodes = []
+    t = 120.0
+    while t < seconds - 180:
+        kind = rng.choice(['spike', 'loss', 'jitter'])
+        length = rng.uniform(20, 90)
+        episodes.append((t, t + length, kind))
+        t += length + rng.uniform(300, 1200)
+
+    trace = []
+    for i in range(int(seconds / step)):
+        now = i * step
+        rtt = 25 + rng.gauss(0, 1.5)
+        for start, end, kind in episodes:
+            if start <= now < end:
+                if kind == 'spike':
+                    rtt += 90
+                elif kind == 'loss' and rng.random() < 0.3:
+                    rtt = None
+                elif kind == 'jitter':
+                    rtt += rng.uniform(0, 60)
+                break
+        trace.append((now, rtt))
+    return trace
+
+
+def load_csv(path: str) -> Trace:
+    trace = []
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#'):
+                continue
+            try:
+                seconds = float(row[0])
+            except ValueError:
+                # header
+                continue
+            trace.append((seconds, float(row[1]) if len(row) > 1 and row[1] else None))
+    return trace
+
+
+def load_store(root: str) -> Trace:
+    store = SegmentStore(root)
+    store.load()
+    rows = list(store.scan(0, float('inf')))
+    if not rows:
+        return []
+    start = rows[0][0]
+    # a disconnected probe is stored as 999ms / 100% loss
+    return [(row[0] - start, None if row[3] >= 100 else row[1]) for row in rows]
+
+
+def label_episodes(trace: Trace, window: float = 10.0, min_length: float = 5.0) -> List[Tuple[float, float]]:
+    """ground truth: stretches where packets are lost or rtt is far above the trace median"""
+    rtts = sorted(rtt for _t, rtt in trace if rtt is not None)
+    threshold = rtts[len(rtts) // 2] * 1.5 + 20 if rtts else 0
+    episodes = []
+    start = last_bad = None
+    for t, rtt in trace:
+        bad = rtt is None or rtt > threshold
+        if bad:
+            if start is None:
+                start = t
+            last_bad = t
+        elif start is not None and t - last_bad > window:
+            if last_bad - start >= min_length:
+                episodes.append((start, last_bad))
+            start = None
+    if start is not None and last_bad - start >= min_length:
+        episodes.append((start, last_bad))
+    return episodes
+
+
+class Replayer:
+    def __init__(self, trace: Trace):
+        self.times = [t for t, _rtt in trace]
+        self.rtts = [rtt for _t, rtt in trace]
+        rtts = sorted(rtt for rtt in self.rtts if rtt is not None)
+        self.threshold = rtts[len(rtts) // 2] * 1.5 + 20 if rtts else 0
+
+    def burst(self, t: float, count: int = 3, spacing: float = 0.2) -> List[Optional[float]]:
+        out = []
+        for n in range(count):
+            i = min(len(self.times) - 1, bisect.bisect_left(self.times, t + n * spacing))
+            out.append(self.rtts[i])
+        return out
+
+    def degraded(self, rtts: List[Optional[float]]) -> bool:
+        return any(rtt is None or rtt > self.threshold for rtt in rtts)
+
+
+def simulate(replayer: Replayer, episodes, end: float, policy) -> dict:
+    """
+    policy(rtts, now) -> next probe time.
+
+    Returns the probe count, how long each episode took to detect, the gaps
+    between probes while a detected episode lasted and how long after each
+    one's end the next probe came.
+    """
+    t = 0.0
+    times = []
+    detected = {}
+    while t < end:
+        rtts = replayer.burst(t)
+        times.append(t)
+        if replayer.degraded(rtts):
+            for i, (start, stop) in enumerate(episodes):
+                if i not in detected and start <= t <= stop:
+                    detected[i] = t - start
+        t = policy(rtts, t)
+    gaps, recoveries = [], []
+    for i, delay in detected.items():
+        start, stop = episodes[i]
+        first = bisect.bisect_left(times, start + delay)
+        last = bisect.bisect_right(times, stop)
+        gaps += [b - a for a, b in zip(times[first:last], times[first + 1:last])]
+        if last < len(times):
+            recoveries.append(times[last] - stop)
+    return {'probes': len(times), 'seconds': end, 'episodes': len(episodes), 'delays': list(detected.values()),
+            'gaps': gaps, 'recoveries': recoveries}
+
+
+def median(values: List[float]) -> Optional[float]:
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+def mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def pooled(runs: List[dict]) -> dict:
+    """one report over simulate() runs on several traces"""
+    probes = sum(r['probes'] for r in runs)
+    seconds = sum(r['seconds'] for r in runs)
+    delays = sorted(d for r in runs for d in r['delays'])
+    return {
+        'probes': probes,
+        'per_hour': probes / seconds * 3600 if seconds else 0,
+        'detected': len(delays),
+        'missed': sum(r['episodes'] for r in runs) - len(delays),
+        'median_delay': median(delays),
+        'max_delay': delays[-1] if delays else None,
+        # how densely a degradation is followed once it was seen, and how soon its end is
+        'episode_gap': mean([g for r in runs for g in r['gaps']]),
+        'recovery': median([d for r in runs for d in r['recoveries']])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trace', help='csv of seconds,rtt')
+    parser.add_argument('--store', help='plugin history directory')
+    parser.add_argument('--fixed', type=float, nargs='*', default=[30.0, 5.0], help='fixed intervals to compare')
+    parser.add_argument('--seeds', type=int, default=30, help='synthetic traces to pool, from seed 7 up')
+    defaults = AdaptiveInterval()
+    parser.add_argument('--min-interval', type=float, default=defaults.min_interval)
+    parser.add_argument('--max-interval', type=float, default=defaults.max_interval)
+    parser.add_argument('--backoff', type=float, default=defaults.backoff)
+    parser.add_argument('--calm', type=int, default=defaults.calm_probes, help='steady bursts before backing off')
+    args = parser.parse_args()
+
+    if args.trace:
+        traces = [load_csv(args.trace)]
+    elif args.store:
+        traces = [load_store(args.store)]
+    else:
+        traces = [synthetic_trace(seed=seed) for seed in range(7, 7 + args.seeds)]
+    if not all(traces):
+        sys.exit('empty trace')
+
+    cases = [(Replayer(trace), label_episodes(trace), trace[-1][0]) for trace in traces]
+    print(f"{len(traces)} trace(s), {sum(end for _r, _e, end in cases):.0f}s, "
+          f"{sum(len(episodes) for _r, episodes, _end in cases)} degradation episodes")
+
+    def fmt(value):
+        return f"{value:6.1f}s" if value is not None else '     -'
+
+    def adaptive_policy():
+        adaptive = AdaptiveInterval(args.min_interval, args.max_interval, args.backoff, args.calm)
+        return lambda rtts, now: now + adaptive.observe(rtts, now)
+
+    policies = [(f"fixed {interval:g}s", lambda i=interval: lambda _r, now: now + i)
+                for interval in sorted(set(args.fixed) | {args.min_interval, args.max_interval}, reverse=True)]
+    policies.append((f"adaptive {args.min_interval:g}-{args.max_interval:g}s", adaptive_policy))
+    results = {name: pooled([simulate(replayer, episodes, end, policy()) for replayer, episodes, end in cases])
+               for name, policy in policies}
+
+    for name, r in results.items():
+        print(f"{name:18} probes={r['probes']:5} ({r['per_hour']:6.0f}/h) detected={r['detected']:3} "
+              f"missed={r['missed']:3} median delay={fmt(r['median_delay'])} max={fmt(r['max_delay'])} "
+              f"in episode every {fmt(r['episode_gap'])} recovery seen {fmt(r['recovery'])}")
+
+    fast, slow = results[f"fixed {args.min_interval:g}s"], results[f"fixed {args.max_interval:g}s"]
+    adaptive = results[policies[-1][0]]
+    failures = []
+    if adaptive['episode_gap'] is not None and adaptive['episode_gap'] > 1.5 * args.min_interval:
+        failures.append(f"adaptive followed episodes every {fmt(adaptive['episode_gap'])}, "
+                        f"not near the {args.min_interval:g}s minimum")
+    if adaptive['recovery'] is not None and adaptive['recovery'] > 2 * args.min_interval:
+        failures.append(f"adaptive saw episodes end {fmt(adaptive['recovery'])} late")
+    if adaptive['probes'] > fast['probes'] / 2:
+        failures.append(f"adaptive sent {adaptive['probes']} probes, fixed {args.min_interval:g}s {fast['probes']}")
+    if adaptive['missed'] > slow['missed']:
+        failures.append(f"adaptive missed {adaptive['missed']} episodes, fixed {args.max_interval:g}s {slow['missed']}")
+    if (adaptive['median_delay'] or 0) > (slow['median_delay'] or 0):
+        failures.append(f"adaptive median delay {fmt(adaptive['median_delay'])} above "
+                        f"fixed {args.max_interval:g}s {fmt(slow['median_delay'])}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Replay latency traces through the anomaly detector.
+
+The trace is probed like the monitoring loop does (bursts of 3 packets 0.2s
+apart every `--step` seconds) and every burst goes through
+AnomalyDetector.observe. The report shows, per incident kind, how many
+labelled degradation episodes were caught and how long it took, how many
+incidents fired outside any episode (false positives), and what a probe costs.
+
+Synthetic traces have a noisy baseline with isolated outliers plus latency
+spikes, small level shifts below the alert threshold, loss bursts and outages.
+A second, calm trace with only the noise measures false positives per hour.
+`--trace` / `--store` replay real data labelled like sim_adaptive does.
+
+    python benchmarks/sim_anomaly.py [--trace trace.csv | --store DIR] [--step 5] [--threshold 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py_modules'))
+
+from anomaly import AnomalyDetector
+from sim_adaptive import Replayer, Trace, label_episodes, load_csv, load_store
+
+Episodes = List[Tuple[float, float, str]]
+
+
+def synthetic_trace(seconds: float = 6 * 3600, step: float = 0.1, seed: int = 11,
+                    episodes: bool = True) -> Tuple[Trace, Episodes]:
+    rng = random.Random(seed)
+    labelled = []
+    t = 300.0
+    while episodes and t < seconds - 600:
+        kind = rng.choice(['spike', 'shift', 'loss', 'outage'])
+        length = rng.uniform(60, 300)
+        labelled.append((t, t + length, kind))
+        t += length + rng.uniform(600, 1500)
+
+    trace = []
+    for i in range(int(seconds / step)):
+        now = i * step
+        rtt = 25 + rng.gauss(0, 1.5)
+        # isolated outliers, a retransmit or a busy AP, nothing to alert on
+        if rng.random() < 0.002:
+            rtt += rng.uniform(40, 100)
+        for start, end, kind in labelled:
+            if start <= now < end:
+                if kind == 'spike':
+                    rtt += 90 + rng.gauss(0, 5)
+                elif kind == 'shift':
+                    rtt += 12
+                elif kind == 'loss' and rng.random() < 0.3:
+                    rtt = None
+                elif kind == 'outage':
+                    rtt = None
+                break
+        trace.append((now, rtt))
+    return trace, labelled
+
+
+def replay(trace: Trace, episodes: Episodes, step: float, threshold: float, grace: float = 30.0) -> dict:
+    replayer = Replayer(trace)
+    detector = AnomalyDetector(threshold)
+    end = trace[-1][0]
+    incidents = []
+    probes = 0
+    spent = 0.0
+    t = 0.0
+    while t < end:
+        rtts = replayer.burst(t)
+        start = time.perf_counter()
+        events = detector.observe(rtts, t)
+        spent += time.perf_counter() - start
+        probes += len(rtts)
+        incidents.extend(e['incident'] for e in events if e['action'] == 'opened')
+        t += step
+
+    caught = {}
+    false_positives = []
+    for incident in incidents:
+        matched = False
+        for i, (start, stop, _kind) in enumerate(episodes):
+            if start - grace <= incident['start'] <= stop + grace:
+                matched = True
+                if incident['start'] >= start:
+                    delay = incident['start'] - start
+                    caught[i] = min(caught.get(i, delay), delay)
+        if not matched:
+            false_positives.append(incident)
+
+    by_kind = {}
+    for i, (_start, _stop, kind) in enumerate(episodes):
+        row = by_kind.setdefault(kind, {'episodes': 0, 'caught': 0, 'delays': []})
+        row['episodes'] += 1
+        if i in caught:
+            row['caught'] += 1
+            row['delays'].append(caught[i])
+    return {
+        'hours': end / 3600,
+        'incidents': len(incidents),
+        'false_positives': false_positives,
+        'by_kind': by_kind,
+        'missed': len(episodes) - len(caught),
+        'ns_per_probe': spent / probes * 1e9 if probes else 0,
+        'memory_items': len(detector.loss.window) + len(detector.incidents)
+    }
+
+
+def report(name: str, result: dict):
+    fp = result['false_positives']
+    print(f"{name}: {result['hours']:.1f}h, {result['incidents']} incidents, {len(fp)} false positives "
+          f"({len(fp) / result['hours']:.2f}/h), {result['ns_per_probe']:.0f}ns per probe")
+    for kind, row in sorted(result['by_kind'].items()):
+        delays = sorted(row['delays'])
+        median = f"{delays[len(delays) // 2]:5.1f}s" if delays else '    -'
+        worst = f"{delays[-1]:5.1f}s" if delays else '    -'
+        print(f"  {kind:8} caught {row['caught']:2}/{row['episodes']:2}  median delay {median}  max {worst}")
+    for incident in fp[:5]:
+        print(f"  false positive at {incident['start']:.0f}s: {incident['kind']}")
+
+
+def check_stop() -> List[str]:
+    """monitoring stopping mid-incident closes it, and the next session starts clean"""
+    detector = AnomalyDetector()
+    for n in range(5):
+        detector.observe([None, None, None], n * 5.0)
+    errors = []
+    events = detector.close_all(30.0, 'monitoring_stopped')
+    if [(e['action'], e['incident']['kind'], e['incident']['end'], e['incident']['reason']) for e in events] != \
+            [('closed', 'loss', 30.0, 'monitoring_stopped')]:
+        errors.append(f"stop closed {events}")
+    if detector.since(active_only=True):
+        errors.append(f"still ongoing after stop: {detector.since(active_only=True)}")
+    # the restarted loss detector must not close the already closed incident
+    after = [e for n in range(20) for e in detector.observe([20.0, 20.0, 20.0], 60.0 + n * 5)]
+    if after:
+        errors.append(f"events after restart: {after}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trace', help='csv of seconds,rtt')
+    parser.add_argument('--store', help='plugin history directory')
+    parser.add_argument('--step', type=float, default=5.0, help='seconds between probe bursts')
+    parser.add_argument('--threshold', type=float, default=50.0, help='notification_threshold in ms')
+    args = parser.parse_args()
+
+    if args.trace or args.store:
+        trace = load_csv(args.trace) if args.trace else load_store(args.store)
+        if not trace:
+            sys.exit('empty trace')
+        report('trace', replay(trace, [(s, e, 'episode') for s, e in label_episodes(trace)], args.step, args.threshold))
+        return
+
+    trace, episodes = synthetic_trace()
+    degraded = replay(trace, episodes, args.step, args.threshold)
+    report('synthetic', degraded)
+    calm, _none = synthetic_trace(seed=12, episodes=False)
+    quiet = replay(calm, [], args.step, args.threshold)
+    report('calm', quiet)
+    errors = check_stop()
+    for error in errors:
+        print(f"FAIL {error}")
+    # every episode caught, no alerts on a healthy connection and nothing left open on stop
+    sys.exit(1 if degraded['missed'] or quiet['false_positives'] or errors else 0)
+
+
+if __name__ == '__main__':
+    main()
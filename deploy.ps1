@@ -30,6 +30,7 @@ Copy-Item -Recurse "dist" "out\$PLUGIN_NAME\"
 Copy-Item "package.json" "out\$PLUGIN_NAME\"
 Copy-Item "plugin.json" "out\$PLUGIN_NAME\"
 Copy-Item "main.py" "out\$PLUGIN_NAME\"
+Copy-Item -Recurse "py_modules" "out\$PLUGIN_NAME\"
 Copy-Item "requirements.txt" "out\$PLUGIN_NAME\"
 Copy-Item "README.md" "out\$PLUGIN_NAME\"
 Copy-Item "LICENSE" "out\$PLUGIN_NAME\"
@@ -29,6 +29,7 @@ cp -r dist out/$PLUGIN_NAME/
 cp package.json out/$PLUGIN_NAME/
 cp plugin.json out/$PLUGIN_NAME/
 cp main.py out/$PLUGIN_NAME/
+cp -r py_modules out/$PLUGIN_NAME/
 cp requirements.txt out/$PLUGIN_NAME/
 cp README.md out/$PLUGIN_NAME/
 cp LICENSE out/$PLUGIN_NAME/
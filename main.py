@@ -1,33 +1,121 @@
 import os
-import subprocess
 import json
 import time
 import threading
+from collections import deque
 import psutil
 import socket
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import asyncio
 
 import decky
 
+import dnsprobe
+import sessionio
+import wifiscan
+from adaptive import AdaptiveInterval
+from anomaly import AnomalyDetector
+from cache import ResultCache
+from history import HistoryRing, make_point
+from linkstate import LinkWatcher
+from metrics import LoopLagMonitor, Metrics, ProfileCapture, ResourceSampler
+from netdev import InterfaceSampler
+from pathquality import PathQualityEngine
+from prober import AsyncProber
+from push import EventPublisher
+from rollups import RESOLUTIONS, Rollups
+from scheduler import ProbeScheduler
+from store import SegmentStore
+from streamstats import LatencyEstimator
+from tracer import RouteMapper, Tracer
+from wifihistory import ScanHistory
+
+# connection quality is scored from this host, it's also the path engine's internet hop
+QUALITY_ANCHOR = '8.8.8.8'
+
 class NetworkMonitor:
     def __init__(self):
         self.monitoring = False
-        self.network_data = []
+        self.network_data = HistoryRing()
+        self.rollups = Rollups()
+        self.latency_stats = LatencyEstimator()
+        try:
+            self.interfaces = InterfaceSampler()
+        except OSError:
+            # no procfs, psutil keeps working as the fallback
+            self.interfaces = None
         self.server_pings = {}
-        self.connection_history = []
+        # link and default-route changes, correlate with latency by timestamp
+        self.connection_history = deque(maxlen=500)
         self.lock = threading.Lock()
+        self.prober = AsyncProber()
+        self.probe_mode = 'auto'
+        # timings and counters of the plugin's own hot paths
+        self.metrics = Metrics()
+        self.scheduler = ProbeScheduler(metrics=self.metrics)
+        # gateway, quality anchor, dns and game servers probed together each monitoring round
+        self.paths = PathQualityEngine(self.ping_target)
+        self.tracer = Tracer()
+        # traces are cached per destination and compared run to run
+        self.routes = RouteMapper(self.trace_route)
+    
+    def configure_prober(self, settings: Dict):
+        """apply probe related settings"""
+        self.probe_mode = settings.get('probe_mode', 'auto')
+        self.prober.mode = self.probe_mode
+        self.prober.tcp_port = int(settings.get('probe_tcp_port', 443))
+        if self.interfaces:
+            self.interfaces.interface = settings.get('bandwidth_interface', 'auto')
+        self.tracer.mode = settings.get('trace_mode', 'auto')
+        self.tracer.max_hops = int(settings.get('trace_max_hops', 30))
+        self.routes.configure(float(settings.get('trace_cache_ttl', 300)))
+    
+    async def _timed_probe(self, host: str, run: Callable[[], Awaitable[Dict]]) -> Dict:
+        """await one probe under the ping_host timer, a timeout or error counts and reads as total loss"""
+        with self.metrics.time('ping_host'):
+            try:
+                return await run()
+            except asyncio.TimeoutError:
+                self.metrics.count('ping_host.timeouts')
+                return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100, 'jitter': 0, 'samples': 0}
+            except Exception as e:
+                self.metrics.count('errors.ping_host')
+                decky.logger.error(f"Probe error: {e}")
+                return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100, 'jitter': 0, 'samples': 0}
+
+    async def ping_host(self, host: str, count: int = 3, group: str = 'default') -> Dict:
+        """ping a host without blocking the loop, concurrent pings of the same host share one probe"""
+        if self.probe_mode == 'subprocess':
+            return await self._timed_probe(host, lambda: self.ping_host_subprocess(host, count, group))
+        return await self._timed_probe(host, lambda: self.scheduler.submit(
+            ('ping', host, count), lambda: self.prober.ping(host, count), timeout=10, group=group))
         
-    def ping_host(self, host: str, count: int = 3) -> Dict:
-        """ping a host and get stats"""
+    async def ping_target(self, host: str, count: int = 3, port: Optional[int] = None,
+                          group: str = 'default') -> Dict:
+        """ping_host for path targets, the TCP port only matters when probes fall back to TCP"""
+        if self.probe_mode == 'subprocess' or not port:
+            return await self.ping_host(host, count, group)
+        tcp = self.probe_mode == 'tcp' or self.prober.icmp_available is False
+        if not tcp:
+            # ICMP ignores the port, share the probe with any other ping of this host
+            return await self.ping_host(host, count, group)
+        return await self._timed_probe(host, lambda: self.scheduler.submit(
+            ('ping', host, count, port), lambda: self.prober.ping(host, count, port), timeout=10, group=group))
+    
+    async def trace_route(self, host: str) -> Dict:
+        """trace every hop to a host at once, concurrent traces of the same host share one run"""
+        return await self.scheduler.submit(('trace', host), lambda: self.tracer.trace(host),
+                                           timeout=self.tracer.timeout + 10, group='trace')
+    
+    async def ping_host_subprocess(self, host: str, count: int = 3, group: str = 'default') -> Dict:
+        """ping a host with the system ping binary and get stats"""
         try:
             cmd = ['ping', '-c', str(count), '-W', '2', host]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            returncode, output, _stderr = await self.scheduler.run_command(cmd, timeout=10, group=group)
             
-            if result.returncode == 0:
-                output = result.stdout
+            if returncode == 0:
                 lines = output.split('\n')
                 avg_rtt = 0
                 packet_loss = 0
@@ -83,17 +171,26 @@ class NetworkMonitor:
                     'avg_rtt': avg_rtt if avg_rtt > 0 else 999,
                     'packet_loss': packet_loss,
                     'jitter': jitter,
-                    'samples': len(ping_times) if ping_times else count
+                    'samples': len(ping_times) if ping_times else count,
+                    'rtts': ping_times + [None] * max(0, count - len(ping_times))
                 }
             else:
-                return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100, 'jitter': jitter, 'samples': 0}
+                return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100, 'jitter': 0, 'samples': 0}
                 
+        except asyncio.TimeoutError:
+            return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100, 'jitter': 0, 'samples': 0}
         except Exception as e:
             decky.logger.error(f"Ping error: {e}")
             return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100, 'jitter': 0, 'samples': 0}
     
     def get_network_interface_stats(self) -> Dict:
-        """Get network interface statistics"""
+        """Get network interface statistics for the selected interface"""
+        if self.interfaces:
+            try:
+                # read only, the monitoring loop owns the sampler's rate window
+                return self.interfaces.totals(fresh=True)
+            except OSError:
+                pass
         try:
             net_io = psutil.net_io_counters()
             return {
@@ -109,9 +206,15 @@ class NetworkMonitor:
         except Exception as e:
             return {'error': str(e)}
     
-    def test_connection_quality(self) -> Dict:
-        """test connection quality"""
-        ping_result = self.ping_host('8.8.8.8', 3)
+    async def test_connection_quality(self, group: str = 'default', ping_result: Optional[Dict] = None) -> Dict:
+        """test connection quality, scored from the running estimators rather than this burst alone"""
+        if ping_result is None:
+            ping_result = await self.ping_host(QUALITY_ANCHOR, 3, group)
+        
+        with self.lock:
+            for rtt in ping_result.get('rtts') or [None] * 3:
+                self.latency_stats.update(rtt)
+            stats = self.latency_stats.snapshot()
         
         if not ping_result.get('success', False):
             return {
@@ -119,12 +222,15 @@ class NetworkMonitor:
                 'score': 0,
                 'avg_latency': 999,
                 'avg_packet_loss': 100,
-                'jitter': ping_result.get('jitter', 0)
+                'jitter': stats['jitter'],
+                'latency_p95': stats['latency_p95'],
+                'rtts': ping_result.get('rtts')
             }
         
-        avg_latency = ping_result.get('avg_rtt', 999)
-        avg_packet_loss = ping_result.get('packet_loss', 0)
-        jitter = ping_result.get('jitter', 0)
+        # score on smoothed values so one noisy burst doesn't flip the rating
+        avg_latency = stats['latency_ewma']
+        avg_packet_loss = stats['loss']
+        jitter = stats['jitter']
         
         score = 100
         if avg_latency > 150:
@@ -138,7 +244,7 @@ class NetworkMonitor:
             score -= 40
         elif avg_packet_loss > 2:
             score -= 20
-        elif avg_packet_loss > 0:
+        elif avg_packet_loss > 0.5:
             score -= 10
         
         # add jitter into the scoring to catch instability
@@ -161,26 +267,30 @@ class NetworkMonitor:
         return {
             'quality': quality,
             'score': max(0, score),
-            'avg_latency': avg_latency,
+            'avg_latency': ping_result.get('avg_rtt', avg_latency),
             'avg_packet_loss': avg_packet_loss,
-            'jitter': jitter
+            'jitter': jitter,
+            'latency_ewma': avg_latency,
+            'latency_p95': stats['latency_p95'],
+            'rtts': ping_result.get('rtts')
         }
     
-    def ping_game_servers(self, servers: List[Dict]) -> Dict:
-        """Ping multiple game servers"""
+    async def ping_game_servers(self, servers: List[Dict], concurrency: int = 8, timeout: float = 5.0,
+                                on_result=None) -> Dict:
+        """Ping multiple game servers in parallel, on_result is awaited for each server as it finishes"""
         results = {}
         
-        for server in servers:
-            name = server.get('name', 'Unknown')
-            host = server.get('host', '')
-            region = server.get('region', 'Unknown')
-            
-            if host:
-                ping_result = self.ping_host(host, 3)
-                ping_result['name'] = name
-                ping_result['region'] = region
-                results[name] = ping_result
+        # through ping_target so probe_mode, coalescing and the 'servers' group apply
+        with self.metrics.time('ping_game_servers'):
+            async for ping_result in self.prober.ping_many(
+                    servers, 3, concurrency, timeout,
+                    ping=lambda host, count, port: self.ping_target(host, count, port, 'servers')):
+                results[ping_result['name']] = ping_result
+                if on_result:
+                    await on_result(ping_result)
         
+        with self.lock:
+            self.server_pings.update(results)
         return results
 
 class Plugin:
@@ -189,22 +299,141 @@ class Plugin:
         self.monitoring_task = None
         self.settings = {
             'auto_monitor': False,
+            # rtt in ms that opens a latency incident
             'notification_threshold': 50,
+            'anomaly_detection': True,
             'ping_interval': 0.5,
             'show_bandwidth': True,
             'dns_servers': ['8.8.8.8', '1.1.1.1'],
-            'speed_unit': 'mbps'
+            'speed_unit': 'mbps',
+            'probe_mode': 'auto',
+            'probe_tcp_port': 443,
+            'server_concurrency': 8,
+            'server_timeout': 5,
+            'history_capacity': 7200,
+            'bandwidth_interface': 'auto',
+            'persist_history': True,
+            'store_segment_mb': 4,
+            'store_max_mb': 256,
+            'store_retention_days': 30,
+            'store_flush_interval': 10,
+            'push_updates': True,
+            'push_interval': 2.0,
+            # off: probe every ping_interval, on: between probe_min_interval and probe_max_interval
+            'adaptive_probing': False,
+            'probe_min_interval': 5,
+            'probe_max_interval': 30,
+            'wifi_background_scan': False,
+            'wifi_scan_interval': 60,
+            # extra path targets, [{name, host, port}]
+            'path_game_servers': [],
+            'trace_mode': 'auto',
+            'trace_max_hops': 30,
+            'trace_cache_ttl': 300
         }
+        self.link_watcher = None
+        self.adaptive = AdaptiveInterval()
+        self.anomaly = AnomalyDetector()
+        self.wifi_history = ScanHistory()
+        self.wifi_scan_task = None
+        # (ttl, stale) seconds per cached callable result
+        self.cache = ResultCache({
+            'quality': (5, 60),
+            'dns': (20, 120),
+            'connection': (10, 300)
+        })
+        # live updates go out as events, the frontend only polls when they stop arriving
+        self.publisher = EventPublisher(decky.emit, {'monitoring_state': 0.0, 'incident': 1.0})
+        self.loop_lag = LoopLagMonitor()
+        self.resources = ResourceSampler()
+        self.profile = ProfileCapture(os.path.join(decky.DECKY_PLUGIN_RUNTIME_DIR, "profiles"))
+        self.store = None
+        self.store_flush_task = None
+        self.last_store_flush = 0
         self.live_ping = 0
         self.bandwidth_stats = {'download_bps': 0, 'upload_bps': 0}
         self.last_dns_status = {'success': True, 'dns_server': '8.8.8.8', 'resolution_time': 0}
         
+    def _apply_settings(self):
+        """push settings down into the monitor"""
+        self.monitor.configure_prober(self.settings)
+        with self.monitor.lock:
+            self.monitor.network_data.resize(self.settings.get('history_capacity', 7200))
+        if self.store:
+            self.store.max_bytes = int(self.settings.get('store_max_mb', 256) * 1024 * 1024)
+            self.store.retention_days = self.settings.get('store_retention_days', 30)
+        self.adaptive.configure(self.settings.get('probe_min_interval', 5),
+                                self.settings.get('probe_max_interval', 30))
+        self.publisher.enabled = bool(self.settings.get('push_updates', True))
+        self.publisher.default_interval = float(self.settings.get('push_interval', 2.0))
+        self.anomaly.configure(self.settings.get('notification_threshold', 50))
+        self._update_path_targets()
+        self._sync_wifi_scanner()
+    
+    def _update_path_targets(self):
+        """gateway from the link watcher, then the quality anchor, dns servers and game servers"""
+        gateway = self.link_watcher.state.get('gateway') if self.link_watcher else None
+        self.monitor.paths.set_targets(gateway, QUALITY_ANCHOR, self.settings.get('dns_servers', []),
+                                       self.settings.get('path_game_servers', []))
+    
+    def _open_store(self):
+        """open the on-disk history under the runtime dir"""
+        if not self.settings.get('persist_history', True):
+            return
+        try:
+            self.store = SegmentStore(
+                os.path.join(decky.DECKY_PLUGIN_RUNTIME_DIR, "history"),
+                segment_bytes=int(self.settings.get('store_segment_mb', 4) * 1024 * 1024),
+                max_bytes=int(self.settings.get('store_max_mb', 256) * 1024 * 1024),
+                retention_days=self.settings.get('store_retention_days', 30)
+            )
+            self.store.load()
+        except Exception as e:
+            decky.logger.error(f"Failed to open history store: {e}")
+            self.store = None
+    
+    def _start_link_watcher(self):
+        """subscribe to rtnetlink so connection info is a cache lookup"""
+        try:
+            self.link_watcher = LinkWatcher(
+                on_change=self._on_link_change,
+                on_error=lambda e: decky.logger.warning(f"Netlink socket error, link state may be stale: {e}"))
+            self.link_watcher.start(asyncio.get_running_loop())
+        except OSError as e:
+            decky.logger.warning(f"Netlink unavailable, falling back to nmcli: {e}")
+            self.link_watcher = None
+    
+    def _on_link_change(self, event: Dict):
+        """record a link/route change and make the bandwidth sampler follow the new route"""
+        with self.monitor.lock:
+            self.monitor.connection_history.append(event)
+        if self.monitor.interfaces and self.link_watcher:
+            self.monitor.interfaces.default_interface = self.link_watcher.state['interface']
+        self.cache.invalidate('connection')
+        self.monitor.routes.invalidate()
+        # a new path needs a fresh baseline quickly
+        self.adaptive.trigger(event['timestamp'], event['kind'])
+        decky.logger.info(f"Link change: {event['kind']} {event['interface']} {event['detail']}")
+    
+    def _schedule_store_flush(self, current_time: float):
+        """msync the store in a worker thread so the sampler never waits on disk"""
+        if not self.store or current_time - self.last_store_flush < self.settings.get('store_flush_interval', 10):
+            return
+        if self.store_flush_task and not self.store_flush_task.done():
+            return
+        self.last_store_flush = current_time
+        self.store_flush_task = asyncio.create_task(asyncio.to_thread(self.store.flush))
+    
     # Network monitoring methods
     async def start_monitoring(self):
         """Start continuous network monitoring"""
         if not self.monitor.monitoring:
             self.monitor.monitoring = True
+            if self.store:
+                self.store.open_session()
+            self.adaptive.trigger(time.time(), 'start')
             self.monitoring_task = asyncio.create_task(self._monitoring_loop())
+            self.publisher.publish('monitoring_state', {'monitoring': True})
             decky.logger.info("Network monitoring started")
             return True
         return False
@@ -215,10 +444,107 @@ class Plugin:
             self.monitor.monitoring = False
             if self.monitoring_task:
                 self.monitoring_task.cancel()
+            # don't leave probes the loop started running after it is gone
+            self.monitor.scheduler.cancel('monitor')
+            # nothing watches open incidents anymore, end them here instead of leaving them ongoing
+            for event in self.anomaly.close_all(time.time(), 'monitoring_stopped'):
+                self.publisher.append('incident', event)
+            self.publisher.publish('monitoring_state', {'monitoring': False})
+            if self.store:
+                await asyncio.to_thread(self.store.close)
             decky.logger.info("Network monitoring stopped")
             return True
         return False
     
+    async def _probe_quality(self, now: Optional[float] = None) -> Dict:
+        """one monitoring round over every path target, probes run in the scheduler's 'monitor' group"""
+        try:
+            paths = self.monitor.paths
+            # the gateway comes from the link watcher's dump, which may land after settings were applied
+            self._update_path_targets()
+            results = await paths.probe(
+                now=now, ping=lambda host, count, port: self.monitor.ping_target(host, count, port, 'monitor'))
+            quality = await self.monitor.test_connection_quality('monitor', results.get('internet'))
+            report = paths.localize(now)
+            quality['fault'] = report['fault']
+            self.publisher.publish('path_quality', report)
+            return quality
+        except (OSError, asyncio.TimeoutError):
+            # the probes themselves failed, nothing got through
+            return {
+                'quality': 'disconnected',
+                'score': 0,
+                'avg_latency': 999,
+                'avg_packet_loss': 100,
+                'jitter': 0
+            }
+        except Exception as e:
+            # a bug in scoring or localization is not a dead link, the loop skips this round
+            self.monitor.metrics.count('errors.probe_quality')
+            decky.logger.error(f"Probe round failed: {e!r}")
+            raise
+    
+    def _apply_quality(self, quality_result: Dict, current_time: float, observed_at: Optional[float] = None):
+        """take one probe round's result, `observed_at` feeds the adaptive scheduler when it is on"""
+        self.live_ping = quality_result.get('avg_latency', 0)
+        self.last_quality = quality_result
+        self.cache.put('quality', quality_result)
+        self.last_ping_time = current_time
+        if observed_at is not None:
+            self.adaptive.observe(quality_result.get('rtts') or [None], observed_at)
+        if self.settings.get('anomaly_detection', True):
+            # only incident transitions go out, batched once a second
+            for event in self.anomaly.observe(quality_result.get('rtts') or [None], current_time):
+                self.publisher.append('incident', event)
+    
+    def _record_sample(self, current_time: float, probed: bool):
+        """one loop tick into the ring, rollups, push batch and store"""
+        # Use last known quality if available
+        if not hasattr(self, 'last_quality'):
+            self.last_quality = {'quality': 'unknown', 'score': 0, 'avg_latency': 0, 'avg_packet_loss': 0}
+        
+        # Store data point, the ring overwrites the oldest sample once full
+        sample = (
+            current_time,
+            self.live_ping,
+            self.last_quality.get('jitter', 0),
+            self.last_quality.get('avg_packet_loss', 0),
+            self.last_quality.get('score', 0),
+            self.last_quality.get('quality', 'unknown'),
+            self.bandwidth_stats['download_bps'],
+            self.bandwidth_stats['upload_bps'],
+            self.last_dns_status.get('resolution_time', 0)
+        )
+        with self.monitor.lock:
+            self.monitor.network_data.append(*sample)
+            point = self.monitor.network_data.point(self.monitor.network_data.seq - 1)
+            # latency only counts once per probe, a disconnected probe is pure loss
+            connected = probed and self.last_quality.get('quality') != 'disconnected'
+            self.monitor.rollups.add(
+                current_time,
+                self.live_ping if connected else None,
+                self.last_quality.get('avg_packet_loss', 0) if probed else None,
+                self.bandwidth_stats['download_bps'],
+                self.bandwidth_stats['upload_bps']
+            )
+        
+        # samples are batched into one event per push_interval
+        self.publisher.append('network_sample', point)
+        if probed:
+            self.publisher.publish('network_status', {
+                'quality': self.last_quality,
+                'dns_status': self.last_dns_status,
+                'monitoring': True
+            })
+        
+        # persist to the page cache only, msync happens off-loop
+        if self.store:
+            try:
+                self.store.append(*sample)
+            except Exception as e:
+                decky.logger.error(f"History store error: {e}")
+            self._schedule_store_flush(current_time)
+    
     async def _monitoring_loop(self):
         """Background monitoring loop - simpler and more reliable"""
         prev_bytes_sent = None
@@ -229,102 +555,103 @@ class Plugin:
         while self.monitor.monitoring:
             try:
                 current_time = time.time()
+                iteration_start = time.perf_counter()
                 time_delta = current_time - last_check_time
                 
                 # Get network stats first (doesn't require network access)
-                net_stats = self.monitor.get_network_interface_stats()
-                
-                # calculate bandwidth in bits per second with real elapsed time
-                if prev_bytes_sent is not None and prev_bytes_recv is not None and time_delta > 0:
-                    upload_bps = (net_stats['bytes_sent'] - prev_bytes_sent) / time_delta * 8
-                    download_bps = (net_stats['bytes_recv'] - prev_bytes_recv) / time_delta * 8
-                    self.bandwidth_stats = {
-                        'download_bps': max(0, download_bps),
-                        'upload_bps': max(0, upload_bps)
-                    }
-                
-                prev_bytes_sent = net_stats['bytes_sent']
-                prev_bytes_recv = net_stats['bytes_recv']
-                last_check_time = current_time
-                
-                # only ping every ping_interval seconds
-                interval = self.settings.get('ping_interval', 30)
-                if hasattr(self, 'last_ping_time'):
-                    time_since_ping = current_time - self.last_ping_time
-                    if time_since_ping >= interval:
-                        try:
-                            socket.create_connection(("8.8.8.8", 53), timeout=2).close()
-                            quality_result = self.monitor.test_connection_quality()
-                        except Exception:
-                            quality_result = {
-                                'quality': 'disconnected',
-                                'score': 0,
-                                'avg_latency': 999,
-                                'avg_packet_loss': 100,
-                                'jitter': 0
-                            }
-                        self.live_ping = quality_result.get('avg_latency', 0)
-                        self.last_quality = quality_result
-                        self.last_ping_time = current_time
+                if self.monitor.interfaces:
+                    # procfs fast path, per-interface and wrap safe
+                    self.bandwidth_stats.update(self.monitor.interfaces.sample(current_time))
                 else:
-                    try:
-                        socket.create_connection(("8.8.8.8", 53), timeout=2).close()
-                        quality_result = self.monitor.test_connection_quality()
-                    except Exception:
-                        quality_result = {
-                            'quality': 'disconnected',
-                            'score': 0,
-                            'avg_latency': 999,
-                            'avg_packet_loss': 100,
-                            'jitter': 0
+                    net_stats = self.monitor.get_network_interface_stats()
+                    
+                    # calculate bandwidth in bits per second with real elapsed time
+                    if prev_bytes_sent is not None and prev_bytes_recv is not None and time_delta > 0:
+                        upload_bps = (net_stats['bytes_sent'] - prev_bytes_sent) / time_delta * 8
+                        download_bps = (net_stats['bytes_recv'] - prev_bytes_recv) / time_delta * 8
+                        self.bandwidth_stats = {
+                            'download_bps': max(0, download_bps),
+                            'upload_bps': max(0, upload_bps)
                         }
-                    self.live_ping = quality_result.get('avg_latency', 0)
-                    self.last_quality = quality_result
-                    self.last_ping_time = current_time
-                
-                # Use last known quality if available
-                if not hasattr(self, 'last_quality'):
-                    self.last_quality = {'quality': 'unknown', 'score': 0, 'avg_latency': 0, 'avg_packet_loss': 0}
+                    
+                    prev_bytes_sent = net_stats['bytes_sent']
+                    prev_bytes_recv = net_stats['bytes_recv']
+                last_check_time = current_time
                 
-                # Store data point
-                data_point = {
-                    'timestamp': datetime.now().isoformat(),
-                    'quality': self.last_quality,
-                    'live_ping': self.live_ping,
-                    'bandwidth': self.bandwidth_stats,
-                    'dns_status': self.last_dns_status
-                }
+                # adaptive mode probes when the stability tracker says so, otherwise every ping_interval
+                probed = False
+                interval = self.settings.get('ping_interval', 0.5)
+                adaptive = self.settings.get('adaptive_probing', False)
+                if adaptive:
+                    due = self.adaptive.due(current_time)
+                else:
+                    due = getattr(self, 'last_ping_time', None) is None or current_time - self.last_ping_time >= interval
+                if due:
+                    with self.monitor.metrics.time('monitor.probe'):
+                        quality_result = await self._probe_quality()
+                    self._apply_quality(quality_result, current_time, time.time() if adaptive else None)
+                    probed = True
                 
-                with self.monitor.lock:
-                    self.monitor.network_data.append(data_point)
-                    # Keep only last 50 data points
-                    if len(self.monitor.network_data) > 50:
-                        self.monitor.network_data.pop(0)
+                self._record_sample(current_time, probed)
                 
                 # reuse recent dns result instead of spamming lookups
                 if current_time - getattr(self, 'last_dns_check', 0) >= max(interval, 20):
                     self.last_dns_status = await self.test_dns()
                     self.last_dns_check = current_time
+                    self.cache.put('dns', self.last_dns_status)
                 
-                # Update frequently to honor short intervals
-                await asyncio.sleep(0.5)
+                # Update frequently to honor short intervals, wake less often once probing backed off
+                if adaptive:
+                    cadence = min(self.adaptive.sample_period(), max(0.05, self.adaptive.next_probe - time.time()))
+                else:
+                    cadence = 0.5
+                work = time.perf_counter() - iteration_start
+                self.monitor.metrics.observe('monitor.iteration', work * 1000)
+                if work > cadence:
+                    # the iteration took longer than the gap it was meant to fit in
+                    self.monitor.metrics.count('monitor.overruns')
+                await asyncio.sleep(cadence)
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
+                self.monitor.metrics.count('errors.monitoring')
                 decky.logger.error(f"Monitoring error: {e}")
                 await asyncio.sleep(5)
     
     async def test_single_ping(self, host: str = '8.8.8.8') -> Dict:
         """Test a single ping manually"""
-        return self.monitor.ping_host(host, 3)
+        return await self.monitor.ping_host(host, 3)
+    
+    async def ping_game_servers(self, servers: List[Dict]) -> Dict:
+        """Ping game servers concurrently, results keyed by server name once all are done"""
+        return await self.monitor.ping_game_servers(
+            servers,
+            concurrency=int(self.settings.get('server_concurrency', 8)),
+            timeout=float(self.settings.get('server_timeout', 5))
+        )
+    
+    async def stream_game_servers(self, servers: List[Dict]) -> Dict:
+        """Like ping_game_servers, each row is also emitted as a `game_server_result` event when ready"""
+        async def emit_result(result: Dict):
+            await decky.emit("game_server_result", result)
+        
+        return await self.monitor.ping_game_servers(
+            servers,
+            concurrency=int(self.settings.get('server_concurrency', 8)),
+            timeout=float(self.settings.get('server_timeout', 5)),
+            on_result=emit_result
+        )
     
     async def get_network_status(self) -> Dict:
-        """Get current network status"""
-        quality_result = self.monitor.test_connection_quality()
+        """Get current network status, probe results come from the cache the monitoring loop keeps warm"""
+        if self.monitor.monitoring and hasattr(self, 'last_quality'):
+            # the loop probes on its own (possibly adaptive) schedule, a poll never triggers a probe of its own
+            quality_result = self.last_quality
+        else:
+            quality_result = await self.cache.get('quality', self.monitor.test_connection_quality)
         net_stats = self.monitor.get_network_interface_stats()
-        self.last_dns_status = await self.test_dns()
-        self.last_dns_check = time.time()
+        self.last_dns_status = await self.cache.get('dns', self.test_dns)
         
         return {
             'quality': quality_result,
@@ -335,15 +662,51 @@ class Plugin:
             'dns_status': self.last_dns_status
         }
     
-    async def get_network_history(self) -> List[Dict]:
-        """Get network monitoring history"""
+    async def get_network_history(self, limit: int = 50, start: float = None, end: float = None) -> List[Dict]:
+        """Get the newest `limit` points of history, or the first `limit` points from start..end (epoch seconds) on disk"""
+        if start is not None and self.store:
+            def scan():
+                rows = []
+                for row in self.store.scan(start, end if end is not None else time.time()):
+                    rows.append(make_point(row))
+                    if len(rows) >= limit:
+                        break
+                return rows
+            return await asyncio.to_thread(scan)
         with self.monitor.lock:
-            return self.monitor.network_data.copy()
+            return self.monitor.network_data.window(limit)
+    
+    async def get_network_history_since(self, seq: int = -1, limit: int = 500) -> Dict:
+        """Get only the samples newer than the client's last sequence number"""
+        with self.monitor.lock:
+            return self.monitor.network_data.since(seq, limit)
+    
+    async def get_network_history_range(self, start: float, end: float, max_points: int = 120) -> List[Dict]:
+        """Get [start, end] (epoch seconds) downsampled to at most max_points min/max/avg buckets for charting"""
+        with self.monitor.lock:
+            oldest = self.monitor.network_data.oldest_timestamp
+            if not self.store or (oldest is not None and start >= oldest):
+                return self.monitor.network_data.downsample(start, end, max_points)
+        # older than the in-memory ring, scan the on-disk segments off-loop
+        return await asyncio.to_thread(self.store.downsample, start, end, max_points)
+    
+    async def get_rollups(self, resolution: str = '1m', window: float = 3600) -> Dict:
+        """Get per-bucket aggregates at a resolution plus a merged summary over the last `window` seconds"""
+        if resolution not in RESOLUTIONS:
+            return {'error': f"unknown resolution {resolution}, expected one of {list(RESOLUTIONS)}"}
+        now = time.time()
+        with self.monitor.lock:
+            return {
+                'resolution': resolution,
+                'buckets': self.monitor.rollups.buckets(resolution, now - window),
+                'summary': self.monitor.rollups.summary(now - window, now)
+            }
     
     async def clear_history(self):
         """Clear network monitoring history"""
         with self.monitor.lock:
             self.monitor.network_data.clear()
+            self.monitor.rollups.clear()
         decky.logger.info("Network history cleared")
     
     async def get_live_ping(self) -> float:
@@ -354,55 +717,104 @@ class Plugin:
         """Get current bandwidth statistics"""
         return self.bandwidth_stats
     
+    async def get_interface_stats(self) -> Dict:
+        """Get the latest per-interface rates and which interface the bandwidth figures follow"""
+        if not self.monitor.interfaces:
+            return {'error': 'per-interface stats need /proc/net/dev'}
+        return {
+            'interface': self.bandwidth_stats.get('interface'),
+            'default_interface': self.monitor.interfaces.default_interface,
+            'rates': self.monitor.interfaces.rates
+        }
+    
     async def update_settings(self, settings: Dict) -> bool:
         """Update plugin settings"""
         try:
             self.settings.update(settings)
+            self._apply_settings()
+            # dns servers, probe mode or interface may have changed
+            self.cache.invalidate()
             decky.logger.info(f"Settings updated: {settings}")
             return True
         except Exception as e:
             decky.logger.error(f"Failed to update settings: {e}")
             return False
     
+    async def get_probe_schedule(self) -> Dict:
+        """Current adaptive probe interval and why it was chosen"""
+        return self.adaptive.snapshot()
+    
+    async def get_push_stats(self) -> Dict:
+        """Events and payload bytes pushed to the frontend, per minute and per event"""
+        return self.publisher.stats()
+    
+    async def get_cache_stats(self) -> Dict:
+        """Hit/miss counters of the callable result cache"""
+        return self.cache.stats()
+    
     async def get_settings(self) -> Dict:
         """Get current plugin settings"""
         return self.settings
     
     async def test_dns(self, dns_server: str = None) -> Dict:
-        """Test DNS resolution speed"""
-        import time
+        """Test DNS resolution speed by querying the resolver directly over UDP"""
         test_domain = "google.com"
         dns = dns_server or self.settings.get('dns_servers', ['8.8.8.8'])[0]
         
-        try:
-            start = time.time()
-            socket.gethostbyname(test_domain)
-            resolution_time = (time.time() - start) * 1000  # Convert to ms
-            
-            return {
-                'success': True,
-                'dns_server': dns,
-                'domain': test_domain,
-                'resolution_time': resolution_time
-            }
-        except Exception as e:
+        start = time.perf_counter()
+        result = await dnsprobe.query(dns, test_domain, 'A', timeout=2.0)
+        self.monitor.metrics.observe('test_dns', (time.perf_counter() - start) * 1000, not result['success'])
+        if not result['success']:
             return {
                 'success': False,
                 'dns_server': dns,
-                'error': str(e)
+                'error': result.get('error') or f"rcode {result.get('rcode')}"
             }
+        return {
+            'success': True,
+            'dns_server': dns,
+            'domain': test_domain,
+            'resolution_time': result['resolution_time']
+        }
+    
+    async def benchmark_dns(self, domains: List[str] = None, apply_recommendation: bool = False) -> Dict:
+        """Rank the configured dns_servers by median and tail latency, optionally moving the fastest to the front"""
+        servers = self.settings.get('dns_servers', ['8.8.8.8', '1.1.1.1'])
+        result = await dnsprobe.benchmark(servers, domains)
+        
+        recommended = result.get('recommended')
+        if apply_recommendation and recommended:
+            self.settings['dns_servers'] = [recommended] + [s for s in servers if s != recommended]
+            # path targets follow dns_servers, the cached status and the loop's next check still name the old first server
+            self._apply_settings()
+            self.cache.invalidate('dns')
+            self.last_dns_check = 0
+            decky.logger.info(f"DNS servers reordered, fastest is {recommended}")
+        return result
+    
+    async def _load_connection_info(self) -> Dict:
+        """the slow half of get_connection_info, cached and dropped on link changes"""
+        hostname = socket.gethostname()
+        # resolving our own name can hit DNS, keep it off the loop
+        local_ip = await self.monitor.scheduler.run_blocking(
+            ('resolve', hostname), socket.gethostbyname, hostname, timeout=3)
+        link = self.link_watcher.state if self.link_watcher and self.link_watcher.ready else None
+        conn_type = link['connection_type'] if link else await self._detect_connection_type()
+        return {
+            'hostname': hostname,
+            'local_ip': local_ip,
+            'connection_type': conn_type,
+            'interface': link['interface'] if link else None,
+            'gateway': link['gateway'] if link else None
+        }
     
     async def get_connection_info(self) -> Dict:
         """Get detailed connection information"""
         try:
-            hostname = socket.gethostname()
-            local_ip = socket.gethostbyname(hostname)
-            conn_type = self._detect_connection_type()
+            info = await self.cache.get('connection', self._load_connection_info)
             
             return {
-                'hostname': hostname,
-                'local_ip': local_ip,
-                'connection_type': conn_type,
+                **info,
                 'monitoring': self.monitor.monitoring,
                 'live_ping': self.live_ping,
                 'bandwidth': self.bandwidth_stats
@@ -410,17 +822,156 @@ class Plugin:
         except Exception as e:
             return {'error': str(e)}
     
-    def _detect_connection_type(self) -> str:
+    async def get_link_events(self, since: float = 0) -> List[Dict]:
+        """Get link and default-route changes newer than `since` (epoch seconds)"""
+        with self.monitor.lock:
+            return [e for e in self.monitor.connection_history if e['timestamp'] > since]
+    
+    async def get_path_quality(self, probe: bool = False) -> Dict:
+        """Per-hop quality and where a degradation starts, probes a fresh round when asked or when monitoring is off"""
+        paths = self.monitor.paths
+        if probe or not self.monitor.monitoring or paths.last_report is None:
+            self._update_path_targets()
+            await paths.probe()
+        return paths.localize()
+    
+    async def trace_route(self, host: str = QUALITY_ANCHOR, refresh: bool = False) -> Dict:
+        """Hop by hop latency and loss to a host, cached for trace_cache_ttl unless refresh is set"""
+        try:
+            return await self.monitor.routes.get(host, refresh)
+        except asyncio.TimeoutError:
+            return {'host': host, 'error': 'trace timed out', 'hops': [], 'reached': False}
+        except Exception as e:
+            decky.logger.error(f"Trace error: {e}")
+            return {'host': host, 'error': str(e), 'hops': [], 'reached': False}
+    
+    async def get_incidents(self, since: float = 0, active_only: bool = False) -> List[Dict]:
+        """Latency, shift and loss incidents that started or ended after `since` (epoch seconds)"""
+        return self.anomaly.since(since, active_only)
+    
+    async def get_diagnostics(self) -> Dict:
+        """What the plugin itself costs: operation timings, counters, loop lag, memory and buffer sizes"""
+        monitor = self.monitor
+        with monitor.lock:
+            history = {
+                'samples': len(monitor.network_data),
+                'capacity': monitor.network_data.capacity,
+                'bytes': monitor.network_data.memory_bytes()
+            }
+            connection_events = len(monitor.connection_history)
+        return dict(
+            monitor.metrics.snapshot(),
+            uptime=time.time() - monitor.metrics.started,
+            loop_lag=self.loop_lag.snapshot(),
+            process=self.resources.sample(),
+            buffers={
+                'network_data': history,
+                'connection_history': connection_events,
+                'wifi_history_bytes': self.wifi_history.memory_bytes(),
+                'incidents': len(self.anomaly.incidents),
+                'route_changes': len(monitor.routes.changes),
+                'store': self.store.stats() if self.store else None
+            },
+            scheduler=monitor.scheduler.stats(),
+            cache=self.cache.stats(),
+            push=self.publisher.stats(),
+            profiling=self.profile.status()
+        )
+    
+    async def set_profiling(self, enabled: bool, limit: float = 60) -> Dict:
+        """Start a cProfile capture (stops by itself after `limit` seconds) or stop it and get the top functions"""
+        if enabled:
+            return self.profile.start(limit)
+        return self.profile.stop() or self.profile.status()
+    
+    async def get_route_changes(self, since: float = 0) -> List[Dict]:
+        """Route changes seen between traces newer than `since` (epoch seconds)"""
+        return [c for c in self.monitor.routes.changes if c['timestamp'] > since]
+    
+    def _export_dir(self) -> str:
+        return os.path.join(decky.DECKY_PLUGIN_RUNTIME_DIR, "exports")
+    
+    async def list_sessions(self) -> Dict:
+        """Monitoring sessions kept on disk (oldest first), earlier exports and the usable export formats"""
+        sessions = await asyncio.to_thread(self.store.sessions) if self.store else []
+        directory = self._export_dir()
+        exports = []
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.tmp'):
+                    exports.append({'name': name, 'bytes': os.path.getsize(os.path.join(directory, name))})
+        return {'sessions': sessions, 'exports': exports, 'formats': sessionio.formats(), 'directory': directory}
+    
+    async def export_session(self, session_start: float = None, fmt: str = 'auto', label: str = '') -> Dict:
+        """Stream a whole session (the newest by default) to a file in the exports folder under the runtime dir"""
+        try:
+            fmt = sessionio.resolve_format(fmt)
+        except ValueError as e:
+            return {'error': str(e)}
+        if self.store:
+            sessions = await asyncio.to_thread(self.store.sessions)
+            if session_start is None:
+                session = sessions[-1] if sessions else None
+            else:
+                session = next((s for s in sessions if s['start'] == session_start), None)
+            if session is None:
+                return {'error': 'no such session'}
+            # a generator over the segments, the worker reads one segment at a time
+            rows = self.store.scan_session(session['start'])
+            start = session['start']
+        else:
+            # without the on-disk history the in-memory ring is all there is
+            with self.monitor.lock:
+                rows = self.monitor.network_data.rows()
+            if not rows:
+                return {'error': 'no history to export'}
+            start = rows[0][0]
+        
+        link = self.link_watcher.state if self.link_watcher and self.link_watcher.ready else {}
+        meta = {
+            'label': label,
+            'session_start': start,
+            'exported_at': time.time(),
+            'hostname': socket.gethostname(),
+            'interface': link.get('interface'),
+            'connection_type': link.get('connection_type'),
+            'gateway': link.get('gateway'),
+            'plugin_version': decky.DECKY_PLUGIN_VERSION
+        }
+        directory = self._export_dir()
+        path = os.path.join(directory, f"session-{datetime.fromtimestamp(start).strftime('%Y%m%d-%H%M%S')}"
+                                       f"{sessionio.EXTENSIONS[fmt]}")
+        
+        def export():
+            os.makedirs(directory, exist_ok=True)
+            return sessionio.export_rows(rows, path, fmt, meta)
+        
+        try:
+            result = await asyncio.to_thread(export)
+        except Exception as e:
+            decky.logger.error(f"Session export failed: {e}")
+            return {'error': str(e)}
+        decky.logger.info(f"Exported {result['rows']} samples to {path} ({result['bytes']} bytes)")
+        return result
+    
+    async def import_session(self, path: str, max_points: int = 120) -> Dict:
+        """Summarize an exported session (a name in the exports folder or a full path) for offline comparison"""
+        if not os.path.isabs(path):
+            path = os.path.join(self._export_dir(), path)
+        try:
+            return await asyncio.to_thread(sessionio.analyze, path, max_points)
+        except Exception as e:
+            return {'error': str(e)}
+    
+    async def _detect_connection_type(self) -> str:
         """best-effort detection of active connection type"""
         try:
-            result = subprocess.run(
+            returncode, stdout, _stderr = await self.monitor.scheduler.run_command(
                 ["nmcli", "-t", "-f", "TYPE,STATE,DEVICE", "device"],
-                capture_output=True,
-                text=True,
                 timeout=5
             )
-            if result.returncode == 0:
-                for line in result.stdout.splitlines():
+            if returncode == 0:
+                for line in stdout.splitlines():
                     parts = line.split(":")
                     if len(parts) >= 2:
                         dev_type, state = parts[0], parts[1]
@@ -432,93 +983,83 @@ class Plugin:
                             if "cell" in dev_type or "gsm" in dev_type:
                                 return "tether"
             # fallback to routing table
-            route = subprocess.run(
+            returncode, route, _stderr = await self.monitor.scheduler.run_command(
                 ["ip", "route", "show", "default"],
-                capture_output=True,
-                text=True,
                 timeout=3
             )
-            if route.returncode == 0 and route.stdout:
-                if "wlan" in route.stdout or "wifi" in route.stdout:
+            if returncode == 0 and route:
+                if "wlan" in route or "wifi" in route:
                     return "wifi"
-                if "eth" in route.stdout or "enp" in route.stdout:
+                if "eth" in route or "enp" in route:
                     return "ethernet"
-                if "usb" in route.stdout or "rndis" in route.stdout:
+                if "usb" in route or "rndis" in route:
                     return "tether"
             return "unknown"
         except Exception:
             return "unknown"
     
-    async def scan_wifi_networks(self) -> Dict:
-        """scan nearby wifi networks and compute simple quality estimates"""
-        try:
-            # prefer nmcli for consistent parsing on steam deck
-            scan = subprocess.run(
-                ["nmcli", "-t", "-f", "SSID,SIGNAL,FREQ,CHAN,BARS,SECURITY", "device", "wifi", "list"],
-                capture_output=True,
-                text=True,
+    async def _wifi_scan(self, rescan: bool = True) -> wifiscan.ScanTable:
+        """run nmcli off the loop and parse the list, raises RuntimeError when nmcli fails"""
+        # prefer nmcli for consistent parsing on steam deck, a scan can take seconds so it runs as
+        # a subprocess the loop doesn't wait on and a second request while one is running joins it.
+        # Without rescan nmcli returns NetworkManager's own periodic results immediately.
+        extra = [] if rescan else ["--rescan", "no"]
+        for fields in (wifiscan.SCAN_FIELDS, wifiscan.LEGACY_FIELDS):
+            # NetworkManager before 1.38 has no BANDWIDTH field, retry with the old list
+            returncode, stdout, stderr = await self.monitor.scheduler.run_command(
+                ["nmcli", "-t", "-f", ",".join(fields), "device", "wifi", "list"] + extra,
                 timeout=10
             )
-            if scan.returncode != 0:
-                return {"error": scan.stderr.strip() or "nmcli failed"}
-            
-            networks = []
-            channel_counts = {}
-            for line in scan.stdout.splitlines():
-                # ignore empty rows from the scanner
-                parts = line.split(":")
-                if len(parts) < 4:
-                    continue
-                ssid = parts[0] or "<hidden>"
-                try:
-                    signal = int(parts[1])
-                except:
-                    signal = 0
-                try:
-                    freq = float(parts[2]) if parts[2] else 0
-                except:
-                    freq = 0
-                try:
-                    chan = int(parts[3]) if parts[3] else 0
-                except:
-                    chan = 0
-                
-                band = "2.4GHz" if freq and freq < 3000 else "5GHz"
-                channel_counts[chan] = channel_counts.get(chan, 0) + 1
-                networks.append({
-                    "ssid": ssid,
-                    "signal": signal,
-                    "freq": freq,
-                    "channel": chan,
-                    "band": band,
-                    "security": parts[5] if len(parts) > 5 else "",
-                })
-            
-            for net in networks:
-                # simple latency heuristic based on rssi and crowding
-                congestion = channel_counts.get(net["channel"], 1)
-                base_latency = max(8, 220 - net["signal"] * 1.6)
-                band_penalty = 10 if net["band"] == "2.4GHz" else 0
-                congestion_penalty = max(0, (congestion - 1) * 8)
-                net["estimated_latency_ms"] = round(base_latency + band_penalty + congestion_penalty, 1)
-                net["congestion"] = congestion
-            
-            # suggest best channel by lowest congestion then highest signal sum
-            best_channel = None
-            if channel_counts:
-                best_channel = sorted(
-                    channel_counts.items(),
-                    key=lambda item: (item[1], -sum([n["signal"] for n in networks if n["channel"] == item[0]]))
-                )[0][0]
-            
-            return {
-                "networks": networks,
-                "best_channel": best_channel,
-                "channel_load": channel_counts
-            }
+            if returncode == 0:
+                return wifiscan.ScanTable.from_nmcli(stdout, fields)
+        raise RuntimeError(stderr.strip() or "nmcli failed")
+    
+    async def scan_wifi_networks(self) -> Dict:
+        """scan nearby wifi networks, rank channels per band by overlap-weighted interference"""
+        try:
+            table = await self._wifi_scan()
+            diff = self.wifi_history.update(table, time.time())
+            # hundreds of APs at a LAN event is real work, keep it off the loop
+            result = await self.monitor.scheduler.run_blocking(None, wifiscan.summarize_scan, table, timeout=10)
+            result['seq'] = diff['seq']
+            return result
+        except asyncio.TimeoutError:
+            return {"error": "wifi scan timed out"}
         except Exception as e:
             return {"error": str(e)}
     
+    def _sync_wifi_scanner(self):
+        """start or stop the background wifi scanner to match settings"""
+        enabled = bool(self.settings.get('wifi_background_scan', False))
+        running = self.wifi_scan_task is not None and not self.wifi_scan_task.done()
+        if enabled and not running:
+            self.wifi_scan_task = asyncio.create_task(self._wifi_scan_loop())
+        elif not enabled and running:
+            self.wifi_scan_task.cancel()
+            self.wifi_scan_task = None
+    
+    async def _wifi_scan_loop(self):
+        """fold NetworkManager's scan results into the per-BSSID history and push the diffs"""
+        while True:
+            try:
+                table = await self._wifi_scan(rescan=False)
+                diff = self.wifi_history.update(table, time.time())
+                if diff['added'] or diff['changed'] or diff['removed'] or diff['evicted']:
+                    self.publisher.publish('wifi_changes', self.wifi_history.changes(diff['seq'] - 1))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                decky.logger.warning(f"Background wifi scan failed: {e}")
+            await asyncio.sleep(max(10, float(self.settings.get('wifi_scan_interval', 60))))
+    
+    async def get_wifi_changes(self, seq: int = -1) -> Dict:
+        """BSSIDs added, changed or gone since scan `seq`, a full snapshot when seq is -1 or too old"""
+        return self.wifi_history.changes(int(seq))
+    
+    async def get_wifi_trend(self, bssid: str = None, window: float = 1800) -> Dict:
+        """Signal trend of one BSSID (the connected AP by default) from scan history, no rescan"""
+        return self.wifi_history.trend(bssid, float(window), time.time())
+    
 
     # Asyncio-compatible long-running code, executed in a task when the plugin is loaded
     async def _main(self):
@@ -527,22 +1068,36 @@ class Plugin:
         
         # Load settings
         try:
-            settings_path = os.path.join(decky.DECKY_SETTINGS_DIR, "network-sentinel.json")
+            settings_path = os.path.join(decky.DECKY_PLUGIN_SETTINGS_DIR, "network-sentinel.json")
             if os.path.exists(settings_path):
                 with open(settings_path, 'r') as f:
-                    self.settings = json.load(f)
+                    # saved values over the defaults, so settings added later keep theirs
+                    self.settings.update(json.load(f))
         except Exception as e:
             decky.logger.error(f"Failed to load settings: {e}")
-            self.settings = {}
+        self._start_link_watcher()
+        self._open_store()
+        self._apply_settings()
+        self.loop_lag.start()
 
     # Function called first during the unload process
     async def _unload(self):
         decky.logger.info("Network Sentinel plugin unloading")
         await self.stop_monitoring()
+        if self.link_watcher:
+            self.link_watcher.stop()
+        if self.wifi_scan_task:
+            self.wifi_scan_task.cancel()
+        self.monitor.scheduler.shutdown()
+        self.publisher.cancel()
+        self.loop_lag.stop()
+        self.profile.stop()
+        if self.store:
+            await asyncio.to_thread(self.store.close)
         
         # Save settings
         try:
-            settings_path = os.path.join(decky.DECKY_SETTINGS_DIR, "network-sentinel.json")
+            settings_path = os.path.join(decky.DECKY_PLUGIN_SETTINGS_DIR, "network-sentinel.json")
             with open(settings_path, 'w') as f:
                 json.dump(self.settings, f, indent=2)
         except Exception as e:
@@ -0,0 +1,105 @@
+from typing import List, Optional
+
+from streamstats import Ewma
+
+
+class AdaptiveInterval:
+    """
+    Probe interval that backs off while the link is steady and snaps back when it isn't.
+
+    Every probe burst is checked for loss, spread within the burst and RTTs
+    outside the running EWMA band. An unstable burst (or `trigger()`, e.g. on a
+    link change) drops the interval to `min_interval`, and it stays there for
+    as long as bursts keep looking unstable. After `calm_probes` steady bursts
+    in a row it grows by `backoff` up to `max_interval`.
+
+    Only steady bursts feed the RTT baseline, so a spike doesn't drag it up and
+    make the recovery look unstable too. A level shift that stays tight for
+    `rebase_after` bursts becomes the new baseline.
+    """
+
+    def __init__(self, min_interval: float = 5.0, max_interval: float = 30.0, backoff: float = 2.0,
+                 calm_probes: int = 2, jitter_threshold: float = 10.0, deviation: float = 3.0,
+                 deviation_floor: float = 5.0, rebase_after: int = 3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.calm_probes = calm_probes
+        self.jitter_threshold = jitter_threshold
+        self.deviation = deviation
+        self.deviation_floor = deviation_floor
+        self.rebase_after = rebase_after
+        self.baseline = Ewma(0.1)
+        self.shifted = 0
+        self.interval = min_interval
+        self.calm = 0
+        self.next_probe = 0.0
+        self.reason = 'start'
+
+    def configure(self, min_interval: float, max_interval: float):
+        self.min_interval = max(0.5, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+    def due(self, now: float) -> bool:
+        return now >= self.next_probe
+
+    def unstable(self, rtts: List[Optional[float]]) -> Optional[str]:
+        """why a burst looks unstable, None if it is steady"""
+        if not rtts or any(rtt is None for rtt in rtts):
+            return 'loss'
+        if len(rtts) > 1 and max(rtts) - min(rtts) > self.jitter_threshold:
+            return 'jitter'
+        if self.baseline.initialized:
+            band = max(self.deviation * self.baseline.std, self.deviation_floor)
+            if any(abs(rtt - self.baseline.mean) > band for rtt in rtts):
+                return 'rtt'
+        return None
+
+    def observe(self, rtts: List[Optional[float]], now: float) -> float:
+        """feed one burst (None = lost), schedule the next probe and return the interval"""
+        reason = self.unstable(rtts)
+        if reason == 'rtt':
+            self.shifted += 1
+            if self.shifted >= self.rebase_after:
+                # latency moved and stayed put, e.g. a new route
+                self.baseline = Ewma(self.baseline.alpha)
+                self.shifted = 0
+        else:
+            self.shifted = 0
+        if reason is None or not self.baseline.initialized:
+            for rtt in rtts:
+                if rtt is not None:
+                    self.baseline.update(rtt)
+        if reason:
+            self.interval = self.min_interval
+            self.calm = 0
+            self.reason = reason
+        else:
+            self.calm += 1
+            if self.calm >= self.calm_probes:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+                self.calm = 0
+                self.reason = 'steady'
+        self.next_probe = now + self.interval
+        return self.interval
+
+    def trigger(self, now: float, reason: str = 'link'):
+        """probe right away and restart from the fastest interval"""
+        self.interval = self.min_interval
+        self.calm = 0
+        self.reason = reason
+        self.next_probe = now
+
+    def sample_period(self, fast: float = 0.5, slow: float = 2.0) -> float:
+        """how often the loop itself should wake, slower once probing has backed off"""
+        return min(slow, max(fast, self.interval / 10))
+
+    def snapshot(self) -> dict:
+        return {
+            'interval': self.interval,
+            'reason': self.reason,
+            'next_probe': self.next_probe,
+            'baseline_rtt': self.baseline.mean if self.baseline.initialized else None,
+            'baseline_std': self.baseline.std
+        }
@@ -0,0 +1,272 @@
+from collections import deque
+from typing import Dict, List, Optional
+
+from streamstats import Ewma
+
+
+class ThresholdDetector:
+    """
+    RTT above a fixed threshold with hysteresis.
+
+    Opens after `enter` consecutive probes above `threshold` and closes after
+    `exit` consecutive probes below `threshold * clear_ratio`, so a latency
+    hovering around the threshold doesn't flap. Lost probes don't move it.
+    """
+
+    def __init__(self, threshold: float = 50.0, enter: int = 3, exit: int = 5, clear_ratio: float = 0.8):
+        self.threshold = threshold
+        self.enter = enter
+        self.exit = exit
+        self.clear_ratio = clear_ratio
+        self.active = False
+        self.above = 0
+        self.below = 0
+
+    def update(self, rtt: Optional[float]) -> Optional[bool]:
+        """True when the alarm opens, False when it closes, None otherwise"""
+        if rtt is None:
+            return None
+        if rtt > self.threshold:
+            self.above += 1
+            self.below = 0
+        elif rtt < self.threshold * self.clear_ratio:
+            self.below += 1
+            self.above = 0
+        else:
+            # inside the hysteresis band, neither count grows
+            self.above = self.below = 0
+        if not self.active and self.above >= self.enter:
+            self.active = True
+            return True
+        if self.active and self.below >= self.exit:
+            self.active = False
+            return False
+        return None
+
+
+class CusumDetector:
+    """
+    One-sided CUSUM on RTT standardized against an EWMA baseline.
+
+    Each probe adds its capped z-score minus the slack `k`, an alarm opens when
+    the sum passes `h`. The baseline only learns from probes that carry no
+    evidence of a shift, so a slow climb can't drag it along. An alarm closes
+    once `exit` probes in a row are back near the baseline, or after
+    `rebase_after` probes at the new level, which becomes the baseline.
+    """
+
+    def __init__(self, k: float = 1.0, h: float = 10.0, z_cap: float = 4.0, alpha: float = 0.02,
+                 warmup: int = 30, exit: int = 5, rebase_after: int = 300, floor_ms: float = 1.0,
+                 floor_ratio: float = 0.05):
+        self.k = k
+        self.h = h
+        self.z_cap = z_cap
+        self.baseline = Ewma(alpha)
+        # tracks the current level, what the baseline becomes on a rebase
+        self.level = Ewma(0.2)
+        self.warmup = warmup
+        self.exit = exit
+        self.rebase_after = rebase_after
+        self.floor_ms = floor_ms
+        self.floor_ratio = floor_ratio
+        self.seen = 0
+        self.sum = 0.0
+        self.active = False
+        self.near = 0
+        self.alarmed_for = 0
+
+    def sigma(self) -> float:
+        return max(self.baseline.std, self.floor_ms, self.baseline.mean * self.floor_ratio)
+
+    def shift(self) -> float:
+        """how far the current level sits above the baseline, in ms"""
+        return self.level.mean - self.baseline.mean
+
+    def update(self, rtt: Optional[float]) -> Optional[bool]:
+        if rtt is None:
+            return None
+        self.seen += 1
+        self.level.update(rtt)
+        if self.seen <= self.warmup:
+            self.baseline.update(rtt)
+            return None
+        z = min(self.z_cap, (rtt - self.baseline.mean) / self.sigma())
+        self.sum = max(0.0, self.sum + z - self.k)
+
+        if not self.active:
+            if self.sum > self.h:
+                self.active = True
+                self.near = 0
+                self.alarmed_for = 0
+                return True
+            if self.sum < self.h / 2:
+                self.baseline.update(rtt)
+            return None
+
+        self.alarmed_for += 1
+        self.near = self.near + 1 if z < 3 else 0
+        if self.near >= self.exit:
+            self.active = False
+            self.sum = 0.0
+            return False
+        if self.alarmed_for >= self.rebase_after:
+            # the shift stuck, it's the new normal
+            self.baseline.mean = self.level.mean
+            self.active = False
+            self.sum = 0.0
+            return False
+        return None
+
+
+class LossBurstDetector:
+    """
+    Bursts of lost probes over a sliding window.
+
+    Opens on `burst` consecutive losses or a window loss rate of `rate`, closes
+    after `exit` probes in a row got through.
+    """
+
+    def __init__(self, window: int = 20, burst: int = 3, rate: float = 0.25, exit: int = 10):
+        self.window = deque(maxlen=window)
+        self.lost = 0
+        self.burst = burst
+        self.rate = rate
+        self.exit = exit
+        self.consecutive = 0
+        self.longest = 0
+        self.since_loss = 0
+        self.active = False
+
+    def loss_rate(self) -> float:
+        return self.lost / len(self.window) if self.window else 0.0
+
+    def update(self, rtt: Optional[float]) -> Optional[bool]:
+        lost = rtt is None
+        if len(self.window) == self.window.maxlen:
+            self.lost -= self.window[0]
+        self.window.append(lost)
+        self.lost += lost
+        if lost:
+            self.consecutive += 1
+            self.since_loss = 0
+        else:
+            self.consecutive = 0
+            self.since_loss += 1
+
+        if not self.active:
+            full = len(self.window) >= self.window.maxlen // 2
+            if self.consecutive >= self.burst or (full and self.loss_rate() >= self.rate):
+                self.active = True
+                self.longest = self.consecutive
+                return True
+            return None
+        self.longest = max(self.longest, self.consecutive)
+        if self.since_loss >= self.exit:
+            self.active = False
+            return False
+        return None
+
+
+class AnomalyDetector:
+    """
+    Runs the threshold, CUSUM and loss detectors on every probe and turns
+    their alarms into incidents.
+
+    Every detector is O(1) time and memory per probe. An incident has a start,
+    an end once its detector clears, a severity that only escalates and the
+    worst value seen. `observe` returns only transitions (opened, escalated,
+    closed) so the caller pushes a handful of events per incident, not one
+    per probe.
+    """
+
+    def __init__(self, threshold: float = 50.0, keep: int = 200):
+        self.threshold = ThresholdDetector(threshold)
+        self.cusum = CusumDetector()
+        self.loss = LossBurstDetector()
+        self.incidents = deque(maxlen=keep)
+        self.active: Dict[str, Dict] = {}
+        self.next_id = 1
+
+    def configure(self, threshold: float):
+        self.threshold.threshold = float(threshold)
+
+    def observe(self, rtts: List[Optional[float]], now: float) -> List[Dict]:
+        """feed one probe burst, returns incident transitions as {'action', 'incident'}"""
+        events = []
+        for rtt in rtts:
+            for kind, detector in (('latency', self.threshold), ('shift', self.cusum), ('loss', self.loss)):
+                change = detector.update(rtt)
+                if change is True:
+                    self._open(kind, now)
+                    self._track(kind, rtt)
+                    events.append({'action': 'opened', 'incident': dict(self.active[kind])})
+                elif change is False:
+                    events.append(self._close(kind, now))
+                # lost probes only tell the loss detector something
+                elif kind in self.active and (rtt is not None or kind == 'loss'):
+                    if self._track(kind, rtt):
+                        events.append({'action': 'escalated', 'incident': dict(self.active[kind])})
+        return events
+
+    def _open(self, kind: str, now: float):
+        incident = {
+            'id': self.next_id,
+            'kind': kind,
+            'start': now,
+            'end': None,
+            'severity': 'warning',
+            'peak': None,
+            'detail': '',
+            'reason': None
+        }
+        self.next_id += 1
+        self.active[kind] = incident
+        self.incidents.append(incident)
+
+    def _close(self, kind: str, now: float, reason: str = 'cleared') -> Dict:
+        incident = self.active.pop(kind)
+        incident['end'] = now
+        incident['reason'] = reason
+        return {'action': 'closed', 'incident': dict(incident)}
+
+    def close_all(self, now: float, reason: str) -> List[Dict]:
+        """close every open incident, e.g. when monitoring stops, and restart the detectors"""
+        events = [self._close(kind, now, reason) for kind in list(self.active)]
+        # a detector still alarmed would close an incident that is already gone
+        self.threshold = ThresholdDetector(self.threshold.threshold)
+        self.cusum = CusumDetector()
+        self.loss = LossBurstDetector()
+        return events
+
+    def _track(self, kind: str, rtt: Optional[float]) -> bool:
+        """update the incident's peak and detail, True when it just turned critical"""
+        incident = self.active[kind]
+        limit = self.threshold.threshold
+        if kind == 'latency':
+            incident['peak'] = max(incident['peak'] or 0.0, rtt)
+            incident['detail'] = f"RTT above {limit:g}ms, peak {incident['peak']:.0f}ms"
+            critical = incident['peak'] >= 2 * limit
+        elif kind == 'shift':
+            shift = self.cusum.shift()
+            incident['peak'] = max(incident['peak'] or 0.0, shift)
+            incident['detail'] = f"RTT shifted +{incident['peak']:.0f}ms over a {self.cusum.baseline.mean:.0f}ms baseline"
+            critical = incident['peak'] >= max(20.0, self.cusum.baseline.mean * 0.5)
+        else:
+            rate = self.loss.loss_rate()
+            incident['peak'] = max(incident['peak'] or 0.0, rate * 100)
+            incident['detail'] = f"{incident['peak']:.0f}% loss, {self.loss.longest} lost in a row"
+            critical = incident['peak'] >= 50 or self.loss.longest >= 6
+        if critical and incident['severity'] != 'critical':
+            incident['severity'] = 'critical'
+            return True
+        return False
+
+    def since(self, timestamp: float = 0, active_only: bool = False) -> List[Dict]:
+        """incidents that started or ended after `timestamp`, oldest first"""
+        out = []
+        for incident in self.incidents:
+            if active_only and incident['end'] is not None:
+                continue
+            if incident['start'] > timestamp or (incident['end'] or 0) > timestamp or incident['end'] is None:
+                out.append(dict(incident))
+        return out
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """
+    TTL cache for expensive callables with stale-while-revalidate and request coalescing.
+
+    `ttls` maps a key to (ttl, stale) in seconds. A result younger than `ttl` is
+    served as is, up to `ttl + stale` it is still served but one background
+    refresh is started, anything older is a miss and the caller waits for the
+    loader. Concurrent misses or refreshes of one key share a single loader call.
+    """
+
+    def __init__(self, ttls: Optional[Dict[Hashable, Tuple[float, float]]] = None,
+                 default_ttl: Tuple[float, float] = (5.0, 30.0)):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        # key -> (value, stored_at)
+        self.entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0, 'refresh_errors': 0}
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable], ttl: Optional[float] = None) -> Any:
+        """cached value of `key`, `ttl` overrides the configured freshness for this call"""
+        default_ttl, stale = self.ttls.get(key, self.default_ttl)
+        ttl = default_ttl if ttl is None else ttl
+        entry = self.entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < ttl:
+                self.counters['hits'] += 1
+                return entry[0]
+            if age < ttl + stale:
+                self.counters['stale_hits'] += 1
+                if key not in self.inflight:
+                    self._load(key, loader).add_done_callback(self._log_refresh)
+                return entry[0]
+        self.counters['misses'] += 1
+        task = self.inflight.get(key)
+        if task is None:
+            task = self._load(key, loader)
+        else:
+            self.counters['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable]) -> asyncio.Task:
+        async def run():
+            value = await loader()
+            self.put(key, value)
+            return value
+
+        task = asyncio.ensure_future(run())
+        self.inflight[key] = task
+        task.add_done_callback(lambda _t: self.inflight.pop(key, None))
+        return task
+
+    def _log_refresh(self, task: asyncio.Task):
+        # background refreshes have no caller to raise to, keep the stale value
+        if not task.cancelled() and task.exception() is not None:
+            self.counters['refresh_errors'] += 1
+
+    def put(self, key: Hashable, value: Any):
+        """store a result produced elsewhere, e.g. by the monitoring loop"""
+        self.entries[key] = (value, time.monotonic())
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """drop one key or everything, a running load still completes and repopulates"""
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+
+    def stats(self) -> Dict:
+        lookups = self.counters['hits'] + self.counters['stale_hits'] + self.counters['misses']
+        return dict(
+            self.counters,
+            hit_ratio=(self.counters['hits'] + self.counters['stale_hits']) / lookups if lookups else 0.0,
+            entries=len(self.entries),
+            refreshing=len(self.inflight)
+        )
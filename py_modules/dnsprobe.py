@@ -0,0 +1,140 @@
+import asyncio
+import random
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+QTYPES = {'A': 1, 'AAAA': 28}
+DEFAULT_DOMAINS = ['google.com', 'cloudflare.com', 'steampowered.com', 'valvesoftware.com']
+
+
+def build_query(qid: int, domain: str, qtype: str = 'A') -> bytes:
+    """standard recursive query with a single question"""
+    header = struct.pack('!HHHHHH', qid, 0x0100, 1, 0, 0, 0)
+    labels = b''.join(bytes([len(part)]) + part.encode('idna') for part in domain.strip('.').split('.') if part)
+    return header + labels + b'\x00' + struct.pack('!HH', QTYPES[qtype], 1)
+
+
+def parse_response(data: bytes) -> Optional[Tuple[int, int, int]]:
+    """(id, rcode, answer count) of a response, None if it isn't one"""
+    if len(data) < 12:
+        return None
+    qid, flags, _qd, ancount, _ns, _ar = struct.unpack('!HHHHHH', data[:12])
+    if not flags & 0x8000:
+        return None
+    return qid, flags & 0xf, ancount
+
+
+def split_server(server: str) -> Tuple[str, int]:
+    """'1.1.1.1', '127.0.0.1:5353' or '[::1]:53' into host and port"""
+    if server.startswith('['):
+        host, _, port = server[1:].partition(']')
+        return host, int(port.lstrip(':') or 53)
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, 53
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, qid: int, waiter: asyncio.Future):
+        self.qid = qid
+        self.waiter = waiter
+
+    def datagram_received(self, data, addr):
+        parsed = parse_response(data)
+        # ignore stray or spoofed replies, only our id completes the query
+        if parsed and parsed[0] == self.qid and not self.waiter.done():
+            self.waiter.set_result((time.perf_counter(), parsed))
+
+    def error_received(self, exc):
+        if not self.waiter.done():
+            self.waiter.set_exception(exc)
+
+
+async def query(server: str, domain: str, qtype: str = 'A', timeout: float = 2.0) -> Dict:
+    """send one query straight to `server` over UDP and time the answer"""
+    loop = asyncio.get_running_loop()
+    host, port = split_server(server)
+    qid = random.getrandbits(16)
+    waiter = loop.create_future()
+    result = {'dns_server': server, 'domain': domain, 'qtype': qtype}
+    transport = None
+    try:
+        transport, _protocol = await loop.create_datagram_endpoint(
+            lambda: _QueryProtocol(qid, waiter), remote_addr=(host, port))
+        start = time.perf_counter()
+        transport.sendto(build_query(qid, domain, qtype))
+        received, (_qid, rcode, answers) = await asyncio.wait_for(waiter, timeout)
+        result.update({
+            'success': rcode in (0, 3),
+            'resolution_time': (received - start) * 1000,
+            'rcode': rcode,
+            'answers': answers
+        })
+    except asyncio.TimeoutError:
+        result.update({'success': False, 'error': 'timeout'})
+    except Exception as e:
+        result.update({'success': False, 'error': str(e)})
+    finally:
+        if transport:
+            transport.close()
+    return result
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def benchmark_server(server: str, domains: List[str], rounds: int = 3,
+                           qtypes: Tuple[str, ...] = ('A', 'AAAA'), timeout: float = 2.0) -> Dict:
+    """
+    Time one resolver: the first query per name counts as cold, repeats as warm.
+
+    Queries for one server run back to back so they don't queue behind each other.
+    """
+    cold, warm = [], []
+    failures = 0
+    for domain in domains:
+        for qtype in qtypes:
+            for n in range(max(1, rounds)):
+                result = await query(server, domain, qtype, timeout)
+                if not result['success']:
+                    failures += 1
+                    continue
+                (warm if n else cold).append(result['resolution_time'])
+    times = cold + warm
+    total = len(domains) * len(qtypes) * max(1, rounds)
+    return {
+        'dns_server': server,
+        'success': bool(times),
+        'cold_median': _percentile(cold, 0.5),
+        'warm_median': _percentile(warm, 0.5),
+        'median': _percentile(times, 0.5),
+        'p90': _percentile(times, 0.9),
+        'max': max(times) if times else None,
+        'failures': failures,
+        'failure_rate': failures / total if total else 0
+    }
+
+
+async def benchmark(servers: List[str], domains: Optional[List[str]] = None, rounds: int = 3,
+                    qtypes: Tuple[str, ...] = ('A', 'AAAA'), timeout: float = 2.0) -> Dict:
+    """benchmark every server in parallel and rank by median, then tail latency"""
+    domains = domains or DEFAULT_DOMAINS
+    results = await asyncio.gather(*(benchmark_server(s, domains, rounds, qtypes, timeout) for s in servers))
+
+    def rank(result: Dict):
+        if not result['success']:
+            return (1, float('inf'), float('inf'))
+        return (result['failure_rate'] > 0.2, result['median'], result['p90'])
+
+    ranked = sorted(results, key=rank)
+    return {
+        'servers': ranked,
+        'recommended': ranked[0]['dns_server'] if ranked and ranked[0]['success'] else None,
+        'domains': domains
+    }
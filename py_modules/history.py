@@ -0,0 +1,220 @@
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+QUALITY_LABELS = ['unknown', 'disconnected', 'poor', 'fair', 'good', 'excellent']
+QUALITY_CODES = {label: code for code, label in enumerate(QUALITY_LABELS)}
+
+# float columns, all stored as 8 byte doubles
+COLUMNS = ('timestamp', 'rtt', 'jitter', 'loss', 'score', 'download_bps', 'upload_bps', 'dns_time')
+
+
+def make_point(row: tuple, seq: Optional[int] = None) -> Dict:
+    """
+    Build the history dict the frontend reads from a row of
+    (timestamp, rtt, jitter, loss, score, download_bps, upload_bps, dns_time, quality_code).
+    """
+    timestamp, rtt, jitter, loss, score, download_bps, upload_bps, dns_time, quality = row
+    point = {
+        'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+        'quality': {
+            'quality': QUALITY_LABELS[quality] if 0 <= quality < len(QUALITY_LABELS) else 'unknown',
+            'score': score,
+            'avg_latency': rtt,
+            'avg_packet_loss': loss,
+            'jitter': jitter
+        },
+        'live_ping': rtt,
+        'bandwidth': {'download_bps': download_bps, 'upload_bps': upload_bps},
+        'dns_status': {'resolution_time': dns_time}
+    }
+    if seq is not None:
+        point['seq'] = seq
+    return point
+
+
+def downsample_rows(rows: Iterable[tuple], start: float, end: float, max_points: int) -> List[Dict]:
+    """
+    Aggregate time-ordered rows in [start, end] into at most `max_points` equal-width time buckets.
+
+    Each bucket carries min/max/avg RTT and averages of the other columns, empty buckets are skipped.
+    """
+    max_points = max(1, int(max_points))
+    if end <= start:
+        return []
+
+    width = (end - start) / max_points
+    buckets = []
+    current = None
+    for timestamp, rtt, jitter, loss, score, download_bps, upload_bps, _dns, _quality in rows:
+        if timestamp < start or timestamp > end:
+            continue
+        bucket = min(int((timestamp - start) / width), max_points - 1)
+        if current is None or current['bucket'] != bucket:
+            current = {
+                'bucket': bucket, 'timestamp': start + bucket * width, 'count': 0,
+                'rtt_min': rtt, 'rtt_max': rtt, 'rtt_sum': 0.0, 'jitter_sum': 0.0,
+                'loss_sum': 0.0, 'loss_max': 0.0, 'score_sum': 0.0,
+                'download_sum': 0.0, 'upload_sum': 0.0
+            }
+            buckets.append(current)
+        current['count'] += 1
+        current['rtt_min'] = min(current['rtt_min'], rtt)
+        current['rtt_max'] = max(current['rtt_max'], rtt)
+        current['rtt_sum'] += rtt
+        current['jitter_sum'] += jitter
+        current['loss_sum'] += loss
+        current['loss_max'] = max(current['loss_max'], loss)
+        current['score_sum'] += score
+        current['download_sum'] += download_bps
+        current['upload_sum'] += upload_bps
+
+    return [{
+        'timestamp': b['timestamp'],
+        'count': b['count'],
+        'rtt_min': b['rtt_min'],
+        'rtt_max': b['rtt_max'],
+        'rtt_avg': b['rtt_sum'] / b['count'],
+        'jitter_avg': b['jitter_sum'] / b['count'],
+        'loss_avg': b['loss_sum'] / b['count'],
+        'loss_max': b['loss_max'],
+        'score_avg': b['score_sum'] / b['count'],
+        'download_bps_avg': b['download_sum'] / b['count'],
+        'upload_bps_avg': b['upload_sum'] / b['count']
+    } for b in buckets]
+
+
+class HistoryRing:
+    """
+    Preallocated columnar ring buffer for monitoring samples.
+
+    Every column is an `array` of fixed length so memory stays at
+    `capacity * (8 * len(COLUMNS) + 1)` bytes no matter how long monitoring runs.
+    Dicts are only built for the rows a caller asks for.
+    """
+
+    def __init__(self, capacity: int = 7200):
+        self.capacity = max(1, int(capacity))
+        self._alloc(self.capacity)
+        # total samples ever appended, the oldest live row is seq - len
+        self.seq = 0
+        self.count = 0
+
+    def _alloc(self, capacity: int):
+        for name in COLUMNS:
+            setattr(self, name, array('d', bytes(8 * capacity)))
+        self.quality = array('b', bytes(capacity))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, timestamp: float, rtt: float, jitter: float, loss: float, score: float,
+               quality: str, download_bps: float, upload_bps: float, dns_time: float):
+        """append one sample in O(1), overwriting the oldest once full"""
+        i = self.seq % self.capacity
+        self.timestamp[i] = timestamp
+        self.rtt[i] = rtt
+        self.jitter[i] = jitter
+        self.loss[i] = loss
+        self.score[i] = score
+        self.quality[i] = QUALITY_CODES.get(quality, 0)
+        self.download_bps[i] = download_bps
+        self.upload_bps[i] = upload_bps
+        self.dns_time[i] = dns_time
+        self.seq += 1
+        if self.count < self.capacity:
+            self.count += 1
+
+    def clear(self):
+        # seq keeps counting so client cursors stay valid across a clear
+        self.count = 0
+
+    def resize(self, capacity: int):
+        """change capacity, keeping the newest rows that still fit"""
+        capacity = max(1, int(capacity))
+        if capacity == self.capacity:
+            return
+        keep = min(self.count, capacity)
+        rows = [self._row(s) for s in range(self.seq - keep, self.seq)]
+        seq = self.seq
+        self.capacity = capacity
+        self._alloc(capacity)
+        self.seq = seq - keep
+        self.count = 0
+        for row in rows:
+            self._store(row)
+
+    def rows(self) -> List[tuple]:
+        """every live row oldest first, in the store's (..., quality_code) layout"""
+        return [self._row(seq) for seq in range(self.first_seq, self.seq)]
+
+    def _row(self, seq: int) -> tuple:
+        i = seq % self.capacity
+        return tuple(getattr(self, name)[i] for name in COLUMNS) + (self.quality[i],)
+
+    def _store(self, row: tuple):
+        i = self.seq % self.capacity
+        for name, value in zip(COLUMNS, row):
+            getattr(self, name)[i] = value
+        self.quality[i] = row[-1]
+        self.seq += 1
+        self.count = min(self.count + 1, self.capacity)
+
+    @property
+    def first_seq(self) -> int:
+        return self.seq - self.count
+
+    def point(self, seq: int) -> Dict:
+        """build the dict shape the frontend history view expects"""
+        return make_point(self._row(seq), seq)
+
+    def window(self, limit: Optional[int] = None) -> List[Dict]:
+        """the newest `limit` samples (all when None), oldest first"""
+        count = self.count if limit is None else max(0, min(int(limit), self.count))
+        return [self.point(seq) for seq in range(self.seq - count, self.seq)]
+
+    def since(self, cursor: int, limit: Optional[int] = None) -> Dict:
+        """
+        Samples newer than `cursor` (the last seq a client holds), oldest first.
+
+        `reset` is set when the cursor fell off the back of the ring or is ahead of it,
+        in which case the client should drop what it has and use `points` as a fresh start.
+        Otherwise clients drop anything they hold older than `first_seq` (trimmed or cleared).
+        """
+        cursor = int(cursor)
+        reset = cursor < self.first_seq - 1 or cursor >= self.seq
+        start = self.first_seq if reset else cursor + 1
+        if limit is not None and self.seq - start > limit:
+            # only the newest `limit` rows, anything older is a gap for the client
+            start = self.seq - max(0, int(limit))
+            reset = True
+        return {
+            'seq': self.seq - 1,
+            'first_seq': self.first_seq,
+            'reset': reset,
+            'points': [self.point(seq) for seq in range(start, self.seq)]
+        }
+
+    def _lower_bound(self, timestamp: float) -> int:
+        """first seq whose timestamp is >= `timestamp`"""
+        lo, hi = self.first_seq, self.seq
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamp[mid % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def downsample(self, start: float, end: float, max_points: int) -> List[Dict]:
+        """aggregate samples in [start, end] into at most `max_points` time buckets"""
+        first = self._lower_bound(start)
+        last = self._lower_bound(end + 1e-9)
+        return downsample_rows((self._row(seq) for seq in range(first, last)), start, end, max_points)
+
+    @property
+    def oldest_timestamp(self) -> Optional[float]:
+        return self.timestamp[self.first_seq % self.capacity] if self.count else None
+
+    def memory_bytes(self) -> int:
+        return sum(getattr(self, name).buffer_info()[1] * 8 for name in COLUMNS) + self.capacity
@@ -0,0 +1,274 @@
+import asyncio
+import errno
+import os
+import socket
+import struct
+import time
+from typing import Callable, Dict, List, Optional
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_ROUTE = 0x40
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK, RTM_DELLINK, RTM_GETLINK = 16, 17, 18
+RTM_NEWROUTE, RTM_DELROUTE, RTM_GETROUTE = 24, 25, 26
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+
+IFLA_IFNAME = 3
+IFLA_OPERSTATE = 16
+RTA_DST, RTA_OIF, RTA_GATEWAY, RTA_PRIORITY, RTA_TABLE = 1, 4, 5, 6, 15
+RT_TABLE_MAIN = 254
+IFF_UP = 0x1
+
+NLMSGHDR = struct.Struct('=IHHII')
+IFINFOMSG = struct.Struct('=BxHiII')
+RTMSG = struct.Struct('=BBBBBBBBI')
+RTATTR = struct.Struct('=HH')
+
+OPERSTATES = ['unknown', 'notpresent', 'down', 'lowerlayerdown', 'testing', 'dormant', 'up']
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def parse_attrs(data: bytes, offset: int) -> Dict[int, bytes]:
+    """rtattr TLVs from `offset` to the end of `data`"""
+    attrs = {}
+    while offset + RTATTR.size <= len(data):
+        length, kind = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        attrs[kind] = data[offset + RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def parse_messages(data: bytes) -> List[Dict]:
+    """
+    Decode a netlink buffer into link and route messages.
+
+    Links come back as {'type': 'link', 'deleted', 'index', 'name', 'up', 'operstate'},
+    IPv4 main-table routes as {'type': 'route', 'deleted', 'default', 'oif', 'gateway', 'priority'}.
+    Everything else is skipped, NLMSG_DONE shows up as {'type': 'done'}.
+    """
+    messages = []
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        length, kind, _flags, _seq, _pid = NLMSGHDR.unpack_from(data, offset)
+        if length < NLMSGHDR.size or offset + length > len(data):
+            # malformed or cut short, nothing after it can be framed
+            break
+        body = data[offset + NLMSGHDR.size:offset + length]
+        offset += _align(length)
+
+        if kind in (NLMSG_DONE, NLMSG_ERROR):
+            messages.append({'type': 'done'})
+        elif kind in (RTM_NEWLINK, RTM_DELLINK) and len(body) >= IFINFOMSG.size:
+            _family, _dev_type, index, flags, _change = IFINFOMSG.unpack_from(body, 0)
+            attrs = parse_attrs(body, IFINFOMSG.size)
+            oper = attrs.get(IFLA_OPERSTATE, b'\x00')[0]
+            messages.append({
+                'type': 'link',
+                'deleted': kind == RTM_DELLINK,
+                'index': index,
+                'name': attrs.get(IFLA_IFNAME, b'').rstrip(b'\x00').decode(errors='replace'),
+                'up': bool(flags & IFF_UP),
+                'operstate': OPERSTATES[oper] if oper < len(OPERSTATES) else 'unknown'
+            })
+        elif kind in (RTM_NEWROUTE, RTM_DELROUTE) and len(body) >= RTMSG.size:
+            family, dst_len, _src, _tos, table, _proto, _scope, _rtype, _flags = RTMSG.unpack_from(body, 0)
+            attrs = parse_attrs(body, RTMSG.size)
+            if RTA_TABLE in attrs:
+                table = struct.unpack('=I', attrs[RTA_TABLE][:4])[0]
+            if family != socket.AF_INET or table != RT_TABLE_MAIN:
+                continue
+            gateway = attrs.get(RTA_GATEWAY)
+            messages.append({
+                'type': 'route',
+                'deleted': kind == RTM_DELROUTE,
+                'default': dst_len == 0,
+                'oif': struct.unpack('=i', attrs[RTA_OIF][:4])[0] if RTA_OIF in attrs else 0,
+                'gateway': socket.inet_ntoa(gateway) if gateway and len(gateway) == 4 else None,
+                'priority': struct.unpack('=I', attrs[RTA_PRIORITY][:4])[0] if RTA_PRIORITY in attrs else 0
+            })
+    return messages
+
+
+def classify_interface(name: str, sysfs: str = '/sys/class/net') -> str:
+    """wifi / ethernet / tether / unknown from the interface name and sysfs"""
+    if not name:
+        return 'unknown'
+    if os.path.isdir(os.path.join(sysfs, name, 'wireless')) or name.startswith(('wlan', 'wl')):
+        return 'wifi'
+    if name.startswith(('usb', 'rndis', 'wwan', 'ww')):
+        return 'tether'
+    if name.startswith(('eth', 'en')):
+        return 'ethernet'
+    return 'unknown'
+
+
+class LinkWatcher:
+    """
+    Cached link and default-route state kept current by rtnetlink multicast.
+
+    One dump at start fills the cache, after that the kernel pushes
+    RTMGRP_LINK / RTMGRP_IPV4_ROUTE messages and lookups are O(1).
+    Every change after the initial dump that moves the default route or flips
+    a link is passed to `on_change` as {'timestamp', 'kind', 'interface', 'detail'}.
+    When the socket overruns (ENOBUFS) the kernel has dropped messages, so links
+    and routes are dumped again and whatever the dump doesn't return is pruned.
+    Other socket errors go to `on_error`.
+    """
+
+    def __init__(self, on_change: Optional[Callable[[Dict], None]] = None,
+                 on_error: Optional[Callable[[OSError], None]] = None):
+        self.on_change = on_change
+        self.on_error = on_error
+        self.links: Dict[int, Dict] = {}
+        # (oif, priority) -> gateway for every IPv4 default route in the main table
+        self.default_routes: Dict[tuple, Optional[str]] = {}
+        self.state = {'interface': None, 'connection_type': 'unknown', 'gateway': None, 'up': False}
+        self.sock: Optional[socket.socket] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.ready = False
+        self._dumps: List[int] = []
+        self._dumping = False
+        # link indexes and route keys a resync dump returned, None outside a resync
+        self._seen: Optional[Dict[str, set]] = None
+        self._resync_pending = False
+        self.resyncs = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """subscribe and request the initial dumps, raises OSError without netlink"""
+        self.loop = loop
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_ROUTE))
+        self.sock.setblocking(False)
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+        # dump links first so route oifs resolve to names
+        self._dumps = [RTM_GETLINK, RTM_GETROUTE]
+        self._request_dump()
+
+    def _request_dump(self):
+        self._dumping = True
+        kind = self._dumps.pop(0)
+        # rtgenmsg is just the family byte, padded
+        payload = struct.pack('=B3x', socket.AF_UNSPEC if kind == RTM_GETLINK else socket.AF_INET)
+        header = NLMSGHDR.pack(NLMSGHDR.size + len(payload), kind, NLM_F_REQUEST | NLM_F_DUMP, kind, 0)
+        self.sock.send(header + payload)
+
+    def stop(self):
+        if self.sock is None:
+            return
+        try:
+            self.loop.remove_reader(self.sock.fileno())
+        except Exception:
+            pass
+        self.sock.close()
+        self.sock = None
+
+    def resync(self):
+        """dump links and routes again, the cache stays readable until the dump replaces it"""
+        self.resyncs += 1
+        self._start_resync()
+
+    def _start_resync(self):
+        if self._dumping:
+            # one dump at a time per socket, the running one may be missing messages too
+            self._resync_pending = True
+            return
+        self._seen = {'links': set(), 'routes': set()}
+        self._dumps = [RTM_GETLINK, RTM_GETROUTE]
+        self._request_dump()
+
+    def _on_readable(self):
+        while self.sock is not None:
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    # the receive queue overflowed, the cache missed changes
+                    self.resync()
+                    continue
+                if self.on_error:
+                    self.on_error(e)
+                break
+            self.apply(parse_messages(data))
+
+    def apply(self, messages: List[Dict], now: Optional[float] = None):
+        """fold decoded messages into the cache and record what changed"""
+        now = now if now is not None else time.time()
+        was_ready = self.ready
+        for msg in messages:
+            if msg['type'] == 'done':
+                if self._dumps:
+                    self._request_dump()
+                else:
+                    self._dumping = False
+                    self._finish_dump(now)
+                    self.ready = True
+                continue
+            if msg['type'] == 'link':
+                previous = self.links.get(msg['index'])
+                if msg['deleted']:
+                    self.links.pop(msg['index'], None)
+                else:
+                    self.links[msg['index']] = msg
+                    if self._seen is not None:
+                        self._seen['links'].add(msg['index'])
+                if self.ready and (previous is None or msg['deleted'] or
+                                   previous['up'] != msg['up'] or previous['operstate'] != msg['operstate']):
+                    self._record(now, 'link', msg['name'],
+                                 'removed' if msg['deleted'] else msg['operstate'])
+            elif msg['type'] == 'route' and msg['default']:
+                key = (msg['oif'], msg['priority'])
+                if msg['deleted']:
+                    self.default_routes.pop(key, None)
+                else:
+                    self.default_routes[key] = msg['gateway']
+                    if self._seen is not None:
+                        self._seen['routes'].add(key)
+        self._refresh(now, was_ready)
+
+    def _finish_dump(self, now: float):
+        """prune what a resync dump didn't return, then start a resync that was asked for meanwhile"""
+        if self._seen is not None:
+            for index in [i for i in self.links if i not in self._seen['links']]:
+                link = self.links.pop(index)
+                self._record(now, 'link', link['name'], 'removed')
+            for key in [k for k in self.default_routes if k not in self._seen['routes']]:
+                del self.default_routes[key]
+            self._seen = None
+        if self._resync_pending:
+            self._resync_pending = False
+            self._start_resync()
+
+    def _refresh(self, now: float, was_ready: bool):
+        interface = gateway = None
+        if self.default_routes:
+            oif, priority = min(self.default_routes, key=lambda k: k[1])
+            gateway = self.default_routes[(oif, priority)]
+            interface = self.links.get(oif, {}).get('name')
+        link = next((l for l in self.links.values() if l['name'] == interface), None)
+        state = {
+            'interface': interface,
+            'connection_type': classify_interface(interface) if interface else 'unknown',
+            'gateway': gateway,
+            'up': bool(link and link['up'] and link['operstate'] in ('up', 'unknown'))
+        }
+        if state != self.state:
+            moved = (state['interface'], state['gateway']) != (self.state['interface'], self.state['gateway'])
+            # on_change reads the new state, e.g. to point the bandwidth sampler at the new interface
+            self.state = state
+            if was_ready and moved:
+                self._record(now, 'route', interface, f"default via {gateway or '-'}")
+
+    def _record(self, now: float, kind: str, interface: Optional[str], detail: str):
+        if self.on_change:
+            self.on_change({'timestamp': now, 'kind': kind, 'interface': interface, 'detail': detail})
@@ -0,0 +1,232 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import time
+from typing import Dict, Optional
+
+import psutil
+
+from streamstats import DDSketch
+
+
+class OpStats:
+    """count, errors and a latency sketch for one instrumented operation"""
+
+    __slots__ = ('count', 'errors', 'total_ms', 'max_ms', 'last_ms', 'sketch')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.sketch = DDSketch(max_bins=256)
+
+    def record(self, ms: float, error: bool = False):
+        self.count += 1
+        self.errors += error
+        self.total_ms += ms
+        self.last_ms = ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.sketch.add(ms)
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': self.total_ms / self.count if self.count else None,
+            'p50_ms': self.sketch.quantile(0.5),
+            'p95_ms': self.sketch.quantile(0.95),
+            'p99_ms': self.sketch.quantile(0.99),
+            'max_ms': self.max_ms,
+            'last_ms': self.last_ms
+        }
+
+
+class Metrics:
+    """
+    The plugin's own timings and counters.
+
+    `time(name)` works across awaits since it only reads the clock on the way
+    in and out, an exception leaving the block is recorded as an error of that
+    operation. Recording is a dict lookup and a sketch insert, cheap enough for
+    every probe.
+    """
+
+    def __init__(self):
+        self.ops: Dict[str, OpStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.time()
+
+    def observe(self, name: str, ms: float, error: bool = False):
+        stats = self.ops.get(name)
+        if stats is None:
+            stats = self.ops[name] = OpStats()
+        stats.record(ms, error)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def time(self, name: str) -> '_Timer':
+        return _Timer(self, name)
+
+    def reset(self):
+        self.ops.clear()
+        self.counters.clear()
+        self.started = time.time()
+
+    def snapshot(self) -> Dict:
+        return {
+            'since': self.started,
+            'operations': {name: stats.snapshot() for name, stats in sorted(self.ops.items())},
+            'counters': dict(sorted(self.counters.items()))
+        }
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, _exc, _tb):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000, exc_type is not None)
+        return False
+
+
+class LoopLagMonitor:
+    """
+    Event loop lag: how late a sleep of `interval` wakes up.
+
+    Anything blocking the loop (a sync call, a long parse) shows up here as lag
+    of every coroutine in the plugin, not just the one that caused it.
+    """
+
+    def __init__(self, interval: float = 1.0, stall_ms: float = 100.0):
+        self.interval = interval
+        self.stall_ms = stall_ms
+        self.lag = OpStats()
+        self.stalls = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected) * 1000
+            self.lag.record(lag)
+            if lag >= self.stall_ms:
+                self.stalls += 1
+
+    def snapshot(self) -> Dict:
+        return dict(self.lag.snapshot(), stalls=self.stalls, interval=self.interval,
+                    running=self.task is not None)
+
+
+class ResourceSampler:
+    """RSS, peak RSS, CPU share and handles of the plugin process"""
+
+    def __init__(self):
+        self.process = psutil.Process(os.getpid())
+        self.peak_rss = 0
+        self.last_cpu: Optional[float] = None
+        self.last_wall: Optional[float] = None
+
+    def sample(self) -> Dict:
+        with self.process.oneshot():
+            rss = self.process.memory_info().rss
+            times = self.process.cpu_times()
+            threads = self.process.num_threads()
+            try:
+                fds = self.process.num_fds()
+            except (AttributeError, psutil.Error):
+                fds = None
+        self.peak_rss = max(self.peak_rss, rss)
+        cpu = times.user + times.system
+        wall = time.monotonic()
+        # cpu share since the previous sample, the first call has nothing to compare with
+        cpu_percent = None
+        if self.last_cpu is not None and wall > self.last_wall:
+            cpu_percent = (cpu - self.last_cpu) / (wall - self.last_wall) * 100
+        self.last_cpu, self.last_wall = cpu, wall
+        return {
+            'rss_bytes': rss,
+            'peak_rss_bytes': self.peak_rss,
+            'cpu_seconds': cpu,
+            'cpu_percent': cpu_percent,
+            'threads': threads,
+            'open_fds': fds
+        }
+
+
+class ProfileCapture:
+    """
+    On-demand cProfile of the event loop thread.
+
+    A capture stops by itself after `limit` seconds so a forgotten toggle
+    doesn't keep the profiler's overhead on, and is dumped as a .prof file
+    next to a text summary of the top functions.
+    """
+
+    def __init__(self, directory: str, top: int = 25):
+        self.directory = directory
+        self.top = top
+        self.profiler: Optional[cProfile.Profile] = None
+        self.started: Optional[float] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.last: Optional[Dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self.profiler is not None
+
+    def start(self, limit: float = 60.0) -> Dict:
+        if not self.running:
+            self.profiler = cProfile.Profile()
+            self.started = time.time()
+            self.profiler.enable()
+            self.timer = asyncio.get_running_loop().call_later(limit, self.stop)
+        return self.status()
+
+    def stop(self) -> Optional[Dict]:
+        if not self.running:
+            return self.last
+        self.profiler.disable()
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        profiler, self.profiler = self.profiler, None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"profile-{int(self.started)}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+        self.last = {'path': path, 'started': self.started, 'duration': time.time() - self.started,
+                     'summary': out.getvalue()}
+        return self.last
+
+    def status(self) -> Dict:
+        return {
+            'running': self.running,
+            'started': self.started if self.running else None,
+            'last_capture': self.last['path'] if self.last else None
+        }
@@ -0,0 +1,198 @@
+import os
+from typing import Dict, List, Optional
+
+# fields we keep from each /proc/net/dev row, in file order positions
+RX_BYTES, RX_PACKETS, RX_ERRS, RX_DROP = 0, 1, 2, 3
+TX_BYTES, TX_PACKETS, TX_ERRS, TX_DROP = 8, 9, 10, 11
+FIELDS = (RX_BYTES, RX_PACKETS, RX_ERRS, RX_DROP, TX_BYTES, TX_PACKETS, TX_ERRS, TX_DROP)
+
+
+def parse_net_dev(data: bytes, into: Optional[Dict[str, List[int]]] = None) -> Dict[str, List[int]]:
+    """
+    Parse /proc/net/dev into {iface: [rx_bytes, rx_packets, rx_errs, rx_drop,
+    tx_bytes, tx_packets, tx_errs, tx_drop]}.
+
+    With `into` the lists already in it are overwritten in place, only a new
+    interface allocates one, and interfaces that went away are dropped.
+    """
+    counters = {} if into is None else into
+    seen = 0
+    # first two lines are the column headers
+    for line in data.split(b'\n')[2:]:
+        name, sep, rest = line.partition(b':')
+        if not sep:
+            continue
+        values = rest.split()
+        if len(values) < 16:
+            continue
+        name = name.strip().decode()
+        row = counters.get(name)
+        if row is None:
+            counters[name] = [int(values[i]) for i in FIELDS]
+        else:
+            for slot, i in enumerate(FIELDS):
+                row[slot] = int(values[i])
+        seen += 1
+    if seen != len(counters):
+        # an interface went away, rare enough to find it with a plain parse
+        present = parse_net_dev(data)
+        for name in [name for name in counters if name not in present]:
+            del counters[name]
+    return counters
+
+
+def parse_default_route(data: bytes) -> Optional[str]:
+    """interface of the lowest-metric IPv4 default route in /proc/net/route"""
+    best = None
+    best_metric = None
+    for line in data.split(b'\n')[1:]:
+        cols = line.split()
+        if len(cols) < 8 or cols[1] != b'00000000' or cols[7] != b'00000000':
+            continue
+        flags = int(cols[3], 16)
+        # RTF_UP
+        if not flags & 0x1:
+            continue
+        metric = int(cols[6])
+        if best_metric is None or metric < best_metric:
+            best, best_metric = cols[0].decode(), metric
+    return best
+
+
+def counter_delta(current: int, previous: int) -> int:
+    """difference of two monotonic counters, allowing for 32 bit wraparound and resets"""
+    delta = current - previous
+    if delta >= 0:
+        return delta
+    if (1 << 31) <= previous < (1 << 32):
+        # 32 bit counter wrapped
+        return delta + (1 << 32)
+    # 64 bit counters don't wrap in practice, a drop means the interface was reset
+    return current
+
+
+class _ProcFile:
+    """a procfs file kept open and re-read with pread into one reused buffer"""
+
+    def __init__(self, path: str, size: int = 16384):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+
+    def read(self) -> bytes:
+        n = os.preadv(self.fd, [self.buf], 0)
+        while n == len(self.buf):
+            # more interfaces than fit, grow once and retry
+            self.buf = bytearray(len(self.buf) * 2)
+            self.view = memoryview(self.buf)
+            n = os.preadv(self.fd, [self.buf], 0)
+        return self.view[:n].tobytes()
+
+    def close(self):
+        os.close(self.fd)
+
+
+class InterfaceSampler:
+    """
+    Per-interface byte counters and rates straight from procfs.
+
+    `sample` returns rates for the selected interface: `auto` follows the
+    default route, `all` sums every non-loopback interface, anything else is an
+    interface name. The default route is re-read every `route_refresh` seconds.
+    """
+
+    def __init__(self, dev_path: str = '/proc/net/dev', route_path: str = '/proc/net/route',
+                 interface: str = 'auto', route_refresh: float = 5.0):
+        self.dev = _ProcFile(dev_path)
+        self.route_path = route_path
+        self.route = None
+        self.interface = interface
+        self.route_refresh = route_refresh
+        self.default_interface: Optional[str] = None
+        self.last_route_check = 0.0
+        self.counters: Dict[str, List[int]] = {}
+        # the previous sample's lists, parsed into in place and swapped with `counters`
+        self._spare: Dict[str, List[int]] = {}
+        self.rates: Dict[str, Dict[str, float]] = {}
+        self.last_time: Optional[float] = None
+        # returned by sample() and updated in place every call
+        self.current = {'interface': None, 'download_bps': 0.0, 'upload_bps': 0.0}
+
+    def _refresh_route(self, now: float):
+        if now - self.last_route_check < self.route_refresh:
+            return
+        self.last_route_check = now
+        try:
+            if self.route is None:
+                self.route = _ProcFile(self.route_path)
+            self.default_interface = parse_default_route(self.route.read())
+        except OSError:
+            self.default_interface = None
+
+    def selected(self, counters: Optional[Dict[str, List[int]]] = None) -> List[str]:
+        counters = self.counters if counters is None else counters
+        if self.interface == 'all':
+            return [name for name in counters if name != 'lo']
+        if self.interface == 'auto':
+            if self.default_interface in counters:
+                return [self.default_interface]
+            # no default route, fall back to everything but loopback
+            return [name for name in counters if name != 'lo']
+        return [self.interface] if self.interface in counters else []
+
+    def sample(self, now: float) -> Dict:
+        """read counters once and update per-interface rates in place"""
+        self._refresh_route(now)
+        current = parse_net_dev(self.dev.read(), self._spare)
+        elapsed = now - self.last_time if self.last_time is not None else 0
+        for name, values in current.items():
+            previous = self.counters.get(name)
+            rate = self.rates.get(name)
+            if rate is None:
+                rate = self.rates[name] = {'download_bps': 0.0, 'upload_bps': 0.0}
+            if previous is not None and elapsed > 0:
+                rate['download_bps'] = counter_delta(values[0], previous[0]) * 8 / elapsed
+                rate['upload_bps'] = counter_delta(values[4], previous[4]) * 8 / elapsed
+        for name in list(self.rates):
+            if name not in current:
+                # interface went away
+                del self.rates[name]
+        self.counters, self._spare = current, self.counters
+        self.last_time = now
+
+        names = self.selected()
+        self.current['interface'] = names[0] if len(names) == 1 else ('all' if names else None)
+        self.current['download_bps'] = sum(self.rates[n]['download_bps'] for n in names)
+        self.current['upload_bps'] = sum(self.rates[n]['upload_bps'] for n in names)
+        return self.current
+
+    def totals(self, fresh: bool = False) -> Dict:
+        """
+        psutil.net_io_counters() style totals over the selected interfaces.
+
+        `fresh` reads procfs again without touching the counters and rates `sample`
+        keeps, so callers outside the sampling loop don't shorten its next interval.
+        """
+        counters = parse_net_dev(self.dev.read()) if fresh else self.counters
+        names = self.selected(counters)
+
+        def total(index: int) -> int:
+            return sum(counters[n][index] for n in names)
+
+        return {
+            'interface': names[0] if len(names) == 1 else ('all' if names else None),
+            'bytes_sent': total(4),
+            'bytes_recv': total(0),
+            'packets_sent': total(5),
+            'packets_recv': total(1),
+            'errin': total(2),
+            'errout': total(6),
+            'dropin': total(3),
+            'dropout': total(7)
+        }
+
+    def close(self):
+        self.dev.close()
+        if self.route is not None:
+            self.route.close()
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dnsprobe import split_server
+from rollups import Rollups
+from streamstats import LatencyEstimator
+
+# probe order along the path, a fault is blamed on the first tier that shows it
+TIERS = ('gateway', 'internet', 'dns', 'game')
+FAULTS = {'gateway': 'local', 'internet': 'isp', 'dns': 'isp', 'game': 'game_server'}
+
+
+class Target:
+    """one probed host with its own estimators and rollups"""
+
+    def __init__(self, name: str, tier: str, host: str, port: Optional[int] = None):
+        self.name = name
+        self.tier = tier
+        self.host = host
+        self.port = port
+        self.stats = LatencyEstimator()
+        self.rollups = Rollups()
+        self.last: Optional[Dict] = None
+        self.base: Optional[Dict] = None
+        self.base_at = 0.0
+
+    def baseline(self, window: float, now: float) -> Dict:
+        """rollup summary over `window`, rebuilt once a minute since it is merged from 1m buckets"""
+        if self.base is None or not 0 <= now - self.base_at < 60:
+            self.base = self.rollups.summary(now - window, now)
+            self.base_at = now
+        return self.base
+
+    def record(self, result: Dict, now: float):
+        rtts = result.get('rtts') or [None]
+        for rtt in rtts:
+            self.stats.update(rtt)
+        received = [rtt for rtt in rtts if rtt is not None]
+        self.rollups.add(now, sum(received) / len(received) if received else None,
+                         result.get('packet_loss', 100), 0.0, 0.0)
+        self.last = result
+
+
+class PathQualityEngine:
+    """
+    Probes the gateway, the quality anchor, DNS servers and game servers in one
+    round and localizes degradations along that path.
+
+    A target is degraded when its recent loss passes `loss_threshold` or its
+    recent median RTT rises well above its own longer baseline, both read from
+    the target's rollups. The fault is blamed on the first tier (gateway, then
+    ISP, then game servers) that is degraded: a lossy gateway explains
+    everything behind it, a healthy path with one slow game server points at
+    that server.
+    """
+
+    def __init__(self, ping: Callable[..., Awaitable[Dict]], recent: float = 60.0, baseline: float = 3600.0,
+                 loss_threshold: float = 0.1, rtt_factor: float = 1.5, rtt_floor: float = 10.0):
+        self.ping = ping
+        self.recent = recent
+        self.baseline = baseline
+        self.loss_threshold = loss_threshold
+        self.rtt_factor = rtt_factor
+        self.rtt_floor = rtt_floor
+        self.targets: Dict[str, Target] = {}
+        self.last_report: Optional[Dict] = None
+
+    def set_targets(self, gateway: Optional[str], anchor: Optional[str], dns_servers: List[str],
+                    game_servers: List[Dict]):
+        """replace the target list, keeping history for targets that stay"""
+        wanted = []
+        if gateway:
+            wanted.append(('gateway', 'gateway', gateway, None))
+        if anchor:
+            wanted.append(('internet', 'internet', anchor, None))
+        for server in dns_servers:
+            # same 'host:port' forms dnsprobe accepts, the port is used when probes fall back to TCP
+            host, port = split_server(server)
+            wanted.append((f'dns:{server}', 'dns', host, port))
+        for server in game_servers:
+            if server.get('host'):
+                name = server.get('name') or server['host']
+                wanted.append((f'game:{name}', 'game', server['host'], server.get('port')))
+
+        targets = {}
+        for name, tier, host, port in wanted:
+            existing = self.targets.get(name)
+            if existing and existing.host == host and existing.port == port:
+                targets[name] = existing
+            else:
+                targets[name] = Target(name, tier, host, port)
+        self.targets = targets
+
+    async def probe(self, count: int = 3, concurrency: int = 8, timeout: float = 5.0,
+                    now: Optional[float] = None, ping: Optional[Callable[..., Awaitable[Dict]]] = None) -> Dict[str, Dict]:
+        """probe every target concurrently on the shared schedule, results keyed by target name"""
+        ping = ping or self.ping
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        targets = list(self.targets.values())
+
+        async def probe(target: Target) -> Dict:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(ping(target.host, count, target.port), timeout)
+                except asyncio.TimeoutError:
+                    return {'host': target.host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100,
+                            'jitter': 0, 'samples': 0, 'rtts': [None] * count}
+
+        results = await asyncio.gather(*(probe(t) for t in targets))
+        now = now if now is not None else time.time()
+        for target, result in zip(targets, results):
+            # the target list may have been replaced while the round was out
+            if self.targets.get(target.name) is target:
+                target.record(result, now)
+        return {target.name: result for target, result in zip(targets, results)}
+
+    def assess(self, target: Target, now: float) -> Dict:
+        recent = target.rollups.summary(now - self.recent, now)
+        base = target.baseline(self.baseline, now)
+        loss = recent['loss_ratio']
+        rtt = recent['rtt_p50']
+        base_rtt = base['rtt_p50']
+        reasons = []
+        if loss is not None and loss > self.loss_threshold:
+            reasons.append('loss')
+        if rtt is not None and base_rtt is not None and rtt > base_rtt * self.rtt_factor + self.rtt_floor:
+            reasons.append('latency')
+        if loss is not None and loss >= 1:
+            reasons = ['unreachable']
+        return {
+            'name': target.name,
+            'tier': target.tier,
+            'host': target.host,
+            'degraded': bool(reasons),
+            'reasons': reasons,
+            'loss_ratio': loss,
+            'rtt_p50': rtt,
+            'baseline_rtt_p50': base_rtt,
+            'latency_ewma': target.stats.latency.mean if target.stats.latency.initialized else None,
+            'jitter': target.stats.jitter.jitter
+        }
+
+    def localize(self, now: Optional[float] = None) -> Dict:
+        """which hop a degradation starts at, from every target's rollups"""
+        now = now if now is not None else time.time()
+        assessed = [self.assess(t, now) for t in self.targets.values()]
+        by_tier = {tier: [a for a in assessed if a['tier'] == tier] for tier in TIERS}
+
+        fault, hop, culprits = None, None, []
+        for tier in TIERS:
+            rows = by_tier[tier]
+            bad = [a for a in rows if a['degraded']]
+            if not bad:
+                continue
+            if tier == 'game' and len(bad) == len(rows) and len(rows) > 1:
+                # every game server at once but a healthy ISP hop, the trouble is upstream of them
+                fault, hop, culprits = 'upstream', tier, [a['name'] for a in bad]
+            elif tier == 'dns' and len(bad) < len(rows):
+                # one resolver misbehaving is that resolver, not the ISP
+                fault, hop, culprits = 'dns_server', tier, [a['name'] for a in bad]
+            else:
+                fault, hop, culprits = FAULTS[tier], tier, [a['name'] for a in bad]
+            break
+
+        self.last_report = {
+            'timestamp': now,
+            'fault': fault,
+            'hop': hop,
+            'culprits': culprits,
+            'summary': _describe(fault, culprits),
+            'targets': assessed
+        }
+        return self.last_report
+
+
+def _describe(fault: Optional[str], culprits: List[str]) -> str:
+    names = ', '.join(c.split(':', 1)[-1] for c in culprits)
+    if fault is None:
+        return 'All hops healthy'
+    if fault == 'local':
+        return 'Degradation starts at the gateway (Wi-Fi or local network)'
+    if fault == 'isp':
+        return 'Gateway is fine, degradation starts past it (ISP)'
+    if fault == 'dns_server':
+        return f"Only DNS server {names} is degraded"
+    if fault == 'upstream':
+        return 'ISP hop is fine but every game server is degraded (upstream routing)'
+    return f"Path is fine, game server {names} is degraded"
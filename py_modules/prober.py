@@ -0,0 +1,236 @@
+import asyncio
+import socket
+import struct
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+
+
+def _checksum(data: bytes) -> int:
+    """internet checksum, the kernel recomputes it for datagram sockets anyway"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def build_echo_request(seq: int, ident: int = 0, v6: bool = False, payload: bytes = b'sentinel') -> bytes:
+    """Build an ICMP/ICMPv6 echo request packet"""
+    icmp_type = ICMP6_ECHO_REQUEST if v6 else ICMP_ECHO_REQUEST
+    header = struct.pack('!BBHHH', icmp_type, 0, 0, ident & 0xffff, seq & 0xffff)
+    csum = _checksum(header + payload)
+    return struct.pack('!BBHHH', icmp_type, 0, csum, ident & 0xffff, seq & 0xffff) + payload
+
+
+def parse_echo_reply(data: bytes, v6: bool = False) -> Optional[int]:
+    """return the sequence number of an echo reply, or None for anything else"""
+    if len(data) < 8:
+        return None
+    icmp_type, _code, _csum, _ident, seq = struct.unpack('!BBHHH', data[:8])
+    if icmp_type != (ICMP6_ECHO_REPLY if v6 else ICMP_ECHO_REPLY):
+        return None
+    return seq
+
+
+def summarize(host: str, rtts: List[Optional[float]], method: str) -> Dict:
+    """Turn per-sequence rtts (None = lost) into the ping_host result shape"""
+    count = len(rtts)
+    received = [rtt for rtt in rtts if rtt is not None]
+    if not received:
+        return {'host': host, 'success': False, 'avg_rtt': 999, 'packet_loss': 100,
+                'jitter': 0, 'samples': 0, 'method': method, 'rtts': rtts}
+
+    # jitter as mean of adjacent diffs, matching the ping_host fallback
+    jitter = 0
+    if len(received) > 1:
+        diffs = [abs(received[i] - received[i - 1]) for i in range(1, len(received))]
+        jitter = sum(diffs) / len(diffs)
+
+    return {
+        'host': host,
+        'success': True,
+        'avg_rtt': sum(received) / len(received),
+        'packet_loss': (count - len(received)) / count * 100 if count else 0,
+        'jitter': jitter,
+        'samples': len(received),
+        'method': method,
+        'rtts': rtts
+    }
+
+
+class _EchoSession:
+    """one datagram ICMP socket with its in-flight sequence numbers"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, family: int):
+        self.loop = loop
+        self.v6 = family == socket.AF_INET6
+        proto = socket.IPPROTO_ICMPV6 if self.v6 else socket.IPPROTO_ICMP
+        self.sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+        self.sock.setblocking(False)
+        self.sent: Dict[int, float] = {}
+        self.rtts: Dict[int, float] = {}
+        self.waiter: Optional[asyncio.Future] = None
+        self.expected = 0
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        now = time.perf_counter()
+        while True:
+            try:
+                data = self.sock.recv(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            seq = parse_echo_reply(data, self.v6)
+            # the kernel routes replies by socket id, so only seq needs matching
+            if seq is None or seq not in self.sent or seq in self.rtts:
+                continue
+            self.rtts[seq] = (now - self.sent[seq]) * 1000
+        if self.waiter and not self.waiter.done() and len(self.rtts) >= self.expected:
+            self.waiter.set_result(True)
+
+    def send(self, seq: int, sockaddr: Tuple):
+        packet = build_echo_request(seq, v6=self.v6)
+        self.sent[seq] = time.perf_counter()
+        self.sock.sendto(packet, sockaddr)
+
+    def close(self):
+        try:
+            self.loop.remove_reader(self.sock.fileno())
+        except Exception:
+            pass
+        self.sock.close()
+
+
+class AsyncProber:
+    """
+    Event-loop latency prober.
+
+    Sends echo requests over unprivileged datagram ICMP sockets and falls back to
+    timing TCP connects when `net.ipv4.ping_group_range` doesn't allow them.
+    """
+
+    def __init__(self, mode: str = 'auto', tcp_port: int = 443, timeout: float = 2.0, interval: float = 0.2):
+        self.mode = mode
+        self.tcp_port = tcp_port
+        self.timeout = timeout
+        self.interval = interval
+        # cached after the first attempt so we don't retry a denied socket every sample
+        self.icmp_available: Optional[bool] = None
+
+    async def _resolve(self, host: str) -> Tuple[int, Tuple]:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+        if not infos:
+            raise OSError(f"could not resolve {host}")
+        family, _type, _proto, _canon, sockaddr = infos[0]
+        return family, sockaddr
+
+    async def ping(self, host: str, count: int = 3, port: Optional[int] = None) -> Dict:
+        """ping a host without blocking the loop, same dict shape as NetworkMonitor.ping_host"""
+        try:
+            family, sockaddr = await self._resolve(host)
+        except Exception:
+            return summarize(host, [None] * count, 'none')
+
+        if self.mode in ('auto', 'icmp') and self.icmp_available is not False:
+            try:
+                return await self._ping_icmp(host, family, sockaddr, count)
+            except PermissionError:
+                self.icmp_available = False
+                if self.mode == 'icmp':
+                    return summarize(host, [None] * count, 'icmp')
+            except OSError:
+                if self.mode == 'icmp':
+                    return summarize(host, [None] * count, 'icmp')
+
+        return await self._ping_tcp(host, family, sockaddr, count, port or self.tcp_port)
+
+    async def _ping_icmp(self, host: str, family: int, sockaddr: Tuple, count: int) -> Dict:
+        loop = asyncio.get_running_loop()
+        session = _EchoSession(loop, family)
+        self.icmp_available = True
+        try:
+            session.expected = count
+            session.waiter = loop.create_future()
+            for seq in range(count):
+                if seq:
+                    await asyncio.sleep(self.interval)
+                try:
+                    session.send(seq, sockaddr)
+                except (BlockingIOError, InterruptedError):
+                    # full send buffer counts as a lost probe
+                    continue
+            try:
+                await asyncio.wait_for(asyncio.shield(session.waiter), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            return summarize(host, [session.rtts.get(seq) for seq in range(count)], 'icmp')
+        finally:
+            session.close()
+
+    async def _tcp_probe(self, family: int, sockaddr: Tuple, port: int) -> Optional[float]:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        addr = (sockaddr[0], port) + tuple(sockaddr[2:])
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, addr), self.timeout)
+        except ConnectionRefusedError:
+            # an RST still means the host answered
+            pass
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            sock.close()
+        return (time.perf_counter() - start) * 1000
+
+    async def _ping_tcp(self, host: str, family: int, sockaddr: Tuple, count: int, port: int) -> Dict:
+        rtts = []
+        for seq in range(count):
+            if seq:
+                await asyncio.sleep(self.interval)
+            rtts.append(await self._tcp_probe(family, sockaddr, port))
+        return summarize(host, rtts, 'tcp')
+
+    async def ping_many(self, servers: List[Dict], count: int = 3, concurrency: int = 8,
+                        timeout: float = 5.0, ping: Optional[Callable[..., Awaitable[Dict]]] = None) -> AsyncIterator[Dict]:
+        """
+        Probe every server at once under a concurrency cap and yield results as they finish.
+
+        Each server dict needs a `host` and may carry `name`, `region` and a TCP `port`.
+        A server that exceeds `timeout` is reported as unreachable instead of holding up the batch.
+        `ping(host, count, port)` replaces the direct probe, e.g. to go through a scheduler.
+        """
+        ping = ping or self.ping
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def probe(server: Dict) -> Dict:
+            host = server.get('host', '')
+            async with semaphore:
+                try:
+                    result = await asyncio.wait_for(ping(host, count, server.get('port')), timeout)
+                except asyncio.TimeoutError:
+                    result = summarize(host, [None] * count, 'timeout')
+            # coalesced probes of one host hand out the same dict
+            result = dict(result)
+            result['name'] = server.get('name', 'Unknown')
+            result['region'] = server.get('region', 'Unknown')
+            return result
+
+        tasks = [asyncio.ensure_future(probe(server)) for server in servers if server.get('host')]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # consumer stopped early or got cancelled, don't leak probes
+            for task in tasks:
+                task.cancel()
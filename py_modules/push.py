@@ -0,0 +1,96 @@
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class EventPublisher:
+    """
+    Coalescing, rate-limited wrapper around `decky.emit`.
+
+    Each event goes out at most once per its interval. `publish` keeps only the
+    newest payload and drops one equal to what was last sent, `append` batches
+    items and sends them as a list. Counts events and JSON payload bytes so the
+    bridge traffic can be compared with polling.
+    """
+
+    def __init__(self, emit: Callable[..., Awaitable], intervals: Optional[Dict[str, float]] = None,
+                 default_interval: float = 1.0):
+        self.emit = emit
+        self.intervals = dict(intervals or {})
+        self.default_interval = default_interval
+        self.enabled = True
+        self.pending: Dict[str, Any] = {}
+        self.last_sent: Dict[str, float] = {}
+        self.last_payload: Dict[str, Any] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.started = time.monotonic()
+        self.counters = {'published': 0, 'emitted': 0, 'coalesced': 0, 'unchanged': 0, 'errors': 0, 'bytes': 0}
+        self.per_event: Dict[str, Dict[str, int]] = {}
+
+    def publish(self, event: str, payload: Any):
+        """send `payload`, replacing anything for `event` that hasn't gone out yet"""
+        if not self.enabled:
+            return
+        self.counters['published'] += 1
+        if event in self.pending:
+            self.counters['coalesced'] += 1
+        elif event not in self.tasks and self.last_payload.get(event) == payload:
+            self.counters['unchanged'] += 1
+            return
+        self.pending[event] = payload
+        self._schedule(event)
+
+    def append(self, event: str, item: Any):
+        """queue `item`, everything queued for `event` is sent together as one list"""
+        if not self.enabled:
+            return
+        self.counters['published'] += 1
+        batch: List = self.pending.setdefault(event, [])
+        if batch:
+            self.counters['coalesced'] += 1
+        batch.append(item)
+        self._schedule(event)
+
+    def _schedule(self, event: str):
+        if event in self.tasks:
+            return
+        interval = self.intervals.get(event, self.default_interval)
+        delay = max(0.0, self.last_sent.get(event, -interval) + interval - time.monotonic())
+        self.tasks[event] = asyncio.ensure_future(self._send(event, delay))
+
+    async def _send(self, event: str, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        # anything published while emit is in flight schedules the next send
+        del self.tasks[event]
+        payload = self.pending.pop(event, None)
+        if payload is None:
+            return
+        try:
+            self.last_sent[event] = time.monotonic()
+            self.last_payload[event] = payload
+            size = len(json.dumps(payload, default=str))
+            self.counters['emitted'] += 1
+            self.counters['bytes'] += size
+            stats = self.per_event.setdefault(event, {'emitted': 0, 'bytes': 0})
+            stats['emitted'] += 1
+            stats['bytes'] += size
+            await self.emit(event, payload)
+        except Exception:
+            self.counters['errors'] += 1
+
+    def cancel(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+        self.tasks.clear()
+        self.pending.clear()
+
+    def stats(self) -> Dict:
+        minutes = max((time.monotonic() - self.started) / 60, 1 / 60)
+        return dict(
+            self.counters,
+            events_per_minute=self.counters['emitted'] / minutes,
+            bytes_per_minute=self.counters['bytes'] / minutes,
+            per_event={name: dict(stats) for name, stats in self.per_event.items()}
+        )
@@ -0,0 +1,153 @@
+import math
+from collections import deque
+from typing import Dict, List, Optional
+
+from streamstats import DDSketch
+
+# bucket width in seconds and how many closed buckets each resolution keeps
+RESOLUTIONS = {
+    '1s': (1, 300),
+    '1m': (60, 1440),
+    '1h': (3600, 720),
+}
+
+
+class RollupBucket:
+    """running aggregates for one time bucket"""
+
+    __slots__ = ('start', 'samples', 'rtt_count', 'rtt_min', 'rtt_max', 'rtt_sum', 'rtt_hist',
+                 'loss_count', 'loss_sum', 'down_sum', 'down_peak', 'up_sum', 'up_peak')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.samples = 0
+        self.rtt_count = 0
+        self.rtt_min = math.inf
+        self.rtt_max = -math.inf
+        self.rtt_sum = 0.0
+        self.rtt_hist = DDSketch()
+        self.loss_count = 0
+        self.loss_sum = 0.0
+        self.down_sum = 0.0
+        self.down_peak = 0.0
+        self.up_sum = 0.0
+        self.up_peak = 0.0
+
+    def add(self, rtt: Optional[float], loss: Optional[float], download_bps: float, upload_bps: float):
+        self.samples += 1
+        if rtt is not None:
+            self.rtt_count += 1
+            self.rtt_sum += rtt
+            if rtt < self.rtt_min:
+                self.rtt_min = rtt
+            if rtt > self.rtt_max:
+                self.rtt_max = rtt
+            self.rtt_hist.add(rtt)
+        if loss is not None:
+            self.loss_count += 1
+            self.loss_sum += loss
+        self.down_sum += download_bps
+        self.up_sum += upload_bps
+        if download_bps > self.down_peak:
+            self.down_peak = download_bps
+        if upload_bps > self.up_peak:
+            self.up_peak = upload_bps
+
+    def merge(self, other: 'RollupBucket'):
+        self.samples += other.samples
+        self.rtt_count += other.rtt_count
+        self.rtt_sum += other.rtt_sum
+        self.rtt_min = min(self.rtt_min, other.rtt_min)
+        self.rtt_max = max(self.rtt_max, other.rtt_max)
+        self.rtt_hist.merge(other.rtt_hist)
+        self.loss_count += other.loss_count
+        self.loss_sum += other.loss_sum
+        self.down_sum += other.down_sum
+        self.up_sum += other.up_sum
+        self.down_peak = max(self.down_peak, other.down_peak)
+        self.up_peak = max(self.up_peak, other.up_peak)
+
+    def to_dict(self) -> Dict:
+        has_rtt = self.rtt_count > 0
+        return {
+            'start': self.start,
+            'samples': self.samples,
+            'count': self.rtt_count,
+            'rtt_min': self.rtt_min if has_rtt else None,
+            'rtt_max': self.rtt_max if has_rtt else None,
+            'rtt_mean': self.rtt_sum / self.rtt_count if has_rtt else None,
+            'rtt_p50': self.rtt_hist.quantile(0.5),
+            'rtt_p95': self.rtt_hist.quantile(0.95),
+            'rtt_p99': self.rtt_hist.quantile(0.99),
+            'loss_ratio': self.loss_sum / self.loss_count / 100 if self.loss_count else None,
+            'download_bps_avg': self.down_sum / self.samples if self.samples else 0,
+            'download_bps_peak': self.down_peak,
+            'upload_bps_avg': self.up_sum / self.samples if self.samples else 0,
+            'upload_bps_peak': self.up_peak
+        }
+
+
+class _Series:
+    """closed buckets plus the open one for a single resolution"""
+
+    def __init__(self, width: int, keep: int):
+        self.width = width
+        self.closed = deque(maxlen=keep)
+        self.current: Optional[RollupBucket] = None
+
+    def add(self, timestamp: float, rtt, loss, download_bps, upload_bps):
+        start = timestamp - timestamp % self.width
+        if self.current is None:
+            self.current = RollupBucket(start)
+        elif start > self.current.start:
+            self.closed.append(self.current)
+            self.current = RollupBucket(start)
+        # a clock that went backwards keeps aggregating into the open bucket
+        self.current.add(rtt, loss, download_bps, upload_bps)
+
+    def buckets(self, since: float) -> List[RollupBucket]:
+        # closed buckets are in time order, walk back from the newest and stop at the first too old
+        out = []
+        for bucket in reversed(self.closed):
+            if bucket.start + self.width <= since:
+                break
+            out.append(bucket)
+        out.reverse()
+        if self.current is not None and self.current.start + self.width > since:
+            out.append(self.current)
+        return out
+
+
+class Rollups:
+    """
+    Rolling 1s/1m/1h aggregates updated in O(1) per sample.
+
+    Pass `rtt`/`loss` only when a fresh probe result came in, bandwidth is
+    counted on every sample.
+    """
+
+    def __init__(self):
+        self.series = {name: _Series(width, keep) for name, (width, keep) in RESOLUTIONS.items()}
+
+    def add(self, timestamp: float, rtt: Optional[float], loss: Optional[float],
+            download_bps: float, upload_bps: float):
+        for series in self.series.values():
+            series.add(timestamp, rtt, loss, download_bps, upload_bps)
+
+    def clear(self):
+        for name, (width, keep) in RESOLUTIONS.items():
+            self.series[name] = _Series(width, keep)
+
+    def buckets(self, resolution: str, since: float) -> List[Dict]:
+        return [b.to_dict() for b in self.series[resolution].buckets(since)]
+
+    def summary(self, since: float, now: float) -> Dict:
+        """merge buckets of the finest resolution whose retention still covers [since, now]"""
+        window = now - since
+        resolution = '1s' if window <= 300 else '1m' if window <= 86400 else '1h'
+        merged = RollupBucket(since)
+        for bucket in self.series[resolution].buckets(since):
+            merged.merge(bucket)
+        summary = merged.to_dict()
+        summary['resolution'] = resolution
+        return summary
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class ProbeScheduler:
+    """
+    Runs blocking probes off the event loop.
+
+    Commands go through asyncio subprocesses and are killed on timeout or
+    cancellation, plain blocking calls go to a small bounded thread pool.
+    Jobs submitted with the same key while one is still running share its
+    result instead of starting a second copy. Every caller names a `group`
+    so a whole group (e.g. everything the monitoring loop started) can be
+    cancelled at once, a shared job only stops once no other group waits on it.
+    """
+
+    def __init__(self, max_workers: int = 4, metrics=None):
+        # optional metrics.Metrics, times every spawned command under exec.<program>
+        self.metrics = metrics
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='probe')
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.groups: Dict[str, set] = {}
+        # every group waiting on each running job
+        self.owners: Dict[asyncio.Task, set] = {}
+        self.counters = {'submitted': 0, 'coalesced': 0, 'timeouts': 0, 'cancelled': 0}
+
+    async def submit(self, key: Optional[Hashable], factory: Callable[[], Awaitable], timeout: float,
+                     group: str = 'default') -> Any:
+        """
+        Await `factory()` with a timeout, joining an identical in-flight job if `key` matches one.
+
+        A caller that gets cancelled only stops waiting, the shared job keeps
+        running for everyone else until it finishes, times out or every group
+        waiting on it is cancelled.
+        """
+        task = self.inflight.get(key) if key is not None else None
+        if task is None:
+            self.counters['submitted'] += 1
+            task = asyncio.ensure_future(self._guard(factory, timeout))
+            self.owners[task] = set()
+            task.add_done_callback(self._forget)
+            if key is not None:
+                self.inflight[key] = task
+                task.add_done_callback(lambda _t: self.inflight.pop(key, None))
+        else:
+            self.counters['coalesced'] += 1
+        self.owners[task].add(group)
+        self.groups.setdefault(group, set()).add(task)
+        return await asyncio.shield(task)
+
+    def _forget(self, task: asyncio.Task):
+        for group in self.owners.pop(task, ()):
+            self.groups.get(group, set()).discard(task)
+
+    async def _guard(self, factory: Callable[[], Awaitable], timeout: float) -> Any:
+        try:
+            return await asyncio.wait_for(factory(), timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise
+
+    async def run_blocking(self, key: Optional[Hashable], func: Callable, *args, timeout: float = 5.0,
+                           group: str = 'default') -> Any:
+        """
+        Run a blocking function in the pool.
+
+        Threads can't be interrupted, on timeout the caller is released but the
+        worker finishes in the background, the pool size bounds how many can pile up.
+        """
+        loop = asyncio.get_running_loop()
+        return await self.submit(
+            key, lambda: loop.run_in_executor(self.executor, functools.partial(func, *args)), timeout, group)
+
+    async def run_command(self, argv: List[str], timeout: float = 10.0, group: str = 'default') -> Tuple[int, str, str]:
+        """(returncode, stdout, stderr) of a command, identical argv lists share one process"""
+        return await self.submit(('exec',) + tuple(argv), lambda: self._exec(argv), timeout, group)
+
+    async def _exec(self, argv: List[str]) -> Tuple[int, str, str]:
+        start = time.perf_counter()
+        failed = True
+        try:
+            if self.metrics:
+                self.metrics.count('subprocess.spawned')
+            proc = await asyncio.create_subprocess_exec(
+                *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            try:
+                stdout, stderr = await proc.communicate()
+            except asyncio.CancelledError:
+                # timeouts arrive here too, don't leave the child running
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+            failed = proc.returncode != 0
+            return proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+        finally:
+            if self.metrics:
+                self.metrics.observe(f"exec.{os.path.basename(argv[0])}", (time.perf_counter() - start) * 1000, failed)
+
+    def cancel(self, group: str) -> int:
+        """
+        Cancel the running jobs of `group`, returns how many were cancelled.
+
+        A job another group joined keeps running for that group's waiters,
+        cancelling it would raise CancelledError into callers that never asked for it.
+        """
+        cancelled = 0
+        for task in list(self.groups.pop(group, ())):
+            owners = self.owners.get(task, set())
+            owners.discard(group)
+            if not owners:
+                task.cancel()
+                cancelled += 1
+        self.counters['cancelled'] += cancelled
+        return cancelled
+
+    def stats(self) -> Dict:
+        return dict(self.counters, running=len(self.owners), workers=self.max_workers)
+
+    def shutdown(self):
+        for group in list(self.groups):
+            self.cancel(group)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,329 @@
+import csv
+import json
+import os
+import struct
+import time
+import zlib
+from array import array
+from datetime import datetime
+from itertools import accumulate, islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from history import QUALITY_CODES, QUALITY_LABELS, downsample_rows
+from streamstats import DDSketch
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # the Deck's plugin python has no pyarrow, the built-in columnar format is always there
+    pa = pq = None
+
+# row layout shared with the store and HistoryRing.rows, quality is the code
+FIELDS = ('timestamp', 'rtt', 'jitter', 'loss', 'score', 'download_bps', 'upload_bps', 'dns_time', 'quality')
+EXTENSIONS = {'columnar': '.nss', 'parquet': '.parquet', 'csv': '.csv'}
+
+MAGIC = b'NSSC'
+VERSION = 1
+# magic, version, metadata json length
+FILE_HEADER = struct.Struct('<4sHI')
+# magic, rows, compressed payload length, first ts, last ts
+CHUNK_HEADER = struct.Struct('<4sIIdd')
+CHUNK_MAGIC = b'CHNK'
+# magic, rows, first ts, last ts, only present when the export finished
+TRAILER = struct.Struct('<4sQdd')
+TRAILER_MAGIC = b'NSSE'
+# the store keeps these as float32, so narrowing them loses nothing
+FLOAT_FIELDS = FIELDS[1:8]
+
+CSV_HEADER = ['timestamp', 'time', 'rtt_ms', 'jitter_ms', 'loss_pct', 'score', 'quality',
+              'download_bps', 'upload_bps', 'dns_ms']
+
+
+def formats() -> List[str]:
+    """export formats usable with the installed packages"""
+    return ['columnar', 'csv'] + (['parquet'] if pq is not None else [])
+
+
+def resolve_format(fmt: str) -> str:
+    if fmt == 'auto':
+        return 'parquet' if pq is not None else 'columnar'
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    if fmt == 'parquet' and pq is None:
+        raise ValueError("parquet export needs pyarrow")
+    return fmt
+
+
+def _shuffle(raw: bytes, width: int) -> bytes:
+    """group byte i of every value together, sign/exponent bytes of similar values then compress well"""
+    return b''.join(raw[i::width] for i in range(width))
+
+
+def _unshuffle(raw: bytes, width: int) -> bytes:
+    n = len(raw) // width
+    out = bytearray(len(raw))
+    for i in range(width):
+        out[i::width] = raw[i * n:(i + 1) * n]
+    return bytes(out)
+
+
+def encode_chunk(rows: List[tuple], level: int = 6) -> bytes:
+    """
+    One chunk of rows as a compressed columnar payload.
+
+    Timestamps become microsecond deltas (a steady sample rate encodes to the
+    same few bytes over and over), float columns are float32 and byte shuffled,
+    quality codes are single bytes. The concatenated columns are zlib compressed
+    together.
+    """
+    micros = [round(row[0] * 1e6) for row in rows]
+    deltas = array('q', [micros[0]] + [b - a for a, b in zip(micros, micros[1:])])
+    parts = [_shuffle(deltas.tobytes(), 8)]
+    for column in range(1, 8):
+        parts.append(_shuffle(array('f', [row[column] for row in rows]).tobytes(), 4))
+    parts.append(array('B', [row[8] for row in rows]).tobytes())
+    return zlib.compress(b''.join(parts), level)
+
+
+def decode_chunk(payload: bytes, count: int) -> List[tuple]:
+    raw = zlib.decompress(payload)
+    deltas = array('q')
+    deltas.frombytes(_unshuffle(raw[:count * 8], 8))
+    columns = [[micros / 1e6 for micros in accumulate(deltas)]]
+    offset = count * 8
+    for _column in range(1, 8):
+        values = array('f')
+        values.frombytes(_unshuffle(raw[offset:offset + count * 4], 4))
+        columns.append(values)
+        offset += count * 4
+    columns.append(array('B', raw[offset:offset + count]))
+    return list(zip(*columns))
+
+
+class SessionWriter:
+    """
+    Streams rows into an export file a chunk at a time.
+
+    Only the rows of the chunk being encoded are held in memory, so a session of
+    any length exports in constant memory. The file is written under a temporary
+    name and moved into place by `close`, a failed export never leaves a partial
+    file behind.
+    """
+
+    def __init__(self, path: str, fmt: str = 'columnar', meta: Optional[Dict] = None, chunk_rows: int = 4096):
+        self.path = path
+        self.fmt = resolve_format(fmt)
+        self.meta = dict(meta or {}, fields=list(FIELDS), format=self.fmt, version=VERSION)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.rows = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.tmp = f"{path}.tmp"
+        self.file = open(self.tmp, 'w' if self.fmt == 'csv' else 'wb', newline='' if self.fmt == 'csv' else None)
+        self.parquet = None
+        if self.fmt == 'columnar':
+            header = json.dumps(self.meta).encode()
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(header)) + header)
+        elif self.fmt == 'csv':
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(CSV_HEADER)
+
+    def write(self, rows: Iterable[tuple]):
+        """append rows in time order, buffered and encoded `chunk_rows` at a time"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_rows))
+            if not chunk:
+                return
+            self._write_chunk(chunk)
+
+    def _write_chunk(self, chunk: List[tuple]):
+        if self.first is None:
+            self.first = chunk[0][0]
+        self.last = chunk[-1][0]
+        self.rows += len(chunk)
+        if self.fmt == 'columnar':
+            payload = encode_chunk(chunk)
+            self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(chunk), len(payload), chunk[0][0], chunk[-1][0]))
+            self.file.write(payload)
+        elif self.fmt == 'parquet':
+            self._write_parquet(chunk)
+        else:
+            for row in chunk:
+                self.csv.writerow(_csv_row(row))
+
+    def _write_parquet(self, chunk: List[tuple]):
+        columns = list(zip(*chunk))
+        table = pa.table({
+            'timestamp': pa.array(columns[0], pa.float64()),
+            **{name: pa.array(columns[i], pa.float32()) for i, name in enumerate(FIELDS[1:8], 1)},
+            'quality': pa.array([QUALITY_LABELS[q] if 0 <= q < len(QUALITY_LABELS) else 'unknown'
+                                 for q in columns[8]], pa.string())
+        })
+        if self.parquet is None:
+            schema = table.schema.with_metadata({'network_sentinel': json.dumps(self.meta)})
+            self.parquet = pq.ParquetWriter(self.file, schema, compression='zstd')
+        self.parquet.write_table(table.replace_schema_metadata(self.parquet.schema.metadata))
+
+    def close(self) -> Dict:
+        if self.fmt == 'columnar':
+            self.file.write(TRAILER.pack(TRAILER_MAGIC, self.rows, self.first or 0.0, self.last or 0.0))
+        elif self.fmt == 'parquet' and self.parquet is not None:
+            self.parquet.close()
+        self.file.close()
+        os.replace(self.tmp, self.path)
+        return {'path': self.path, 'format': self.fmt, 'rows': self.rows, 'first': self.first,
+                'last': self.last, 'bytes': os.path.getsize(self.path)}
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp)
+        except OSError:
+            pass
+
+
+def _csv_row(row: tuple) -> list:
+    timestamp, rtt, jitter, loss, score, download_bps, upload_bps, dns_time, quality = row
+    # rounded for people reading it in a spreadsheet, the columnar formats are exact
+    return [f"{timestamp:.3f}", datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='seconds'),
+            f"{rtt:.3f}", f"{jitter:.3f}", f"{loss:.2f}", f"{score:g}",
+            QUALITY_LABELS[quality] if 0 <= quality < len(QUALITY_LABELS) else 'unknown',
+            f"{download_bps:.0f}", f"{upload_bps:.0f}", f"{dns_time:.3f}"]
+
+
+def export_rows(rows: Iterable[tuple], path: str, fmt: str = 'auto', meta: Optional[Dict] = None,
+                chunk_rows: int = 4096) -> Dict:
+    """write `rows` to `path`, blocking, returns path, format, rows, first/last timestamp, bytes and seconds"""
+    start = time.perf_counter()
+    writer = SessionWriter(path, fmt, meta, chunk_rows)
+    try:
+        writer.write(rows)
+    except BaseException:
+        writer.abort()
+        raise
+    result = writer.close()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def detect_format(path: str) -> str:
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == MAGIC:
+        return 'columnar'
+    if magic == b'PAR1':
+        return 'parquet'
+    return 'csv'
+
+
+def read_meta(path: str) -> Dict:
+    """metadata stored with an export, empty for CSV"""
+    fmt = detect_format(path)
+    if fmt == 'columnar':
+        with open(path, 'rb') as f:
+            _magic, _version, length = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            return json.loads(f.read(length))
+    if fmt == 'parquet' and pq is not None:
+        metadata = pq.read_schema(path).metadata or {}
+        return json.loads(metadata.get(b'network_sentinel', b'{}'))
+    return {'format': fmt}
+
+
+def read_chunks(path: str, chunk_rows: int = 4096) -> Iterator[List[tuple]]:
+    """
+    Rows of an export in time order, a chunk at a time.
+
+    The format is detected from the file. A columnar export cut short (the Deck
+    slept mid-export) yields every chunk that made it to disk.
+    """
+    fmt = detect_format(path)
+    if fmt == 'columnar':
+        with open(path, 'rb') as f:
+            _magic, version, length = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if version != VERSION:
+                raise ValueError(f"unsupported export version {version}")
+            f.seek(length, os.SEEK_CUR)
+            while True:
+                header = f.read(CHUNK_HEADER.size)
+                if len(header) < CHUNK_HEADER.size or header[:4] != CHUNK_MAGIC:
+                    return
+                _magic, count, size, _first, _last = CHUNK_HEADER.unpack(header)
+                payload = f.read(size)
+                if len(payload) < size:
+                    return
+                yield decode_chunk(payload, count)
+    elif fmt == 'parquet':
+        if pq is None:
+            raise ValueError("reading parquet needs pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            columns = [batch.column(name).to_pylist() for name in FIELDS]
+            columns[8] = [QUALITY_CODES.get(label, 0) for label in columns[8]]
+            yield list(zip(*columns))
+    else:
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            while True:
+                chunk = [(float(r['timestamp']), float(r['rtt_ms']), float(r['jitter_ms']), float(r['loss_pct']),
+                          float(r['score']), float(r['download_bps']), float(r['upload_bps']), float(r['dns_ms']),
+                          QUALITY_CODES.get(r['quality'], 0)) for r in islice(reader, chunk_rows)]
+                if not chunk:
+                    return
+                yield chunk
+
+
+def read_rows(path: str) -> Iterator[tuple]:
+    for chunk in read_chunks(path):
+        yield from chunk
+
+
+def analyze(path: str, max_points: int = 120) -> Dict:
+    """
+    Summary of an exported session for offline comparison: latency quantiles,
+    loss, quality shares and a downsampled chart.
+
+    Two streaming passes, the first finds the time range the chart buckets need,
+    so memory doesn't grow with the session.
+    """
+    rows = 0
+    first = last = None
+    rtt = DDSketch()
+    rtt_min, rtt_max, rtt_sum = float('inf'), 0.0, 0.0
+    loss_sum = 0.0
+    lossy = 0
+    quality = {label: 0 for label in QUALITY_LABELS}
+    for chunk in read_chunks(path):
+        if first is None:
+            first = chunk[0][0]
+        last = chunk[-1][0]
+        for row in chunk:
+            rows += 1
+            quality[QUALITY_LABELS[row[8]] if 0 <= row[8] < len(QUALITY_LABELS) else 'unknown'] += 1
+            loss_sum += row[3]
+            lossy += row[3] > 0
+            # a disconnected sample carries the 999 placeholder, not a latency
+            if row[8] != QUALITY_CODES['disconnected'] and 0 < row[1] < 999:
+                rtt.add(row[1])
+                rtt_min = min(rtt_min, row[1])
+                rtt_max = max(rtt_max, row[1])
+                rtt_sum += row[1]
+    measured = rtt.count
+    return {
+        'path': path,
+        'meta': read_meta(path),
+        'rows': rows,
+        'first': first,
+        'last': last,
+        'duration': (last - first) if rows else 0,
+        'rtt_min': rtt_min if measured else None,
+        'rtt_avg': rtt_sum / measured if measured else None,
+        'rtt_p50': rtt.quantile(0.5),
+        'rtt_p95': rtt.quantile(0.95),
+        'rtt_p99': rtt.quantile(0.99),
+        'rtt_max': rtt_max if measured else None,
+        'loss_avg': loss_sum / rows if rows else None,
+        'lossy_share': lossy / rows if rows else None,
+        'quality_share': {label: n / rows for label, n in quality.items() if n} if rows else {},
+        'points': downsample_rows(read_rows(path), first, last, max_points) if rows and last > first else []
+    }
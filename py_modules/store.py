@@ -0,0 +1,283 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterator, List, Optional
+
+from history import QUALITY_CODES, downsample_rows
+
+MAGIC = b'NSTS'
+VERSION = 1
+# magic, version, record size, record count, first ts, last ts, session start
+HEADER = struct.Struct('<4sHHIddd')
+HEADER_SIZE = 64
+# timestamp, rtt, jitter, loss, score, download bps, upload bps, dns time, quality code
+RECORD = struct.Struct('<d7fB3x')
+
+
+class Segment:
+    """
+    One fixed-width record file.
+
+    The active segment is preallocated (sparse) and memory-mapped so appends are plain
+    memory writes. Sealed segments are truncated to their used size and only mapped
+    read-only while being scanned.
+    """
+
+    def __init__(self, path: str, capacity: int, count: int = 0, first_ts: float = 0.0,
+                 last_ts: float = 0.0, session_start: float = 0.0):
+        self.path = path
+        self.capacity = capacity
+        self.count = count
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.session_start = session_start
+        self.mm: Optional[mmap.mmap] = None
+
+    @classmethod
+    def create(cls, path: str, capacity: int, session_start: float) -> 'Segment':
+        segment = cls(path, capacity, session_start=session_start)
+        with open(path, 'wb+') as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD.size)
+            segment.mm = mmap.mmap(f.fileno(), 0)
+        segment._write_header()
+        return segment
+
+    @classmethod
+    def load(cls, path: str) -> Optional['Segment']:
+        """read just the header of an existing segment, None if it isn't one of ours"""
+        try:
+            size = os.path.getsize(path)
+            with open(path, 'rb') as f:
+                raw = f.read(HEADER.size)
+            magic, version, record_size, count, first_ts, last_ts, session_start = HEADER.unpack(raw)
+        except (OSError, struct.error):
+            return None
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            return None
+        # a crash can leave the header ahead of what actually reached the file
+        count = min(count, max(0, (size - HEADER_SIZE) // RECORD.size))
+        return cls(path, count, count, first_ts, last_ts, session_start)
+
+    def _write_header(self):
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, RECORD.size, self.count,
+                         self.first_ts, self.last_ts, self.session_start)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def size(self) -> int:
+        return HEADER_SIZE + self.count * RECORD.size
+
+    def append(self, record: bytes, timestamp: float):
+        self.mm[HEADER_SIZE + self.count * RECORD.size:HEADER_SIZE + (self.count + 1) * RECORD.size] = record
+        if not self.count:
+            self.first_ts = timestamp
+        self.last_ts = timestamp
+        self.count += 1
+        self._write_header()
+
+    def close(self):
+        """drop the mapping and trim the sparse tail"""
+        if self.mm is None:
+            return
+        self.mm.close()
+        self.mm = None
+        with open(self.path, 'rb+') as f:
+            f.truncate(self.size)
+        self.capacity = self.count
+
+
+def _lower_bound(buf, count: int, timestamp: float) -> int:
+    """first record index in `buf` whose timestamp is >= `timestamp`"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if struct.unpack_from('<d', buf, HEADER_SIZE + mid * RECORD.size)[0] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class SegmentStore:
+    """
+    Append-only on-disk history made of memory-mapped segments.
+
+    Appends only touch the page cache. `flush` does the msync, seals rotated segments
+    and applies retention, and is meant to run off the event loop every few seconds.
+    Segment headers carry the first/last timestamp so a range scan only opens
+    segments that overlap and bisects into them.
+    """
+
+    def __init__(self, root: str, segment_bytes: int = 4 * 1024 * 1024,
+                 max_bytes: int = 256 * 1024 * 1024, retention_days: float = 30):
+        self.root = root
+        self.segment_records = max(1, (segment_bytes - HEADER_SIZE) // RECORD.size)
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.lock = threading.Lock()
+        self.segments: List[Segment] = []
+        self.active: Optional[Segment] = None
+        # rotated segments waiting for their final msync
+        self.pending: List[Segment] = []
+        self.new_session = True
+
+    def load(self):
+        """index existing segments from their headers"""
+        os.makedirs(self.root, exist_ok=True)
+        segments = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith('.seg'):
+                continue
+            segment = Segment.load(os.path.join(self.root, name))
+            if segment and segment.count:
+                segments.append(segment)
+        with self.lock:
+            self.segments = sorted(segments, key=lambda s: s.first_ts)
+
+    def open_session(self):
+        """start the next append in a fresh segment"""
+        with self.lock:
+            self._rotate()
+            self.new_session = True
+
+    def _rotate(self):
+        if self.active is not None:
+            self.pending.append(self.active)
+            self.active = None
+
+    def _new_segment(self, timestamp: float) -> Segment:
+        stamp = int(timestamp * 1000)
+        path = os.path.join(self.root, f"seg-{stamp:013d}.seg")
+        while os.path.exists(path):
+            stamp += 1
+            path = os.path.join(self.root, f"seg-{stamp:013d}.seg")
+        session_start = timestamp if self.new_session or not self.segments else self.segments[-1].session_start
+        self.new_session = False
+        return Segment.create(path, self.segment_records, session_start)
+
+    def append(self, timestamp: float, rtt: float, jitter: float, loss: float, score: float,
+               quality: str, download_bps: float, upload_bps: float, dns_time: float):
+        """write one record, same arguments as HistoryRing.append"""
+        record = RECORD.pack(timestamp, rtt, jitter, loss, score, download_bps, upload_bps,
+                             dns_time, QUALITY_CODES.get(quality, 0))
+        with self.lock:
+            if self.active is not None and self.active.full:
+                self._rotate()
+            if self.active is None:
+                self.active = self._new_segment(timestamp)
+                self.segments.append(self.active)
+            self.active.append(record, timestamp)
+
+    def flush(self):
+        """msync dirty pages, seal rotated segments and enforce retention, blocking"""
+        with self.lock:
+            active = self.active
+            pending, self.pending = self.pending, []
+        for segment in pending:
+            segment.mm.flush()
+            with self.lock:
+                segment.close()
+        if active is not None:
+            try:
+                active.mm.flush()
+            except (AttributeError, ValueError):
+                # sealed by a concurrent close, which already flushed it
+                pass
+        self._apply_retention()
+
+    def _apply_retention(self):
+        cutoff = time.time() - self.retention_days * 86400
+        doomed = []
+        with self.lock:
+            total = sum(s.size for s in self.segments)
+            while self.segments and self.segments[0] is not self.active and self.segments[0].mm is None:
+                oldest = self.segments[0]
+                if total <= self.max_bytes and oldest.last_ts >= cutoff:
+                    break
+                total -= oldest.size
+                doomed.append(self.segments.pop(0))
+        for segment in doomed:
+            try:
+                os.remove(segment.path)
+            except OSError:
+                pass
+
+    def close(self):
+        """seal everything, used on stop and unload"""
+        with self.lock:
+            self._rotate()
+        self.flush()
+
+    def _read_segment(self, segment: Segment, start: float, end: float) -> bytes:
+        """raw records of `segment` in [start, end], copied out so no mapping outlives the call"""
+        with self.lock:
+            if segment.mm is not None:
+                # live mapping, copy the overlapping bytes out under the lock and decode outside it
+                lo = _lower_bound(segment.mm, segment.count, start)
+                hi = _lower_bound(segment.mm, segment.count, end + 1e-9)
+                return segment.mm[HEADER_SIZE + lo * RECORD.size:HEADER_SIZE + hi * RECORD.size]
+            count = segment.count
+            path = segment.path
+        if not count:
+            return b''
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            count = min(count, (len(mm) - HEADER_SIZE) // RECORD.size)
+            lo = _lower_bound(mm, count, start)
+            hi = _lower_bound(mm, count, end + 1e-9)
+            return mm[HEADER_SIZE + lo * RECORD.size:HEADER_SIZE + hi * RECORD.size]
+
+    def _scan_segments(self, segments: List[Segment], start: float, end: float) -> Iterator[tuple]:
+        for segment in segments:
+            try:
+                buf = self._read_segment(segment, start, end)
+            except (OSError, ValueError):
+                # deleted by retention or sealed mid-scan
+                continue
+            yield from RECORD.iter_unpack(buf)
+
+    def scan(self, start: float, end: float) -> Iterator[tuple]:
+        """yield rows with start <= timestamp <= end in time order, one segment in memory at a time"""
+        with self.lock:
+            overlapping = [s for s in self.segments if s.count and s.last_ts >= start and s.first_ts <= end]
+        return self._scan_segments(overlapping, start, end)
+
+    def sessions(self) -> List[dict]:
+        """one entry per monitoring session (segments sharing a session start), oldest first"""
+        sessions = {}
+        with self.lock:
+            for segment in self.segments:
+                if not segment.count:
+                    continue
+                session = sessions.setdefault(segment.session_start, {
+                    'start': segment.session_start, 'first': segment.first_ts, 'last': segment.last_ts,
+                    'records': 0, 'bytes': 0, 'active': False
+                })
+                session['first'] = min(session['first'], segment.first_ts)
+                session['last'] = max(session['last'], segment.last_ts)
+                session['records'] += segment.count
+                session['bytes'] += segment.size
+                session['active'] = session['active'] or segment is self.active
+        return sorted(sessions.values(), key=lambda s: s['start'])
+
+    def scan_session(self, session_start: float) -> Iterator[tuple]:
+        """every row of one session in time order, one segment in memory at a time"""
+        with self.lock:
+            segments = [s for s in self.segments if s.count and s.session_start == session_start]
+        return self._scan_segments(segments, float('-inf'), float('inf'))
+
+    def downsample(self, start: float, end: float, max_points: int):
+        return downsample_rows(self.scan(start, end), start, end, max_points)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'segments': len(self.segments),
+                'records': sum(s.count for s in self.segments),
+                'bytes': sum(s.size for s in self.segments),
+                'oldest': self.segments[0].first_ts if self.segments else None
+            }
@@ -0,0 +1,165 @@
+import math
+from typing import Dict, Optional
+
+
+class DDSketch:
+    """
+    Mergeable quantile sketch with bounded relative error (DDSketch).
+
+    Values land in bucket ceil(log_gamma(x)), so any quantile estimate is within
+    `relative_accuracy` of a real sample. Inserts are O(1), two sketches with the
+    same accuracy merge by adding counts, and once `max_bins` is hit the lowest
+    buckets collapse together so memory stays constant.
+    """
+
+    __slots__ = ('gamma', 'log_gamma', 'max_bins', 'bins', 'zero', 'count')
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 1024):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zero += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        # fold the two lowest buckets, accuracy is only lost at the cheap end
+        low, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(low)
+
+    def merge(self, other: 'DDSketch'):
+        self.count += other.count
+        self.zero += other.zero
+        for index, n in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + n
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def clear(self):
+        self.bins.clear()
+        self.zero = 0
+        self.count = 0
+
+
+class Ewma:
+    """exponentially weighted mean and variance"""
+
+    __slots__ = ('alpha', 'mean', 'var', 'initialized')
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.initialized = False
+
+    def update(self, value: float) -> float:
+        if not self.initialized:
+            self.mean = value
+            self.initialized = True
+            return self.mean
+        diff = value - self.mean
+        incr = self.alpha * diff
+        self.mean += incr
+        self.var = (1 - self.alpha) * (self.var + diff * incr)
+        return self.mean
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+
+class InterarrivalJitter:
+    """
+    RFC 3550 interarrival jitter, J += (|D| - J) / 16.
+
+    Probes are timed round trip, so D is the difference between consecutive RTTs
+    which is the same transit-time difference with the (unknown) clock offset cancelled.
+    """
+
+    __slots__ = ('jitter', 'last')
+
+    def __init__(self):
+        self.jitter = 0.0
+        self.last: Optional[float] = None
+
+    def update(self, rtt: float) -> float:
+        if self.last is not None:
+            self.jitter += (abs(rtt - self.last) - self.jitter) / 16
+        self.last = rtt
+        return self.jitter
+
+
+class LatencyEstimator:
+    """
+    Running latency/jitter/loss estimators fed one probe at a time.
+
+    Quantiles come from two sketches that take turns every `window` probes, so they
+    follow roughly the last one to two windows of samples at constant memory.
+    """
+
+    def __init__(self, alpha: float = 0.1, loss_alpha: float = 0.05, window: int = 200):
+        self.latency = Ewma(alpha)
+        self.loss = Ewma(loss_alpha)
+        self.jitter = InterarrivalJitter()
+        self.window = window
+        self.current = DDSketch()
+        self.previous = DDSketch()
+        self.probes = 0
+
+    def update(self, rtt: Optional[float]):
+        """feed one probe, None means it was lost"""
+        self.probes += 1
+        if rtt is None:
+            self.loss.update(100.0)
+            return
+        self.loss.update(0.0)
+        self.latency.update(rtt)
+        self.jitter.update(rtt)
+        self.current.add(rtt)
+        if self.current.count >= self.window:
+            self.previous, self.current = self.current, self.previous
+            self.current.clear()
+
+    def quantile(self, q: float) -> Optional[float]:
+        merged = DDSketch()
+        merged.merge(self.previous)
+        merged.merge(self.current)
+        return merged.quantile(q)
+
+    def reset(self):
+        self.__init__(self.latency.alpha, self.loss.alpha, self.window)
+
+    def snapshot(self) -> Dict:
+        return {
+            'latency_ewma': self.latency.mean,
+            'latency_std': self.latency.std,
+            'jitter': self.jitter.jitter,
+            'loss': self.loss.mean,
+            'latency_p50': self.quantile(0.5),
+            'latency_p95': self.quantile(0.95),
+            'latency_p99': self.quantile(0.99),
+            'probes': self.probes
+        }
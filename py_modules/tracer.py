@@ -0,0 +1,354 @@
+import asyncio
+import socket
+import struct
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import ResultCache
+from prober import build_echo_request, parse_echo_reply
+
+# not exported by every python's socket module
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+
+SO_EE_ORIGIN_ICMP = 2
+SO_EE_ORIGIN_ICMP6 = 3
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_PORT_UNREACH = 3
+ICMP6_DEST_UNREACH = 1
+ICMP6_TIME_EXCEEDED = 3
+ICMP6_PORT_UNREACH = 4
+
+# traceroute's classic UDP port range, one port per probe so replies map back to it
+BASE_PORT = 33434
+
+# struct sock_extended_err, followed by the offender's sockaddr
+_EXTENDED_ERR = struct.Struct('=IBBBBII')
+
+
+def parse_recverr(level: int, kind: int, data: bytes) -> Optional[Dict]:
+    """
+    Decode one IP_RECVERR / IPV6_RECVERR control message.
+
+    Returns the ICMP type/code and the address of the router that sent it, with
+    `kind` 'ttl' for time exceeded, 'reached' for port unreachable (the UDP
+    probe got to the destination) and 'unreachable' for other destination
+    unreachable codes. Anything else (local errors, other cmsgs) is None.
+    """
+    if (level, kind) == (socket.IPPROTO_IP, IP_RECVERR):
+        v6 = False
+    elif (level, kind) == (socket.IPPROTO_IPV6, IPV6_RECVERR):
+        v6 = True
+    else:
+        return None
+    if len(data) < _EXTENDED_ERR.size:
+        return None
+    _errno, origin, icmp_type, code, _pad, _info, _data = _EXTENDED_ERR.unpack_from(data)
+    if origin != (SO_EE_ORIGIN_ICMP6 if v6 else SO_EE_ORIGIN_ICMP):
+        return None
+
+    offender = data[_EXTENDED_ERR.size:]
+    address = None
+    if v6 and len(offender) >= 24:
+        address = socket.inet_ntop(socket.AF_INET6, offender[8:24])
+    elif not v6 and len(offender) >= 8:
+        address = socket.inet_ntop(socket.AF_INET, offender[4:8])
+
+    if icmp_type == (ICMP6_TIME_EXCEEDED if v6 else ICMP_TIME_EXCEEDED):
+        result = 'ttl'
+    elif icmp_type == (ICMP6_DEST_UNREACH if v6 else ICMP_DEST_UNREACH):
+        result = 'reached' if code == (ICMP6_PORT_UNREACH if v6 else ICMP_PORT_UNREACH) else 'unreachable'
+    else:
+        return None
+    return {'kind': result, 'address': address, 'type': icmp_type, 'code': code}
+
+
+class _TraceSession:
+    """
+    One socket carrying every probe of a trace.
+
+    TTL is set per send, ICMP errors come back on the socket's error queue with
+    the offending router's address and the original datagram, which tells us
+    the probe: its destination port for UDP, its echo sequence for ICMP.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, family: int, method: str, destination: str):
+        self.loop = loop
+        self.v6 = family == socket.AF_INET6
+        self.method = method
+        self.destination = destination
+        if method == 'icmp':
+            proto = socket.IPPROTO_ICMPV6 if self.v6 else socket.IPPROTO_ICMP
+            self.sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+        else:
+            self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        if self.v6:
+            self.sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVERR, 1)
+        else:
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        self.sock.setblocking(False)
+        # probe id -> (ttl, sent at)
+        self.sent: Dict[int, Tuple[int, float]] = {}
+        # probe id -> (address, rtt ms, kind)
+        self.replies: Dict[int, Tuple[Optional[str], float, str]] = {}
+        self.reached_ttl: Optional[int] = None
+        self.waiter: Optional[asyncio.Future] = None
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def send(self, probe: int, ttl: int, sockaddr: Tuple):
+        if self.v6:
+            self.sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS, ttl)
+        else:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+        if self.method == 'icmp':
+            packet, addr = build_echo_request(probe, v6=self.v6), sockaddr
+        else:
+            packet, addr = b'sentinel', (sockaddr[0], BASE_PORT + probe) + tuple(sockaddr[2:])
+        self.sent[probe] = (ttl, time.perf_counter())
+        for _attempt in range(2):
+            try:
+                self.sock.sendto(packet, addr)
+                return
+            except (BlockingIOError, InterruptedError):
+                # full send buffer counts as a lost probe
+                return
+            except OSError:
+                # a pending ICMP error of an earlier probe is reported on the next send, retry once
+                continue
+
+    def _probe_of(self, payload: bytes, name) -> Optional[int]:
+        if self.method == 'icmp':
+            # the error queue hands back the echo request we sent, its sequence is the probe id
+            if len(payload) >= 8:
+                return struct.unpack('!H', payload[6:8])[0]
+            return None
+        if name and len(name) > 1:
+            return name[1] - BASE_PORT
+        return None
+
+    def _record(self, probe: Optional[int], address: Optional[str], kind: str, now: float):
+        if probe not in self.sent or probe in self.replies:
+            return
+        ttl, sent_at = self.sent[probe]
+        self.replies[probe] = (address, (now - sent_at) * 1000, kind)
+        if kind == 'reached' and (self.reached_ttl is None or ttl < self.reached_ttl):
+            self.reached_ttl = ttl
+
+    def _on_readable(self):
+        now = time.perf_counter()
+        while True:
+            try:
+                payload, ancdata, _flags, name = self.sock.recvmsg(512, 512, MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            for level, kind, data in ancdata:
+                error = parse_recverr(level, kind, data)
+                if error:
+                    self._record(self._probe_of(payload, name), error['address'], error['kind'], now)
+        while True:
+            try:
+                data, name = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # the error queue is drained above, a leftover pending error lands here
+                break
+            if self.method == 'icmp':
+                probe = parse_echo_reply(data, self.v6)
+            else:
+                # something actually listens on that port, still the destination
+                probe = name[1] - BASE_PORT
+            self._record(probe, name[0], 'reached', now)
+        self._check_done()
+
+    def _check_done(self):
+        if self.waiter is None or self.waiter.done() or self.reached_ttl is None:
+            return
+        # done once every probe up to the destination's hop answered
+        if all(probe in self.replies for probe, (ttl, _t) in self.sent.items() if ttl <= self.reached_ttl):
+            self.waiter.set_result(True)
+
+    def close(self):
+        try:
+            self.loop.remove_reader(self.sock.fileno())
+        except Exception:
+            pass
+        self.sock.close()
+
+
+class Tracer:
+    """
+    Async TTL-stepping route tracer.
+
+    Every hop is probed at once: each of the `queries` rounds sends one probe
+    per TTL from 1 to `max_hops` back to back, so a trace takes about one
+    `timeout` instead of a timeout per silent hop. UDP probes (traceroute's
+    default) need no privileges, ICMP echo uses the same datagram sockets as
+    AsyncProber and reaches hosts that drop UDP.
+    """
+
+    def __init__(self, mode: str = 'auto', max_hops: int = 30, queries: int = 3, timeout: float = 2.0,
+                 interval: float = 0.05):
+        self.mode = mode
+        self.max_hops = max_hops
+        self.queries = queries
+        self.timeout = timeout
+        self.interval = interval
+        # cached like AsyncProber.icmp_available
+        self.icmp_available: Optional[bool] = None
+
+    async def trace(self, host: str) -> Dict:
+        """hops to `host` with per-hop addresses, rtts and loss"""
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+            family, _type, _proto, _canon, sockaddr = infos[0]
+        except (OSError, IndexError) as e:
+            return {'host': host, 'error': str(e), 'hops': [], 'reached': False, 'timestamp': started}
+
+        method = 'udp'
+        if self.mode == 'icmp' or (self.mode == 'auto' and self.icmp_available is not False):
+            method = 'icmp'
+        try:
+            session = _TraceSession(loop, family, method, sockaddr[0])
+            if method == 'icmp':
+                self.icmp_available = True
+        except PermissionError:
+            if method != 'icmp' or self.mode == 'icmp':
+                raise
+            self.icmp_available = False
+            method = 'udp'
+            session = _TraceSession(loop, family, method, sockaddr[0])
+
+        start = time.perf_counter()
+        try:
+            session.waiter = loop.create_future()
+            for query in range(self.queries):
+                if query:
+                    await asyncio.sleep(self.interval)
+                for ttl in range(1, self.max_hops + 1):
+                    # nothing past the destination can answer, stop feeding those TTLs
+                    if session.reached_ttl is not None and ttl > session.reached_ttl:
+                        break
+                    session.send(query * self.max_hops + ttl - 1, ttl, sockaddr)
+            session._check_done()
+            try:
+                await asyncio.wait_for(asyncio.shield(session.waiter), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            hops = _build_hops(session, self.max_hops)
+        finally:
+            session.close()
+
+        return {
+            'host': host,
+            'address': sockaddr[0],
+            'method': method,
+            'reached': session.reached_ttl is not None,
+            'hop_count': len(hops),
+            'hops': hops,
+            'duration_ms': (time.perf_counter() - start) * 1000,
+            'timestamp': started
+        }
+
+
+def _build_hops(session: _TraceSession, max_hops: int) -> List[Dict]:
+    by_ttl: Dict[int, List[Optional[Tuple[Optional[str], float, str]]]] = {}
+    for probe, (ttl, _sent) in session.sent.items():
+        by_ttl.setdefault(ttl, []).append(session.replies.get(probe))
+
+    last = session.reached_ttl
+    if last is None:
+        answered = [ttl for ttl, replies in by_ttl.items() if any(replies)]
+        last = max(answered) if answered else 0
+
+    hops = []
+    previous_rtt = None
+    for ttl in range(1, min(last, max_hops) + 1):
+        replies = by_ttl.get(ttl, [])
+        got = [r for r in replies if r is not None]
+        rtts = [r[1] if r is not None else None for r in replies]
+        addresses = Counter(r[0] for r in got if r[0])
+        avg = sum(r[1] for r in got) / len(got) if got else None
+        hop = {
+            'ttl': ttl,
+            'address': addresses.most_common(1)[0][0] if addresses else None,
+            # more than one means ECMP load balancing at this hop
+            'addresses': sorted(addresses),
+            'rtts': rtts,
+            'avg_rtt': avg,
+            'min_rtt': min(r[1] for r in got) if got else None,
+            'loss': (len(replies) - len(got)) / len(replies) * 100 if replies else 100,
+            'added_ms': avg - previous_rtt if avg is not None and previous_rtt is not None else None,
+            'unreachable': any(r[2] == 'unreachable' for r in got)
+        }
+        if avg is not None:
+            previous_rtt = avg
+        hops.append(hop)
+    return hops
+
+
+def route_changes(previous: List[Dict], current: List[Dict]) -> List[Dict]:
+    """
+    Hops whose responding routers changed between two traces.
+
+    A silent hop on either side is not a change, and hops seen behind ECMP only
+    count when the two address sets don't overlap at all.
+    """
+    changes = []
+    before = {hop['ttl']: set(hop['addresses']) for hop in previous}
+    after = {hop['ttl']: set(hop['addresses']) for hop in current}
+    for ttl in sorted(set(before) | set(after)):
+        old, new = before.get(ttl, set()), after.get(ttl, set())
+        if old and new and not old & new:
+            changes.append({'ttl': ttl, 'before': sorted(old), 'after': sorted(new)})
+    return changes
+
+
+class RouteMapper:
+    """
+    Cached traces per destination with route change detection.
+
+    A trace is reused for `ttl` seconds and served stale for `stale` more while
+    a fresh one runs in the background. Each new trace is compared against the
+    last one of the same destination and changed hops are kept in `changes`.
+    """
+
+    def __init__(self, trace: Callable[[str], Awaitable[Dict]], ttl: float = 300, stale: float = 300,
+                 keep_changes: int = 100):
+        self.trace = trace
+        self.cache = ResultCache(default_ttl=(ttl, stale))
+        self.routes: Dict[str, Dict] = {}
+        self.changes = deque(maxlen=keep_changes)
+
+    def configure(self, ttl: float, stale: Optional[float] = None):
+        self.cache.default_ttl = (ttl, ttl if stale is None else stale)
+
+    async def get(self, host: str, refresh: bool = False) -> Dict:
+        if refresh:
+            self.cache.invalidate(host)
+        return await self.cache.get(host, lambda: self._trace(host))
+
+    async def _trace(self, host: str) -> Dict:
+        result = await self.trace(host)
+        previous = self.routes.get(host)
+        changes = route_changes(previous['hops'], result['hops']) if previous else []
+        result['route_changed'] = bool(changes)
+        result['changes'] = changes
+        result['previous_timestamp'] = previous['timestamp'] if previous else None
+        if changes:
+            self.changes.append({'timestamp': result['timestamp'], 'host': host, 'changes': changes})
+        # a trace where nothing answered says nothing about the route, keep comparing against the last good one
+        if any(hop['address'] for hop in result['hops']):
+            self.routes[host] = result
+        return result
+
+    def invalidate(self):
+        """drop cached traces, the last routes stay so the next trace is still compared"""
+        self.cache.invalidate()
@@ -0,0 +1,192 @@
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from wifiscan import ScanTable
+
+
+class _SignalTrack:
+    """fixed-size ring of (timestamp, signal) for one BSSID"""
+
+    __slots__ = ('timestamp', 'signal', 'seq', 'capacity')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamp = array('d', bytes(8 * capacity))
+        self.signal = array('b', bytes(capacity))
+        self.seq = 0
+
+    def append(self, timestamp: float, signal: int):
+        i = self.seq % self.capacity
+        self.timestamp[i] = timestamp
+        self.signal[i] = max(-128, min(127, int(signal)))
+        self.seq += 1
+
+    def since(self, start: float) -> List[tuple]:
+        count = min(self.seq, self.capacity)
+        out = []
+        for seq in range(self.seq - count, self.seq):
+            i = seq % self.capacity
+            if self.timestamp[i] >= start:
+                out.append((self.timestamp[i], self.signal[i]))
+        return out
+
+
+class ScanHistory:
+    """
+    Per-BSSID history across Wi-Fi scans, diffed scan to scan.
+
+    Each BSSID keeps its latest ssid/channel/width/signal, first and last seen
+    time and a small ring of signal samples for trends. Every `update` records
+    what was added, changed or went missing under a new seq, so clients ask for
+    `changes(seq)` and only get what moved since their last cursor. BSSIDs not
+    seen for `stale_after` seconds are evicted, and past `max_bssids` the
+    least recently seen go first.
+    """
+
+    def __init__(self, max_bssids: int = 512, samples: int = 180, stale_after: float = 3600,
+                 signal_step: int = 3, keep_diffs: int = 64):
+        self.max_bssids = max_bssids
+        self.samples = samples
+        self.stale_after = stale_after
+        self.signal_step = signal_step
+        self.entries: Dict[str, Dict] = {}
+        self.tracks: Dict[str, _SignalTrack] = {}
+        self.diffs = deque(maxlen=keep_diffs)
+        self.seq = 0
+        self.scans = 0
+
+    @staticmethod
+    def _key(table: ScanTable, i: int) -> str:
+        # legacy nmcli has no BSSID column, fall back to ssid + channel
+        return table.bssid[i] or f"{table.ssid[i]}/{table.channel[i]}"
+
+    def update(self, table: ScanTable, now: float) -> Dict:
+        """fold one scan in and return its diff"""
+        added, changed = [], []
+        seen = set()
+        for i in range(len(table)):
+            key = self._key(table, i)
+            if key in seen:
+                continue
+            seen.add(key)
+            signal = int(table.signal[i])
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {
+                    'bssid': key,
+                    'ssid': table.ssid[i],
+                    'signal': signal,
+                    'channel': table.channel[i],
+                    'width': table.width[i],
+                    'band': table.band[i],
+                    'security': table.security[i],
+                    'in_use': table.in_use[i],
+                    'first_seen': now,
+                    'last_seen': now,
+                    'present': True
+                }
+                self.tracks[key] = _SignalTrack(self.samples)
+                added.append(dict(entry))
+            else:
+                moved = (abs(signal - entry['signal']) >= self.signal_step or not entry['present'] or
+                         entry['channel'] != table.channel[i] or entry['width'] != table.width[i] or
+                         entry['in_use'] != table.in_use[i] or entry['ssid'] != table.ssid[i])
+                entry.update(ssid=table.ssid[i], channel=table.channel[i], width=table.width[i],
+                             band=table.band[i], in_use=table.in_use[i], last_seen=now, present=True)
+                if moved:
+                    # small wobble stays out of the diff but still lands in the trend
+                    entry['signal'] = signal
+                    changed.append(dict(entry))
+            self.tracks[key].append(now, signal)
+
+        removed = []
+        for key, entry in self.entries.items():
+            if entry['present'] and key not in seen:
+                entry['present'] = False
+                removed.append(key)
+        evicted = self._evict(now)
+
+        self.seq += 1
+        self.scans += 1
+        diff = {'seq': self.seq, 'timestamp': now, 'added': added, 'changed': changed,
+                'removed': removed, 'evicted': evicted}
+        self.diffs.append(diff)
+        return diff
+
+    def _evict(self, now: float) -> List[str]:
+        evicted = [key for key, entry in self.entries.items() if now - entry['last_seen'] > self.stale_after]
+        overflow = len(self.entries) - len(evicted) - self.max_bssids
+        if overflow > 0:
+            remaining = sorted((entry['last_seen'], key) for key, entry in self.entries.items() if key not in evicted)
+            evicted.extend(key for _seen, key in remaining[:overflow])
+        for key in evicted:
+            del self.entries[key]
+            del self.tracks[key]
+        return evicted
+
+    def changes(self, cursor: int = -1) -> Dict:
+        """
+        Everything that changed after scan `cursor`, merged per BSSID.
+
+        A cursor older than the kept diffs (or -1) gets a full snapshot with
+        `reset` set, like HistoryRing.since.
+        """
+        oldest = self.diffs[0]['seq'] if self.diffs else self.seq + 1
+        if cursor < 0 or cursor < oldest - 1 or cursor > self.seq:
+            return {'seq': self.seq, 'reset': True, 'upserted': [dict(e) for e in self.entries.values()],
+                    'removed': [], 'evicted': []}
+        upserted: Dict[str, Dict] = {}
+        removed, evicted = set(), set()
+        for diff in self.diffs:
+            if diff['seq'] <= cursor:
+                continue
+            for entry in diff['added'] + diff['changed']:
+                upserted[entry['bssid']] = entry
+                removed.discard(entry['bssid'])
+            for key in diff['removed']:
+                removed.add(key)
+            for key in diff['evicted']:
+                evicted.add(key)
+                upserted.pop(key, None)
+                removed.discard(key)
+        # report the latest state of anything that changed
+        for key in upserted:
+            if key in self.entries:
+                upserted[key] = dict(self.entries[key])
+        return {'seq': self.seq, 'reset': False, 'upserted': list(upserted.values()),
+                'removed': sorted(removed), 'evicted': sorted(evicted)}
+
+    def current_bssid(self) -> Optional[str]:
+        return next((key for key, entry in self.entries.items() if entry['in_use'] and entry['present']), None)
+
+    def trend(self, bssid: Optional[str] = None, window: float = 1800, now: Optional[float] = None) -> Dict:
+        """signal samples of one BSSID (the connected one by default) over the last `window` seconds"""
+        bssid = bssid or self.current_bssid()
+        if bssid not in self.tracks:
+            return {'bssid': bssid, 'points': [], 'error': 'unknown bssid'}
+        entry = self.entries[bssid]
+        end = now if now is not None else entry['last_seen']
+        points = self.tracks[bssid].since(end - window)
+        result = {'bssid': bssid, 'ssid': entry['ssid'], 'points': points}
+        if points:
+            signals = [s for _t, s in points]
+            result.update(min=min(signals), max=max(signals), mean=sum(signals) / len(signals),
+                          slope_per_min=_slope(points) * 60)
+        return result
+
+    def memory_bytes(self) -> int:
+        return len(self.tracks) * self.samples * 9
+
+
+def _slope(points: List[tuple]) -> float:
+    """least squares signal change per second"""
+    n = len(points)
+    if n < 2:
+        return 0.0
+    mean_t = sum(t for t, _s in points) / n
+    mean_s = sum(s for _t, s in points) / n
+    var = sum((t - mean_t) ** 2 for t, _s in points)
+    if not var:
+        return 0.0
+    return sum((t - mean_t) * (s - mean_s) for t, s in points) / var
@@ -0,0 +1,291 @@
+import math
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # the Deck's plugin python has no numpy, the list path gives the same results
+    np = None
+
+# nmcli field list, BANDWIDTH needs NetworkManager 1.38+
+SCAN_FIELDS = ['IN-USE', 'BSSID', 'SSID', 'SIGNAL', 'FREQ', 'CHAN', 'BANDWIDTH', 'SECURITY']
+LEGACY_FIELDS = ['SSID', 'SIGNAL', 'FREQ', 'CHAN', 'BARS', 'SECURITY']
+
+# candidate primary channels we rank, per band
+CANDIDATES = {
+    '2.4GHz': list(range(1, 12)),
+    '5GHz': [36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128,
+             132, 136, 140, 144, 149, 153, 157, 161, 165],
+    '6GHz': list(range(1, 234, 4)),
+}
+# 2.4GHz channels that don't overlap each other, preferred on ties
+PLAN_24 = (1, 6, 11)
+# (low, high) MHz edges of the sub-bands bonded 40/80/160 blocks are aligned to,
+# UNII-3 (channel 149 up) restarts the 5GHz grid at 5735 instead of continuing UNII-1's
+BONDING_BLOCKS = {
+    '5GHz': ((5170, 5330), (5490, 5730), (5735, 5895)),
+    '6GHz': ((5945, 7125),),
+}
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def split_terse(line: str) -> List[str]:
+    """split one `nmcli -t` row on unescaped colons"""
+    fields, current, escaped = [], [], False
+    for ch in line:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == ':':
+            fields.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    fields.append(''.join(current))
+    return fields
+
+
+def _number(text: str, default: float = 0) -> float:
+    # nmcli prints units ("2437 MHz", "20 MHz") in terse mode too
+    match = _NUMBER.search(text or '')
+    return float(match.group()) if match else default
+
+
+def band_of(freq: float) -> str:
+    if freq and freq < 3000:
+        return '2.4GHz'
+    if freq and freq >= 5925:
+        return '6GHz'
+    return '5GHz'
+
+
+def channel_freq(band: str, channel: int) -> float:
+    if band == '2.4GHz':
+        return 2484.0 if channel == 14 else 2407.0 + 5 * channel
+    if band == '6GHz':
+        return 5950.0 + 5 * channel
+    return 5000.0 + 5 * channel
+
+
+def span(band: str, freq: float, width: float) -> Tuple[float, float]:
+    """occupied spectrum (low, high) in MHz of an AP on primary `freq` using `width`"""
+    if band == '2.4GHz':
+        # 22 MHz spectral mask, bonding can go either side of the primary so treat it as centred
+        return freq - width / 2 - 1, freq + width / 2 + 1
+    edge = freq - 10
+    for base, top in BONDING_BLOCKS[band]:
+        if base <= edge < top:
+            while width > 20:
+                low = base + ((edge - base) // width) * width
+                if low + width <= top:
+                    return low, low + width
+                # no block that wide here (160 MHz on 132-144, 40 MHz on 6GHz channel 233)
+                width /= 2
+            break
+    return freq - width / 2, freq + width / 2
+
+
+class ScanTable:
+    """one scan as parallel columns, parsed once and shared by every analysis step"""
+
+    def __init__(self):
+        self.bssid: List[str] = []
+        self.ssid: List[str] = []
+        self.signal: List[float] = []
+        self.freq: List[float] = []
+        self.channel: List[int] = []
+        self.width: List[float] = []
+        self.security: List[str] = []
+        self.band: List[str] = []
+        self.in_use: List[bool] = []
+
+    def __len__(self) -> int:
+        return len(self.ssid)
+
+    def add(self, bssid: str, ssid: str, signal: float, freq: float, channel: int, width: float, security: str,
+            in_use: bool = False):
+        self.bssid.append(bssid)
+        self.ssid.append(ssid or '<hidden>')
+        self.signal.append(signal)
+        self.freq.append(freq or (channel_freq('2.4GHz' if 0 < channel <= 14 else '5GHz', channel) if channel else 0))
+        self.channel.append(channel)
+        self.width.append(width or 20.0)
+        self.security.append(security)
+        self.band.append(band_of(self.freq[-1]))
+        self.in_use.append(in_use)
+
+    @classmethod
+    def from_nmcli(cls, stdout: str, fields: Sequence[str] = SCAN_FIELDS) -> 'ScanTable':
+        table = cls()
+        index = {name: i for i, name in enumerate(fields)}
+
+        def get(parts: List[str], name: str) -> str:
+            i = index.get(name)
+            return parts[i] if i is not None and i < len(parts) else ''
+
+        for line in stdout.splitlines():
+            parts = split_terse(line)
+            # ignore empty rows from the scanner
+            if len(parts) < 4:
+                continue
+            table.add(get(parts, 'BSSID'), get(parts, 'SSID'), _number(get(parts, 'SIGNAL')),
+                      _number(get(parts, 'FREQ')), int(_number(get(parts, 'CHAN'))),
+                      _number(get(parts, 'BANDWIDTH')), get(parts, 'SECURITY'), get(parts, 'IN-USE').strip() == '*')
+        return table
+
+    def spans(self) -> Tuple[List[float], List[float]]:
+        lows, highs = [], []
+        for band, freq, width in zip(self.band, self.freq, self.width):
+            low, high = span(band, freq, width)
+            lows.append(low)
+            highs.append(high)
+        return lows, highs
+
+
+def signal_mw(signal: float) -> float:
+    """nmcli SIGNAL percent to received power in mW (NetworkManager maps -100..-50 dBm to 0..100%)"""
+    dbm = min(signal, 100) / 2 - 100
+    return 10 ** (dbm / 10)
+
+
+def mw_to_dbm(mw: float) -> Optional[float]:
+    if mw <= 0:
+        return None
+    return 10 * math.log10(mw)
+
+
+def _overlap_python(lows: List[float], highs: List[float], c_lows: List[float], c_highs: List[float],
+                    c_width: List[float]) -> List[List[float]]:
+    return [[max(0.0, min(hi, chi) - max(lo, clo)) / cw for clo, chi, cw in zip(c_lows, c_highs, c_width)]
+            for lo, hi in zip(lows, highs)]
+
+
+def overlap_matrix(lows, highs, c_lows, c_highs, c_width, use_numpy: Optional[bool] = None):
+    """
+    rows x columns matrix of the fraction of each column's spectrum a row's
+    transmission covers, NumPy broadcasting when available.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if not use_numpy:
+        return _overlap_python(lows, highs, c_lows, c_highs, c_width)
+    lows, highs = np.asarray(lows)[:, None], np.asarray(highs)[:, None]
+    c_lows, c_highs = np.asarray(c_lows)[None, :], np.asarray(c_highs)[None, :]
+    return np.clip(np.minimum(highs, c_highs) - np.maximum(lows, c_lows), 0, None) / np.asarray(c_width)[None, :]
+
+
+def analyze(table: ScanTable, widths: Sequence[int] = (20, 40, 80), use_numpy: Optional[bool] = None) -> Dict:
+    """
+    Interference model for a scan.
+
+    Every AP covers the spectrum of its (bonded) channel. For each band and
+    width the candidate channels are scored by the received power of every AP
+    weighted by how much of the candidate's spectrum it overlaps, and each AP's
+    congestion is the overlap-weighted number of other APs it shares air with.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    lows, highs = table.spans()
+
+    # APs on the same (bonded) channel occupy the same spectrum, so the matrices are
+    # built over distinct spans (a few dozen even at a LAN event) weighted by how
+    # many APs and how much received power sit on each
+    groups: Dict[Tuple[float, float, str], int] = {}
+    ap_group = [groups.setdefault((lo, hi, band), len(groups)) for lo, hi, band in zip(lows, highs, table.band)]
+    keys = list(groups)
+    g_lows = [key[0] for key in keys]
+    g_highs = [key[1] for key in keys]
+    g_count = [0] * len(keys)
+    g_power = [0.0] * len(keys)
+    for g, signal in zip(ap_group, table.signal):
+        g_count[g] += 1
+        g_power[g] += signal_mw(signal)
+
+    # span x span overlap normalised by the column span, self overlap is 1
+    ov = overlap_matrix(g_lows, g_highs, g_lows, g_highs, [hi - lo for lo, hi in zip(g_lows, g_highs)], use_numpy)
+    if use_numpy:
+        sharing = (np.asarray(g_count, dtype=float) @ ov).tolist() if keys else []
+    else:
+        sharing = [sum(g_count[r] * ov[r][c] for r in range(len(keys))) for c in range(len(keys))]
+    congestion = [sharing[g] - 1 for g in ap_group]
+
+    bands: Dict[str, Dict[str, List[Dict]]] = {}
+    for band, channels in CANDIDATES.items():
+        rows = [g for g, key in enumerate(keys) if key[2] == band]
+        # 6GHz needs a 6E adapter, only rank it when the scan actually saw it
+        if band == '6GHz' and not rows:
+            continue
+        ranked_by_width = {}
+        for width in widths:
+            if band == '2.4GHz' and width > 40:
+                continue
+            spans_c = [span(band, channel_freq(band, ch), width) for ch in channels]
+            c_lows = [s[0] for s in spans_c]
+            c_highs = [s[1] for s in spans_c]
+            c_width = [s[1] - s[0] for s in spans_c]
+            matrix = overlap_matrix([g_lows[g] for g in rows], [g_highs[g] for g in rows],
+                                    c_lows, c_highs, c_width, use_numpy)
+            if not rows:
+                interference = [0.0] * len(channels)
+                overlapping = [0] * len(channels)
+            elif use_numpy:
+                interference = (np.asarray([g_power[g] for g in rows]) @ matrix).tolist()
+                overlapping = (np.asarray([g_count[g] for g in rows]) @ (matrix > 0)).tolist()
+            else:
+                interference = [sum(g_power[g] * matrix[r][c] for r, g in enumerate(rows)) for c in range(len(channels))]
+                overlapping = [sum(g_count[g] for r, g in enumerate(rows) if matrix[r][c] > 0) for c in range(len(channels))]
+            ranked = sorted(
+                ({'channel': ch, 'interference_mw': interference[c], 'interference_dbm': mw_to_dbm(interference[c]),
+                  'overlapping_aps': int(overlapping[c])} for c, ch in enumerate(channels)),
+                key=lambda row: (row['interference_mw'], row['overlapping_aps'],
+                                 band == '2.4GHz' and row['channel'] not in PLAN_24, row['channel'])
+            )
+            ranked_by_width[str(width)] = ranked
+        bands[band] = ranked_by_width
+
+    return {'congestion': congestion, 'bands': bands, 'spans': len(keys)}
+
+
+def summarize_scan(table: ScanTable, use_numpy: Optional[bool] = None) -> Dict:
+    """the `scan_wifi_networks` payload: networks, per-band channel ranking and a suggestion"""
+    analysis = analyze(table, use_numpy=use_numpy)
+    networks = []
+    channel_counts: Dict[int, int] = {}
+    for i in range(len(table)):
+        channel_counts[table.channel[i]] = channel_counts.get(table.channel[i], 0) + 1
+        congestion = analysis['congestion'][i]
+        # simple latency heuristic based on rssi and crowding
+        base_latency = max(8, 220 - table.signal[i] * 1.6)
+        band_penalty = 10 if table.band[i] == '2.4GHz' else 0
+        congestion_penalty = max(0, congestion * 8)
+        networks.append({
+            'bssid': table.bssid[i],
+            'ssid': table.ssid[i],
+            'signal': int(table.signal[i]),
+            'freq': table.freq[i],
+            'channel': table.channel[i],
+            'width': table.width[i],
+            'band': table.band[i],
+            'security': table.security[i],
+            'in_use': table.in_use[i],
+            'congestion': round(1 + congestion, 2),
+            'estimated_latency_ms': round(base_latency + band_penalty + congestion_penalty, 1)
+        })
+
+    best_by_band = {band: ranking['20'][0]['channel'] for band, ranking in analysis['bands'].items() if ranking.get('20')}
+    # suggest 5GHz when the adapter can see it, it's almost always the quieter band
+    seen_bands = set(table.band)
+    preferred = next((b for b in ('5GHz', '2.4GHz', '6GHz') if b in seen_bands and b in best_by_band), None)
+    return {
+        'networks': networks,
+        'best_channel': best_by_band.get(preferred) if preferred else None,
+        'best_band': preferred,
+        'best_channel_by_band': best_by_band,
+        'channel_rankings': analysis['bands'],
+        'channel_load': channel_counts,
+        'engine': 'numpy' if (np is not None if use_numpy is None else use_numpy) else 'python'
+    }
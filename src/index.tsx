@@ -8,19 +8,22 @@ import {
   Navigation
 } from "@decky/ui";
 import {
+  addEventListener,
+  removeEventListener,
   callable,
   definePlugin,
   toaster
 } from "@decky/api"
-import { useState, useEffect, useCallback } from "react";
-import { FaWifi, FaGithub, FaTwitter, FaNetworkWired, FaPlay, FaStop, FaSyncAlt, FaTrash, FaArrowLeft } from "react-icons/fa";
+import { useState, useEffect, useCallback, useRef } from "react";
+import { FaWifi, FaGithub, FaTwitter, FaNetworkWired, FaPlay, FaStop, FaSyncAlt, FaTrash, FaArrowLeft, FaFileExport } from "react-icons/fa";
 
 // backend api calls
 const startMonitoring = callable<[], boolean>("start_monitoring");
 const stopMonitoring = callable<[], boolean>("stop_monitoring");
 const getNetworkStatus = callable<[], any>("get_network_status");
-const getNetworkHistory = callable<[], any[]>("get_network_history");
+const getNetworkHistorySince = callable<[seq: number, limit?: number], HistoryDelta>("get_network_history_since");
 const clearHistory = callable<[], void>("clear_history");
+const exportSession = callable<[sessionStart?: number, fmt?: string, label?: string], any>("export_session");
 const getLivePing = callable<[], number>("get_live_ping");
 const updateSettings = callable<[settings: any], boolean>("update_settings");
 const getSettings = callable<[], any>("get_settings");
@@ -28,6 +31,20 @@ const getConnectionInfo = callable<[], any>("get_connection_info");
 const testSinglePing = callable<[host?: string], any>("test_single_ping");
 const testDns = callable<[], any>("test_dns");
 const scanWifiNetworks = callable<[], any>("scan_wifi_networks");
+const streamGameServers = callable<[servers: any[]], Record<string, any>>("stream_game_servers");
+
+interface HistoryDelta {
+  seq: number;
+  first_seq: number;
+  reset: boolean;
+  points: any[];
+}
+
+// history rows the panel keeps client side
+const HISTORY_KEEP = 50;
+
+// fall back to polling when no pushed sample arrived for this long
+const PUSH_STALE_MS = 5000;
 
 interface NetworkStatus {
   quality: {
@@ -48,10 +65,16 @@ function Content() {
   const [networkStatus, setNetworkStatus] = useState<NetworkStatus | null>(null);
   const [isMonitoring, setIsMonitoring] = useState(false);
   const [networkHistory, setNetworkHistory] = useState<any[]>([]);
+  const historyCursor = useRef(-1);
+  const lastPush = useRef(0);
   const [livePing, setLivePing] = useState(0);
   const [settings, setSettings] = useState<any>({});
   const [connectionInfo, setConnectionInfo] = useState<any>({});
   const [dnsStatus, setDnsStatus] = useState<any>(null);
+  const [pathQuality, setPathQuality] = useState<any>(null);
+  const [incidents, setIncidents] = useState<Record<number, any>>({});
+  const [serverResults, setServerResults] = useState<Record<string, any>>({});
+  const [serversPinging, setServersPinging] = useState(false);
   const [speedUnit, setSpeedUnit] = useState<string>('mbps');
   const [connectionType, setConnectionType] = useState<string>('unknown');
   const [wifiScan, setWifiScan] = useState<any>(null);
@@ -110,8 +133,13 @@ function Content() {
 
   const refreshHistory = useCallback(async () => {
     try {
-      const history = await getNetworkHistory();
-      setNetworkHistory(history);
+      // only pull samples newer than what we already hold
+      const delta = await getNetworkHistorySince(historyCursor.current, HISTORY_KEEP);
+      historyCursor.current = delta.seq;
+      setNetworkHistory((prev) => {
+        const kept = delta.reset ? [] : prev.filter((point) => point.seq >= delta.first_seq);
+        return kept.concat(delta.points).slice(-HISTORY_KEEP);
+      });
     } catch (error) {
       console.error("Failed to get network history:", error);
     }
@@ -131,14 +159,75 @@ function Content() {
     }
   }, [showHistory, refreshHistory]);
 
+  useEffect(() => {
+    // the backend pushes batches of new samples and status changes while monitoring
+    const onSamples = addEventListener<[points: any[]]>("network_sample", (points) => {
+      if (!points?.length) return;
+      lastPush.current = Date.now();
+      const latest = points[points.length - 1];
+      historyCursor.current = latest.seq;
+      setLivePing(latest.live_ping);
+      setNetworkHistory((prev) =>
+        prev.filter((point) => point.seq < points[0].seq).concat(points).slice(-HISTORY_KEEP)
+      );
+      setNetworkStatus((prev) => (prev ? { ...prev, bandwidth: latest.bandwidth } : prev));
+    });
+    const onStatus = addEventListener<[status: any]>("network_status", (status) => {
+      lastPush.current = Date.now();
+      setNetworkStatus((prev) => (prev ? { ...prev, ...status } : prev));
+      setDnsStatus(status.dns_status || null);
+    });
+    const onMonitoring = addEventListener<[state: { monitoring: boolean }]>("monitoring_state", (state) => {
+      setIsMonitoring(state.monitoring);
+    });
+    const onPath = addEventListener<[report: any]>("path_quality", (report) => {
+      setPathQuality(report);
+    });
+    const onIncident = addEventListener<[events: any[]]>("incident", (events) => {
+      if (!events?.length) return;
+      setIncidents((prev) => {
+        const next = { ...prev };
+        for (const { action, incident } of events) {
+          if (action === 'closed') delete next[incident.id];
+          else next[incident.id] = incident;
+        }
+        return next;
+      });
+      // one toast per batch, the newest incident that opened or got worse
+      const loud = events.filter((e) => e.action !== 'closed').pop();
+      if (loud) {
+        toaster.toast({
+          title: loud.incident.severity === 'critical' ? "Network problem" : "Network warning",
+          body: loud.incident.detail || loud.incident.kind
+        });
+      }
+    });
+    // game server rows arrive one by one while stream_game_servers runs
+    const onServer = addEventListener<[result: any]>("game_server_result", (result) => {
+      setServerResults((prev) => ({ ...prev, [result.name]: result }));
+    });
+    return () => {
+      removeEventListener("game_server_result", onServer);
+      removeEventListener("network_sample", onSamples);
+      removeEventListener("network_status", onStatus);
+      removeEventListener("monitoring_state", onMonitoring);
+      removeEventListener("path_quality", onPath);
+      removeEventListener("incident", onIncident);
+    };
+  }, []);
+
   useEffect(() => {
     const interval = setInterval(() => {
-      if (isMonitoring) {
+      // polling fallback, only when pushes stopped (disabled in settings or a stalled loop)
+      if (isMonitoring && Date.now() - lastPush.current > PUSH_STALE_MS) {
         refreshLivePing();
+        if (showHistory) {
+          refreshHistory();
+        }
       }
     }, 1500);
     return () => clearInterval(interval);
-  }, [isMonitoring, refreshLivePing]);
+  }, [isMonitoring, showHistory, refreshLivePing, refreshHistory]);
 
   const handleStartMonitoring = async () => {
     try {
@@ -200,6 +289,25 @@ function Content() {
     }
   };
 
+  const handleExportSession = async () => {
+    try {
+      const result = await exportSession();
+      if (result.error) {
+        toaster.toast({
+          title: "Export Failed",
+          body: result.error
+        });
+      } else {
+        toaster.toast({
+          title: "Session Exported",
+          body: `${result.rows} samples, ${(result.bytes / 1024).toFixed(0)} KB: ${result.path}`
+        });
+      }
+    } catch (error) {
+      console.error("Failed to export session:", error);
+    }
+  };
+
   const handleTestPing = async () => {
     try {
       const result = await testSinglePing('8.8.8.8');
@@ -219,6 +327,20 @@ function Content() {
     }
   };
 
+  const handlePingGameServers = async () => {
+    try {
+      setServersPinging(true);
+      setServerResults({});
+      // rows fill in through game_server_result, the return value is the complete set
+      const results = await streamGameServers(settings.path_game_servers || []);
+      setServerResults(results);
+    } catch (error) {
+      console.error("Failed to ping game servers:", error);
+    } finally {
+      setServersPinging(false);
+    }
+  };
+
   const handleTestDns = async () => {
     try {
       const result = await testDns();
@@ -361,6 +483,20 @@ function Content() {
                     </div>
                   </div>
                 </PanelSectionRow>
+                {Object.values(incidents).map((incident: any) => (
+                  <PanelSectionRow key={incident.id}>
+                    <div style={{ fontSize: '10px', color: incident.severity === 'critical' ? '#ff4444' : '#ffaa00', textAlign: 'center' }}>
+                      {incident.detail || incident.kind}
+                    </div>
+                  </PanelSectionRow>
+                ))}
+                {pathQuality?.fault && (
+                  <PanelSectionRow>
+                    <div style={{ fontSize: '10px', color: '#ffaa00', textAlign: 'center' }}>
+                      {pathQuality.summary}
+                    </div>
+                  </PanelSectionRow>
+                )}
               </>
             )}
 
@@ -424,6 +560,31 @@ function Content() {
             </PanelSectionRow>
           </PanelSection>
 
+          {settings.path_game_servers?.length > 0 && (
+            <PanelSection title="Game Servers">
+              <PanelSectionRow>
+                <ButtonItem
+                  layout="below"
+                  onClick={handlePingGameServers}
+                  disabled={serversPinging}
+                >
+                  <FaNetworkWired style={{ marginRight: "8px" }} />
+                  {serversPinging ? "Pinging..." : "Ping Game Servers"}
+                </ButtonItem>
+              </PanelSectionRow>
+              {Object.values(serverResults).map((server: any) => (
+                <PanelSectionRow key={server.name}>
+                  <div style={{ display: 'flex', justifyContent: 'space-between', width: '100%' }}>
+                    <span style={{ fontSize: '11px' }}>{server.name}</span>
+                    <span style={{ fontWeight: 'bold', fontSize: '11px', color: server.success ? '#fff' : '#f66' }}>
+                      {server.success ? `${server.avg_rtt.toFixed(0)}ms • ${server.packet_loss.toFixed(0)}% loss` : 'unreachable'}
+                    </span>
+                  </div>
+                </PanelSectionRow>
+              ))}
+            </PanelSection>
+          )}
+
           <PanelSection title="Wi-Fi Radar">
             <PanelSectionRow>
               <ToggleField
@@ -471,7 +632,8 @@ function Content() {
             {wifiScan?.best_channel !== undefined && (
               <PanelSectionRow>
                 <div style={{ fontSize: '11px', color: '#ccc' }}>
-                  Suggested channel: <span style={{ fontWeight: 'bold' }}>{wifiScan.best_channel}</span> (least congestion)
+                  Suggested channel: <span style={{ fontWeight: 'bold' }}>{wifiScan.best_channel}</span>
+                  {wifiScan.best_band ? ` on ${wifiScan.best_band}` : ''} (least interference)
                 </div>
               </PanelSectionRow>
             )}
@@ -524,7 +686,7 @@ function Content() {
         </ButtonItem>
       </PanelSectionRow>
             <PanelSectionRow>
-              <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr', gap: '6px', width: '100%' }}>
+              <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr 1fr', gap: '6px', width: '100%' }}>
                 <div style={{ minWidth: 0 }}>
                   <ButtonItem 
                     layout="inline" 
@@ -547,6 +709,17 @@ function Content() {
                     </div>
                   </ButtonItem>
                 </div>
+                <div style={{ minWidth: 0 }}>
+                  <ButtonItem 
+                    layout="inline" 
+                    onClick={handleExportSession}
+                    bottomSeparator="none"
+                  >
+                    <div style={{ display: 'flex', justifyContent: 'center', width: '100%' }}>
+                      <FaFileExport size={14} />
+                    </div>
+                  </ButtonItem>
+                </div>
               </div>
             </PanelSectionRow>
 
@@ -658,9 +831,47 @@ function Content() {
                 step={0.1}
                 onChange={(value) => handleUpdateSetting('ping_interval', value)}
                 bottomSeparator="none"
-                description={`Check every ${(settings.ping_interval || 0.5).toFixed(1)}s`}
+                description={settings.adaptive_probing
+                  ? 'Not used while adaptive probing is on'
+                  : `Check every ${(settings.ping_interval || 0.5).toFixed(1)}s`}
+              />
+            </PanelSectionRow>
+            <PanelSectionRow>
+              <ToggleField
+                label="Adaptive Probing"
+                checked={!!settings.adaptive_probing}
+                onChange={(value) => handleUpdateSetting('adaptive_probing', value)}
+                description={`Every ${settings.probe_min_interval || 5}s while the connection is unstable, backing off to ${settings.probe_max_interval || 30}s while steady`}
               />
             </PanelSectionRow>
+            {settings.adaptive_probing && (
+              <>
+                <PanelSectionRow>
+                  <SliderField
+                    label="Fastest Probe"
+                    value={settings.probe_min_interval || 5}
+                    min={1}
+                    max={30}
+                    step={1}
+                    onChange={(value) => handleUpdateSetting('probe_min_interval', value)}
+                    bottomSeparator="none"
+                    description={`Probe every ${settings.probe_min_interval || 5}s while the connection is unstable`}
+                  />
+                </PanelSectionRow>
+                <PanelSectionRow>
+                  <SliderField
+                    label="Slowest Probe"
+                    value={settings.probe_max_interval || 30}
+                    min={5}
+                    max={120}
+                    step={1}
+                    onChange={(value) => handleUpdateSetting('probe_max_interval', value)}
+                    bottomSeparator="none"
+                    description={`Back off to every ${settings.probe_max_interval || 30}s while the connection is steady`}
+                  />
+                </PanelSectionRow>
+              </>
+            )}
             <PanelSectionRow>
               <ToggleField
                 label="Auto Start Monitoring"